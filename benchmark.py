@@ -0,0 +1,475 @@
+"""
+性能基准测试模块
+生成可复现的合成.xlsx语料库，分别计时端到端搜索和各阶段（打开、解析、匹配、汇总），
+记录峰值内存，结果以JSON输出，便于不同版本之间对比；
+--startup 同时检查界面的启动时间是否在预算内
+
+用法：python benchmark.py [--files 20 --rows 2000 ...] [--engines full,prefilter] [--startup] [-o result.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import freeze_support, get_context
+from xml.sax.saxutils import escape, quoteattr
+
+from openpyxl.utils import get_column_letter
+
+# 语料库参数（同时也是命令行参数名）及默认值
+CORPUS_DEFAULTS = {
+    'files': 20,            # 文件数
+    'sheets': 2,            # 每个文件的工作表数
+    'rows': 2000,           # 每个工作表的行数
+    'cols': 10,             # 每个工作表的列数
+    'string_ratio': 0.6,    # 文本单元格占比，其余为数字
+    'shared_ratio': 1.0,    # 文本单元格中写入共享字符串表的比例，其余为内联字符串
+    'vocabulary': 1000,     # 不同文本的数量
+    'hit_density': 0.001,   # 文本单元格中包含关键词的比例
+    'keyword': 'NEEDLE',    # 埋入的关键词
+    'seed': 0,              # 随机种子
+}
+CORPUS_MANIFEST = 'corpus.json'
+STAGES = ('open', 'parse', 'match', 'aggregate')
+
+# 界面启动时间预算（秒，取多次运行的中位数）：
+# import_seconds 导入界面模块；first_window_seconds 从开始导入到主窗口第一次绘制完成
+STARTUP_BUDGET = {'import_seconds': 0.15, 'first_window_seconds': 0.6}
+# 启动时不应加载的模块，它们在第一次搜索、建立索引时才需要
+STARTUP_DEFERRED_MODULES = ('openpyxl', 'sqlite3', 'concurrent.futures', 'xlsx_prefilter', 'search_index')
+
+# 在全新的解释器中运行，配置目录为临时目录，不读写用户的配置文件
+_STARTUP_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import excel_gui_search_i18n
+result = {{'import_seconds': time.perf_counter() - start, 'first_window_seconds': None, 'window_error': None}}
+try:
+    app = excel_gui_search_i18n.ExcelSearchApp()
+    app.root.update()
+    result['first_window_seconds'] = time.perf_counter() - start
+except Exception as e:  # 没有图形显示环境
+    app = None
+    result['window_error'] = str(e)
+result['loaded'] = [name for name in {deferred!r} if name in sys.modules]
+if app is not None:
+    app.root.destroy()
+print(json.dumps(result))
+"""
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '{sheets}</Types>'
+)
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}'
+    '<Relationship Id="rIdStyles" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '<Relationship Id="rIdStrings" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+    'Target="sharedStrings.xml"/></Relationships>'
+)
+_SHEET_REL = (
+    '<Relationship Id="rId{n}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{n}.xml"/>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf/></cellStyleXfs><cellXfs count="1"><xf/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_FOOTER = '</sheetData></worksheet>'
+
+
+def generate_workbook(file_path, spec, rng):
+    """
+    按参数生成一个.xlsx文件（直接写XML，便于精确控制共享字符串和内联字符串的比例）
+    :return: (单元格数, 包含关键词的单元格数)
+    """
+    words = [f"item {i:05d} lorem ipsum" for i in range(spec['vocabulary'])]
+    shared = []
+    shared_index = {}
+    sheets_xml = []
+    hits = 0
+
+    for _ in range(spec['sheets']):
+        parts = [_SHEET_HEADER]
+        for row in range(1, spec['rows'] + 1):
+            parts.append(f'<row r="{row}">')
+            for col in range(1, spec['cols'] + 1):
+                ref = f"{get_column_letter(col)}{row}"
+                if rng.random() >= spec['string_ratio']:
+                    number = rng.randint(0, 10 ** 6) if rng.random() < 0.5 else round(rng.uniform(0, 10 ** 4), 2)
+                    parts.append(f'<c r="{ref}"><v>{number}</v></c>')
+                    continue
+                text = rng.choice(words)
+                if rng.random() < spec['hit_density']:
+                    text = f"{text} {spec['keyword']}"
+                    hits += 1
+                if rng.random() < spec['shared_ratio']:
+                    index = shared_index.get(text)
+                    if index is None:
+                        index = shared_index[text] = len(shared)
+                        shared.append(text)
+                    parts.append(f'<c r="{ref}" t="s"><v>{index}</v></c>')
+                else:
+                    parts.append(f'<c r="{ref}" t="inlineStr"><is><t>{escape(text)}</t></is></c>')
+            parts.append('</row>')
+        parts.append(_SHEET_FOOTER)
+        sheets_xml.append(''.join(parts))
+
+    strings_xml = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" uniqueCount="{len(shared)}">'
+        + ''.join(f'<si><t>{escape(text)}</t></si>' for text in shared)
+        + '</sst>'
+    )
+    numbers = range(1, len(sheets_xml) + 1)
+    with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES.format(
+            sheets=''.join(_SHEET_CONTENT_TYPE.format(n=n) for n in numbers)))
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(sheets=''.join(
+            f'<sheet name={quoteattr(f"Sheet{n}")} sheetId="{n}" r:id="rId{n}"/>' for n in numbers)))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS.format(
+            sheets=''.join(_SHEET_REL.format(n=n) for n in numbers)))
+        archive.writestr('xl/styles.xml', _STYLES)
+        archive.writestr('xl/sharedStrings.xml', strings_xml)
+        for n, sheet_xml in zip(numbers, sheets_xml):
+            archive.writestr(f'xl/worksheets/sheet{n}.xml', sheet_xml)
+
+    return spec['sheets'] * spec['rows'] * spec['cols'], hits
+
+
+def generate_corpus(directory, spec):
+    """
+    生成语料库；目录中已有相同参数生成的语料库时直接复用
+    :return: 语料库描述（参数、文件数、单元格数、埋入的关键词单元格数、总字节数）
+    """
+    manifest_path = os.path.join(directory, CORPUS_MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('spec') == spec:
+            return manifest
+
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith('.xlsx'):
+            os.remove(os.path.join(directory, name))
+
+    cells = hits = size = 0
+    for i in range(spec['files']):
+        # 每个文件使用独立的随机序列，文件内容只取决于参数和序号
+        rng = random.Random(spec['seed'] * 1000003 + i)
+        file_path = os.path.join(directory, f"bench_{i:04d}.xlsx")
+        file_cells, file_hits = generate_workbook(file_path, spec, rng)
+        cells += file_cells
+        hits += file_hits
+        size += os.path.getsize(file_path)
+
+    manifest = {'spec': spec, 'files': spec['files'], 'cells': cells, 'expected_hits': hits, 'bytes': size}
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def peak_rss_kb(children=False):
+    """进程峰值常驻内存（KB），不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以KB为单位
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+def _summarize(runs):
+    return {'runs': runs, 'min': min(runs), 'median': statistics.median(runs)}
+
+
+def measure_search(directory, keywords, engine, workers, repeat, index_path=None):
+    """端到端计时 search_all_excels"""
+    import search_engine
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results, counts = search_engine.search_all_excels(
+            directory, keywords, engine=engine, workers=workers, index_path=index_path)
+        runs.append(time.perf_counter() - start)
+    return dict(_summarize(runs), matches=len(results), occurrences=sum(counts.values()))
+
+
+def measure_stages(directory, keywords, engine, repeat):
+    """
+    分阶段计时（串行，与 search_file 和界面结果存储的处理步骤相同）
+    open: 打开工作簿到产出第一个单元格；parse: 读取其余单元格；
+    match: 关键词匹配并生成紧凑结果项；aggregate: 存入结果存储并合并全局统计
+    """
+    import search_engine
+    from excel_reader import iter_cells
+    from keyword_matcher import get_matcher
+    from result_store import ResultStore
+
+    file_paths = search_engine.find_excel_files(directory)
+    matcher = get_matcher(keywords)
+    totals = {stage: [] for stage in STAGES}
+    cells = matches_count = 0
+
+    for _ in range(repeat):
+        elapsed = dict.fromkeys(STAGES, 0.0)
+        cells = matches_count = 0
+        global_counts = {keyword: 0 for keyword in keywords}
+        store = ResultStore()
+        for file_path in file_paths:
+            start = time.perf_counter()
+            cell_iter = iter_cells(file_path, engine, keywords)
+            first = next(cell_iter, None)
+            opened = time.perf_counter()
+            values = [] if first is None else [first]
+            values.extend(cell_iter)
+            parsed = time.perf_counter()
+
+            matches = []
+            keyword_counts = {keyword: 0 for keyword in keywords}
+            for sheet_name, row_idx, col_idx, value in values:
+                cell_str = str(value)
+                for keyword, count_in_cell in matcher.match(cell_str):
+                    keyword_counts[keyword] += count_in_cell
+                    matches.append((sheet_name, row_idx, col_idx, keyword, cell_str))
+            matched = time.perf_counter()
+
+            store.add_file(file_path, matches, keyword_counts)
+            for keyword, count in keyword_counts.items():
+                global_counts[keyword] += count
+            aggregated = time.perf_counter()
+
+            elapsed['open'] += opened - start
+            elapsed['parse'] += parsed - opened
+            elapsed['match'] += matched - parsed
+            elapsed['aggregate'] += aggregated - matched
+            cells += len(values)
+            matches_count += len(matches)
+        for stage in STAGES:
+            totals[stage].append(elapsed[stage])
+
+    return {'stages': {stage: _summarize(runs) for stage, runs in totals.items()},
+            'cells': cells, 'matches': matches_count}
+
+
+def measure_index(directory, keywords, engine, repeat):
+    """建立全文索引并计时索引查询（使用临时索引文件）"""
+    import search_engine
+    import search_index
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = os.path.join(tmp, 'bench_index.db')
+        start = time.perf_counter()
+        search_index.refresh_index(index_path, search_engine.find_excel_files(directory), directory, engine)
+        build_seconds = time.perf_counter() - start
+        result = measure_search(directory, keywords, engine, 1, repeat, index_path)
+    result['build_seconds'] = build_seconds
+    return result
+
+
+def measure_startup(repeat):
+    """
+    在全新进程中计时界面模块的导入和主窗口的首次绘制，并检查启动时是否加载了应延迟加载的模块
+    没有图形显示环境时只检查导入时间
+    """
+    probe = _STARTUP_PROBE.format(root=os.path.dirname(os.path.abspath(__file__)),
+                                  deferred=STARTUP_DEFERRED_MODULES)
+    from config import CONFIG_DIR_ENV
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, **{CONFIG_DIR_ENV: tmp})
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, '-c', probe], stdout=subprocess.PIPE,
+                                    universal_newlines=True, cwd=tmp, env=env, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    result = {'budget': STARTUP_BUDGET,
+              'import_seconds': _summarize([run['import_seconds'] for run in runs]),
+              'first_window_seconds': None,
+              'window_error': runs[-1]['window_error'],
+              'deferred_loaded': sorted(set(name for run in runs for name in run['loaded']))}
+    if all(run['first_window_seconds'] is not None for run in runs):
+        result['first_window_seconds'] = _summarize([run['first_window_seconds'] for run in runs])
+
+    within_budget = all(result[key] is None or result[key]['median'] <= budget
+                        for key, budget in STARTUP_BUDGET.items())
+    result['verified'] = within_budget and not result['deferred_loaded']
+    return result
+
+
+def run_scenario(name, kwargs):
+    """在独立进程中运行一个场景，使峰值内存只反映该场景"""
+    measure = {'search': measure_search, 'stages': measure_stages, 'index': measure_index}[name]
+    result = measure(**kwargs)
+    result['peak_rss_kb'] = peak_rss_kb()
+    result['children_peak_rss_kb'] = peak_rss_kb(children=True)
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, universal_newlines=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment_info():
+    """运行环境信息，便于对比不同机器和版本的结果"""
+    import openpyxl
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'openpyxl': openpyxl.__version__,
+        'commit': _git_commit(),
+    }
+
+
+def build_parser():
+    """创建命令行参数解析器"""
+    from excel_reader import ENGINES
+
+    parser = argparse.ArgumentParser(description='Benchmark Excel keyword search on a synthetic corpus')
+    corpus = parser.add_argument_group('corpus')
+    corpus.add_argument('--corpus', default=os.path.join(tempfile.gettempdir(), 'excel_search_benchmark'),
+                        help='corpus directory, reused when generated with the same parameters '
+                             '(default: %(default)s)')
+    for name, default in CORPUS_DEFAULTS.items():
+        corpus.add_argument('--' + name.replace('_', '-'), dest=name, type=type(default), default=default,
+                            help='(default: %(default)s)')
+
+    parser.add_argument('--engines', default=','.join(ENGINES),
+                        help='comma-separated reader engines (default: %(default)s)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 0],
+                        help='worker counts to benchmark, 0 = all CPU cores (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per scenario (default: %(default)s)')
+    parser.add_argument('--index', action='store_true', help='also benchmark building and querying the index')
+    parser.add_argument('--startup', action='store_true',
+                        help='also check GUI import and first-window time against the startup budget '
+                             '(use --engines "" to run only this check)')
+    parser.add_argument('-o', '--output', default=None, help='write JSON results to this file instead of stdout')
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = build_parser().parse_args(argv)
+    spec = {name: getattr(args, name) for name in CORPUS_DEFAULTS}
+    engines = [engine.strip() for engine in args.engines.split(',') if engine.strip()]
+    keywords = [spec['keyword']]
+
+    corpus = None
+    if engines:
+        print(f"Generating corpus in {args.corpus} ...", file=sys.stderr)
+        corpus = generate_corpus(args.corpus, spec)
+
+    scenarios = []
+    for engine in engines:
+        scenarios.append(('stages', {'engine': engine}))
+        for workers in args.workers:
+            scenarios.append(('search', {'engine': engine, 'workers': workers}))
+        if args.index:
+            scenarios.append(('index', {'engine': engine}))
+
+    results = []
+    if args.startup:
+        result = dict({'scenario': 'startup'}, **measure_startup(args.repeat))
+        results.append(result)
+        window = result['first_window_seconds']
+        window_text = f"{window['median']:.3f}s" if window is not None else f"n/a ({result['window_error']})"
+        print(f"startup import={result['import_seconds']['median']:.3f}s  first_window={window_text}  "
+              f"deferred_loaded={result['deferred_loaded']}  within_budget={result['verified']}", file=sys.stderr)
+
+    # spawn 保证每个场景在全新进程中运行，不继承之前场景的内存占用和缓存
+    context = get_context('spawn')
+    for name, params in scenarios:
+        kwargs = dict(params, directory=args.corpus, keywords=keywords, repeat=args.repeat)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_scenario, name, kwargs).result()
+        result = dict({'scenario': name}, **params, **result)
+        hits = result.get('matches')
+        result['verified'] = hits == corpus['expected_hits']
+        results.append(result)
+
+        seconds = sum(stage['min'] for stage in result['stages'].values()) if name == 'stages' else result['min']
+        label = ' '.join(f"{key}={value}" for key, value in params.items())
+        print(f"{name:<7} {label:<32} {seconds:8.3f}s  matches={hits}  peak_rss={result['peak_rss_kb']} KB",
+              file=sys.stderr)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': environment_info(),
+        'corpus': corpus,
+        'keywords': keywords,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    return 0 if all(result['verified'] for result in results) else 1
+
+
+if __name__ == "__main__":
+    freeze_support()
+    sys.exit(main())
@@ -1,52 +1,170 @@
 """
 配置管理模块
 用于保存和读取用户设置，包括语言偏好
+配置文件保存在用户配置目录中；修改先保存在内存，延迟合并写入（退出时也会写入），
+写入时先写临时文件再替换，程序崩溃不会留下写了一半的配置文件
 """
+import atexit
+import copy
 import json
 import os
+import sys
+import tempfile
+import threading
+
+import file_discovery
+
+CONFIG_FILE_NAME = 'config.json'
+INDEX_FILE_NAME = 'search_index.db'
+# 配置目录名，可用环境变量 EXCEL_SEARCH_CONFIG_DIR 指定其他目录（如便携版）
+APP_DIR_NAME = 'excel-keyword-search'
+CONFIG_DIR_ENV = 'EXCEL_SEARCH_CONFIG_DIR'
+# 最后一次修改后多久写入配置文件（秒）
+SAVE_DELAY = 1.0
+
+
+def get_config_dir():
+    """用户配置目录：Windows 为 %APPDATA%，macOS 为 ~/Library/Application Support，其他系统遵循 XDG 规范"""
+    custom_dir = os.environ.get(CONFIG_DIR_ENV)
+    if custom_dir:
+        return custom_dir
+    if sys.platform == 'win32':
+        base_dir = os.environ.get('APPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base_dir = os.path.expanduser('~/Library/Application Support')
+    else:
+        base_dir = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    return os.path.join(base_dir, APP_DIR_NAME)
+
+
+def get_default_index_path():
+    """全文索引数据库的默认位置（用户配置目录中）"""
+    return os.path.join(get_config_dir(), INDEX_FILE_NAME)
+
 
 class Config:
-    def __init__(self, config_file='config.json'):
-        self.config_file = config_file
+    def __init__(self, config_file=None, save_delay=SAVE_DELAY):
+        """
+        :param config_file: 配置文件路径，为 None 时使用用户配置目录中的 config.json
+        :param save_delay: 修改后延迟写入的秒数，0 表示每次修改立即写入
+        """
+        self.config_file = config_file or os.path.join(get_config_dir(), CONFIG_FILE_NAME)
+        self.save_delay = save_delay
+        self._lock = threading.Lock()        # 保护配置内容和写入计划
+        self._write_lock = threading.Lock()  # 保证先取得的内容先写入
+        self._dirty = False
+        self._timer = None
         self.default_config = {
             'language': 'auto',  # auto, zh_CN, en
             'window_geometry': '1000x550',
             'last_search_path': '',
-            'theme': 'default'
+            'theme': 'default',
+            'reader_engine': 'prefilter',  # full, streaming, prefilter
+            'search_workers': 0,  # 并行搜索进程数，0 表示使用全部CPU核心，1 为串行
+            'use_index': False,  # 是否优先查询全文索引
+            'index_path': get_default_index_path(),  # 全文索引数据库位置
+            'index_use_hash': False,  # 增量刷新索引时是否比较文件内容哈希
+            'collect_stats': False,  # 是否收集每个文件的耗时等统计信息
+            'stats_top_n': 10,  # 搜索报告中列出的最慢文件数
+            'max_file_size_mb': 0,  # 超过此大小（MB）的文件不读取，0 表示不限制
+            'max_cells_per_sheet': 0,  # 每个工作表最多读取的单元格数，0 表示不限制
+            'file_timeout': 0,  # 单个文件的搜索时间限制（秒），超时终止，0 表示不限制
+            'max_results': 0,  # 结果数达到此数量后停止搜索，0 表示不限制
+            'search_mode': 'all',  # 搜索方式：all 全部匹配项，files 只找文件，count 只统计次数
+            'include_patterns': list(file_discovery.DEFAULT_INCLUDE_PATTERNS),  # 要搜索的文件名通配符
+            # 跳过的文件和目录通配符（含 / 时匹配相对路径），匹配的目录整个跳过
+            'exclude_patterns': list(file_discovery.DEFAULT_EXCLUDE_PATTERNS),
+            'discovery_workers': 8,  # 并行遍历目录的线程数
+            'discovery_cache_ttl': 30,  # 目录列表缓存有效期（秒），0 表示每次搜索都重新遍历
+            'ignore_case': False,  # 关键词不区分大小写
+            'whole_word': False,  # 全词匹配
+            'use_regex': False,  # 关键词按正则表达式解释
+            'regex_timeout': 30,  # 正则表达式模式下单个文件的时间限制（秒），0 表示不限制
+            'result_cache_mb': 256,  # 会话内缓存搜索结果和单元格文本的内存上限（MB），0 表示不缓存
+            'dedupe_files': False,  # 内容完全相同的文件只搜索一次
+            # 搜索范围，各项为列表：sheets/exclude_sheets 工作表名通配符，columns 列字母，
+            # headers 表头名称，ranges 单元格区域；全部为空时搜索整个工作簿
+            'search_scope': {'sheets': [], 'exclude_sheets': [], 'columns': [], 'headers': [], 'ranges': []},
+            'live_search': False,  # 边输入边搜索：目录中的单元格文本常驻内存，修改关键词时直接查询
+            'live_search_max_results': 10000,  # 边输入边搜索时每次最多显示的结果数，0 表示不限制
+            'live_index_mb': 1024,  # 内存索引的内存上限（MB），0 表示不限制
+            'result_memory_mb': 512,  # 结果表格的内存上限（MB），超出后结果暂存到磁盘，0 表示不限制
+            'result_spill_dir': '',  # 结果暂存到磁盘时的目录，为空时使用系统临时目录
+            'search_server': '',  # 搜索服务地址（如 http://127.0.0.1:8765），设置后由服务执行搜索，为空时在本机搜索
+            'server_port': 8765  # 启动搜索服务时监听的端口
         }
         self.config = self.load_config()
+        # 退出前写入尚未保存的修改
+        atexit.register(self.flush)
     
     def load_config(self):
-        """加载配置文件"""
-        if os.path.exists(self.config_file):
+        """加载配置文件（用户配置目录中还没有配置文件时，沿用旧版本保存在当前目录的 config.json）"""
+        config_file = self.config_file
+        if not os.path.exists(config_file) and os.path.exists(CONFIG_FILE_NAME):
+            config_file = CONFIG_FILE_NAME
+        if os.path.exists(config_file):
             try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
+                with open(config_file, 'r', encoding='utf-8') as f:
                     config = json.load(f)
                 # 合并默认配置和用户配置
-                merged_config = self.default_config.copy()
+                merged_config = copy.deepcopy(self.default_config)
                 merged_config.update(config)
                 return merged_config
             except Exception as e:
                 print(f"Failed to load config: {e}")
         
-        return self.default_config.copy()
+        return copy.deepcopy(self.default_config)
     
     def save_config(self):
-        """保存配置文件"""
+        """立即保存配置文件（先写临时文件，再替换原文件）"""
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                self._dirty = False
+                data = json.dumps(self.config, ensure_ascii=False, indent=2)
+            self._write(data)
+    
+    def _write(self, data):
+        temp_path = None
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
+            config_dir = os.path.dirname(os.path.abspath(self.config_file))
+            os.makedirs(config_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix='.config-', suffix='.tmp', dir=config_dir)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.config_file)
         except Exception as e:
             print(f"Failed to save config: {e}")
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def flush(self):
+        """写入尚未保存的修改"""
+        if self._dirty:
+            self.save_config()
     
     def get(self, key, default=None):
-        """获取配置值"""
+        """获取配置值（列表和字典等可变的值请使用返回副本的专用方法）"""
         return self.config.get(key, default)
     
     def set(self, key, value):
-        """设置配置值"""
-        self.config[key] = value
-        self.save_config()
+        """设置配置值（值未改变时不写入；同一时段内的多次修改合并为一次写入）"""
+        with self._lock:
+            if key in self.config and self.config[key] == value:
+                return
+            # 保存副本，调用方之后修改传入的列表或字典不影响配置
+            self.config[key] = copy.deepcopy(value)
+            self._dirty = True
+            if self.save_delay and self._timer is None:
+                self._timer = threading.Timer(self.save_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if not self.save_delay:
+            self.save_config()
     
     def get_language(self):
         """获取语言设置"""
@@ -71,10 +189,253 @@ class Config:
     def set_last_search_path(self, path):
         """设置上次搜索路径"""
         self.set('last_search_path', path)
+    
+    def get_reader_engine(self):
+        """获取Excel读取引擎"""
+        return self.get('reader_engine', 'prefilter')
+    
+    def set_reader_engine(self, engine):
+        """设置Excel读取引擎"""
+        self.set('reader_engine', engine)
+    
+    def get_search_workers(self):
+        """获取并行搜索进程数"""
+        return self.get('search_workers', 0)
+    
+    def set_search_workers(self, workers):
+        """设置并行搜索进程数"""
+        self.set('search_workers', workers)
+    
+    def get_use_index(self):
+        """获取是否使用全文索引"""
+        return self.get('use_index', False)
+    
+    def set_use_index(self, use_index):
+        """设置是否使用全文索引"""
+        self.set('use_index', use_index)
+    
+    def get_index_path(self):
+        """获取全文索引数据库位置"""
+        return self.get('index_path', get_default_index_path())
+    
+    def set_index_path(self, path):
+        """设置全文索引数据库位置"""
+        self.set('index_path', path)
+    
+    def get_index_use_hash(self):
+        """获取增量刷新索引时是否比较内容哈希"""
+        return self.get('index_use_hash', False)
+    
+    def set_index_use_hash(self, use_hash):
+        """设置增量刷新索引时是否比较内容哈希"""
+        self.set('index_use_hash', use_hash)
+    
+    def get_collect_stats(self):
+        """获取是否收集每个文件的统计信息"""
+        return self.get('collect_stats', False)
+    
+    def set_collect_stats(self, collect_stats):
+        """设置是否收集每个文件的统计信息"""
+        self.set('collect_stats', collect_stats)
+    
+    def get_stats_top_n(self):
+        """获取搜索报告中列出的最慢文件数"""
+        return self.get('stats_top_n', 10)
+    
+    def set_stats_top_n(self, top_n):
+        """设置搜索报告中列出的最慢文件数"""
+        self.set('stats_top_n', top_n)
+    
+    def get_max_file_size_mb(self):
+        """获取文件大小限制（MB）"""
+        return self.get('max_file_size_mb', 0)
+    
+    def set_max_file_size_mb(self, size_mb):
+        """设置文件大小限制（MB）"""
+        self.set('max_file_size_mb', size_mb)
+    
+    def get_max_cells_per_sheet(self):
+        """获取每个工作表的单元格数限制"""
+        return self.get('max_cells_per_sheet', 0)
+    
+    def set_max_cells_per_sheet(self, max_cells):
+        """设置每个工作表的单元格数限制"""
+        self.set('max_cells_per_sheet', max_cells)
+    
+    def get_file_timeout(self):
+        """获取单个文件的搜索时间限制（秒）"""
+        return self.get('file_timeout', 0)
+    
+    def set_file_timeout(self, timeout):
+        """设置单个文件的搜索时间限制（秒）"""
+        self.set('file_timeout', timeout)
+    
+    def get_max_results(self):
+        """获取结果数上限"""
+        return self.get('max_results', 0)
+    
+    def set_max_results(self, count):
+        """设置结果数上限"""
+        self.set('max_results', count)
+    
+    def get_search_mode(self):
+        """获取搜索方式"""
+        return self.get('search_mode', 'all')
+    
+    def set_search_mode(self, mode):
+        """设置搜索方式"""
+        self.set('search_mode', mode)
+    
+    def get_include_patterns(self):
+        """获取要搜索的文件名通配符"""
+        return list(self.get('include_patterns', self.default_config['include_patterns']))
+    
+    def set_include_patterns(self, patterns):
+        """设置要搜索的文件名通配符"""
+        self.set('include_patterns', patterns)
+    
+    def get_exclude_patterns(self):
+        """获取跳过的文件和目录通配符"""
+        return list(self.get('exclude_patterns', self.default_config['exclude_patterns']))
+    
+    def set_exclude_patterns(self, patterns):
+        """设置跳过的文件和目录通配符"""
+        self.set('exclude_patterns', patterns)
+    
+    def get_discovery_workers(self):
+        """获取并行遍历目录的线程数"""
+        return self.get('discovery_workers', 8)
+    
+    def set_discovery_workers(self, workers):
+        """设置并行遍历目录的线程数"""
+        self.set('discovery_workers', workers)
+    
+    def get_discovery_cache_ttl(self):
+        """获取目录列表缓存有效期（秒）"""
+        return self.get('discovery_cache_ttl', 30)
+    
+    def set_discovery_cache_ttl(self, ttl):
+        """设置目录列表缓存有效期（秒）"""
+        self.set('discovery_cache_ttl', ttl)
+    
+    def get_ignore_case(self):
+        """获取是否不区分大小写"""
+        return self.get('ignore_case', False)
+    
+    def set_ignore_case(self, enabled):
+        """设置是否不区分大小写"""
+        self.set('ignore_case', enabled)
+    
+    def get_whole_word(self):
+        """获取是否全词匹配"""
+        return self.get('whole_word', False)
+    
+    def set_whole_word(self, enabled):
+        """设置是否全词匹配"""
+        self.set('whole_word', enabled)
+    
+    def get_use_regex(self):
+        """获取是否按正则表达式解释关键词"""
+        return self.get('use_regex', False)
+    
+    def set_use_regex(self, enabled):
+        """设置是否按正则表达式解释关键词"""
+        self.set('use_regex', enabled)
+    
+    def get_regex_timeout(self):
+        """获取正则表达式模式下单个文件的时间限制（秒）"""
+        return self.get('regex_timeout', 30)
+    
+    def set_regex_timeout(self, timeout):
+        """设置正则表达式模式下单个文件的时间限制（秒）"""
+        self.set('regex_timeout', timeout)
+    
+    def get_result_cache_mb(self):
+        """获取会话搜索缓存的内存上限（MB）"""
+        return self.get('result_cache_mb', 256)
+    
+    def set_result_cache_mb(self, size_mb):
+        """设置会话搜索缓存的内存上限（MB）"""
+        self.set('result_cache_mb', size_mb)
+    
+    def get_dedupe_files(self):
+        """获取是否只搜索一次内容相同的文件"""
+        return self.get('dedupe_files', False)
+    
+    def set_dedupe_files(self, enabled):
+        """设置是否只搜索一次内容相同的文件"""
+        self.set('dedupe_files', enabled)
+    
+    def get_search_scope(self):
+        """获取搜索范围 {项: 字符串列表}，见 search_scope.make_scope"""
+        return copy.deepcopy(self.get('search_scope', self.default_config['search_scope']))
+    
+    def set_search_scope(self, scope):
+        """设置搜索范围"""
+        self.set('search_scope', scope)
+    
+    def get_live_search(self):
+        """获取是否边输入边搜索"""
+        return self.get('live_search', False)
+    
+    def set_live_search(self, enabled):
+        """设置是否边输入边搜索"""
+        self.set('live_search', enabled)
+    
+    def get_live_search_max_results(self):
+        """获取边输入边搜索时每次最多显示的结果数"""
+        return self.get('live_search_max_results', 10000)
+    
+    def set_live_search_max_results(self, count):
+        """设置边输入边搜索时每次最多显示的结果数"""
+        self.set('live_search_max_results', count)
+    
+    def get_live_index_mb(self):
+        """获取内存索引的内存上限（MB）"""
+        return self.get('live_index_mb', 1024)
+    
+    def set_live_index_mb(self, size_mb):
+        """设置内存索引的内存上限（MB）"""
+        self.set('live_index_mb', size_mb)
+    
+    def get_result_memory_mb(self):
+        """获取结果表格的内存上限（MB）"""
+        return self.get('result_memory_mb', 512)
+    
+    def set_result_memory_mb(self, size_mb):
+        """设置结果表格的内存上限（MB）"""
+        self.set('result_memory_mb', size_mb)
+    
+    def get_result_spill_dir(self):
+        """获取结果暂存到磁盘时的目录，为空时使用系统临时目录"""
+        return self.get('result_spill_dir', '')
+    
+    def set_result_spill_dir(self, directory):
+        """设置结果暂存到磁盘时的目录"""
+        self.set('result_spill_dir', directory)
+    
+    def get_search_server(self):
+        """获取搜索服务地址，为空时在本机搜索"""
+        return self.get('search_server', '')
+    
+    def set_search_server(self, url):
+        """设置搜索服务地址"""
+        self.set('search_server', url)
+    
+    def get_server_port(self):
+        """获取搜索服务监听的端口"""
+        return self.get('server_port', 8765)
+    
+    def set_server_port(self, port):
+        """设置搜索服务监听的端口"""
+        self.set('server_port', port)
 
-# 全局配置实例
-_config = Config()
+# 全局配置实例，第一次使用时才读取配置文件
+_config = None
 
 def get_config():
     """获取配置实例"""
+    global _config
+    if _config is None:
+        _config = Config()
     return _config
@@ -1,72 +1,38 @@
 import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from openpyxl import load_workbook
 import csv
 import subprocess
 import platform
+import multiprocessing
 
-def search_excel(file_path, keywords):
-    matches = []
-    keyword_counts = {keyword: 0 for keyword in keywords}  # 初始化所有关键词计数
-    
-    try:
-        wb = load_workbook(file_path, data_only=True)
-        
-        # 第一遍：收集匹配项并统计关键词总数
-        for sheet_name in wb.sheetnames:
-            sheet = wb[sheet_name]
-            for row in sheet.iter_rows():
-                for cell in row:
-                    if cell.value is not None:
-                        cell_str = str(cell.value)
-                        for keyword in keywords:
-                            if keyword in cell_str:
-                                # 统计关键词在当前单元格中的出现次数
-                                count_in_cell = cell_str.count(keyword)
-                                keyword_counts[keyword] += count_in_cell
-                                
-                                # 暂时只存储基本匹配信息
-                                matches.append([
-                                    os.path.basename(file_path),
-                                    sheet_name,
-                                    cell.coordinate,
-                                    keyword,  # 暂时只存储关键词
-                                    cell_str,
-                                    file_path
-                                ])
-        wb.close()
-    except Exception as e:
-        print(f"[错误] 处理文件失败：{file_path}，原因：{e}")
+from excel_reader import DEFAULT_ENGINE
+import search_engine
+
+def format_keyword_label(keyword, count):
+    return f"{keyword} (本文件共{count}次)"
+
+def report_file_error(file_path, error):
+    print(f"[错误] 处理文件失败：{file_path}，原因：{error}")
+
+def search_excel(file_path, keywords, engine=DEFAULT_ENGINE):
+    matches, keyword_counts, error = search_engine.search_excel(file_path, keywords, engine)
+    if error is not None:
+        report_file_error(file_path, error)
     
-    # 第二遍：为每个匹配项添加完整的统计信息
-    final_matches = []
-    for match in matches:
-        keyword = match[3]
-        total_count = keyword_counts[keyword]
-        updated_match = match.copy()
-        updated_match[3] = f"{keyword} (本文件共{total_count}次)"
-        final_matches.append(updated_match)
+    # 为每个匹配项添加完整的统计信息
+    final_matches = search_engine.add_keyword_totals(matches, keyword_counts, format_keyword_label)
     
     # 返回匹配结果和该文件的关键词统计
     return final_matches, keyword_counts
 
-def search_all_excels(directory, keywords):
-    results = []
-    global_keyword_counts = {keyword: 0 for keyword in keywords}  # 全局关键词统计
-    
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith('.xlsx'):
-                file_path = os.path.join(root, file)
-                file_results, file_keyword_counts = search_excel(file_path, keywords)
-                results += file_results
-                
-                # 累加到全局统计
-                for keyword, count in file_keyword_counts.items():
-                    global_keyword_counts[keyword] += count
-    
-    return results, global_keyword_counts
+def search_all_excels(directory, keywords, engine=DEFAULT_ENGINE, workers=0):
+    # 默认使用全部CPU核心并行搜索，workers=1 时串行
+    return search_engine.search_all_excels(
+        directory, keywords, engine, workers,
+        format_label=format_keyword_label,
+        on_error=report_file_error
+    )
 
 def browse_directory():
     global path_var
@@ -241,4 +207,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # 打包后的程序使用多进程搜索时需要
+    multiprocessing.freeze_support()
     main()
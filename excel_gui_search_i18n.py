@@ -1,14 +1,35 @@
 import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from openpyxl import load_workbook
-import csv
-import subprocess
-import platform
+import multiprocessing
+import queue
+import re
+import threading
+import time
 
 # 导入国际化支持
 from i18n import init_i18n, t, set_language, get_available_languages, get_language_name, get_current_language
 from config import get_config
+from excel_reader import ENGINES
+from keyword_matcher import EXACT_MATCH, get_matcher, make_match_options
+import search_engine
+from result_store import ResultStore
+from result_export import export_rows_csv
+from search_cache import SearchCache
+from search_scope import SCOPE_FIELDS, make_scope
+from search_stats import SearchReport
+from virtual_tree import VirtualTreeview
+
+# 后台搜索结果的轮询间隔（毫秒）
+QUEUE_POLL_INTERVAL_MS = 100
+# 结果筛选输入停止多久后才执行筛选（毫秒）
+FILTER_DELAY_MS = 300
+# 表格列标题后的排序方向标记
+SORT_MARKS = {False: ' ▲', True: ' ▼'}
+# 边输入边搜索：关键词输入停止多久后才查询（毫秒）
+LIVE_SEARCH_DELAY_MS = 150
+# 边输入边搜索时，短于此长度的英文数字关键词不查询（几乎每个单元格都包含）
+LIVE_MIN_KEYWORD_LENGTH = 2
 
 class ExcelSearchApp:
     def __init__(self):
@@ -21,7 +42,21 @@ class ExcelSearchApp:
         # 初始化主窗口
         self.root = tk.Tk()
         self.setup_variables()
-        self.current_search_results = []
+        # 结果超过内存上限后暂存到磁盘
+        self.result_store = ResultStore(self.format_result_label, self.format_file_label,
+                                        self.config.get_result_memory_mb() * 1024 * 1024,
+                                        self.config.get_result_spill_dir() or None)
+        self.filter_job = None
+        self.single_file_path = None
+        self.search_report = None
+        # 会话搜索缓存，重复搜索未变化的文件时不再重新读取
+        self.search_cache = SearchCache()
+        # 边输入边搜索的内存索引（warm_index.WarmIndex），第一次搜索时建立
+        self.warm_index = None
+        self.live_job = None
+        self.export_thread = None
+        self.search_thread = None
+        self.cancel_event = None
         self.create_ui()
         
         # 恢复上次搜索路径
@@ -33,7 +68,13 @@ class ExcelSearchApp:
         """设置界面变量"""
         self.path_var = tk.StringVar()
         self.keywords_var = tk.StringVar()
+        self.keywords_var.trace_add("write", lambda *args: self.schedule_live_search())
         self.status_var = tk.StringVar(value=t('ready'))
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *args: self.schedule_filter())
+        self.ignore_case_var = tk.BooleanVar(value=self.config.get_ignore_case())
+        self.whole_word_var = tk.BooleanVar(value=self.config.get_whole_word())
+        self.use_regex_var = tk.BooleanVar(value=self.config.get_use_regex())
         
     def create_ui(self):
         """创建用户界面"""
@@ -67,6 +108,71 @@ class ExcelSearchApp:
                 label=lang_name,
                 command=lambda lc=lang_code: self.change_language(lc)
             )
+        
+        # 读取引擎菜单
+        engine_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label=t('reader_engine'), menu=engine_menu)
+        
+        self.engine_var = tk.StringVar(value=self.config.get_reader_engine())
+        for engine in ENGINES:
+            engine_menu.add_radiobutton(
+                label=t(f'engine_{engine}'),
+                value=engine,
+                variable=self.engine_var,
+                command=lambda e=engine: self.config.set_reader_engine(e)
+            )
+        engine_menu.add_separator()
+        self.dedupe_files_var = tk.BooleanVar(value=self.config.get_dedupe_files())
+        engine_menu.add_checkbutton(
+            label=t('dedupe_files'),
+            variable=self.dedupe_files_var,
+            command=lambda: self.config.set_dedupe_files(self.dedupe_files_var.get())
+        )
+        
+        # 搜索方式菜单
+        mode_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label=t('search_mode_menu'), menu=mode_menu)
+        
+        self.search_mode_var = tk.StringVar(value=self.config.get_search_mode())
+        for mode in search_engine.SEARCH_MODES:
+            mode_menu.add_radiobutton(
+                label=t(f'search_mode_{mode}'),
+                value=mode,
+                variable=self.search_mode_var,
+                command=lambda m=mode: self.config.set_search_mode(m)
+            )
+        mode_menu.add_separator()
+        mode_menu.add_command(label=t('search_scope_menu'), command=self.edit_search_scope)
+        self.live_search_var = tk.BooleanVar(value=self.config.get_live_search())
+        mode_menu.add_checkbutton(
+            label=t('live_search'),
+            variable=self.live_search_var,
+            command=self.toggle_live_search
+        )
+        
+        # 全文索引菜单
+        index_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label=t('index_menu'), menu=index_menu)
+        
+        self.use_index_var = tk.BooleanVar(value=self.config.get_use_index())
+        index_menu.add_checkbutton(
+            label=t('use_index'),
+            variable=self.use_index_var,
+            command=lambda: self.config.set_use_index(self.use_index_var.get())
+        )
+        index_menu.add_command(label=t('build_index'), command=self.start_build_index)
+        
+        # 搜索报告菜单
+        report_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label=t('report_menu'), menu=report_menu)
+        
+        self.collect_stats_var = tk.BooleanVar(value=self.config.get_collect_stats())
+        report_menu.add_checkbutton(
+            label=t('collect_stats'),
+            variable=self.collect_stats_var,
+            command=lambda: self.config.set_collect_stats(self.collect_stats_var.get())
+        )
+        report_menu.add_command(label=t('show_report'), command=self.show_search_report)
     
     def create_main_interface(self):
         """创建主界面"""
@@ -91,6 +197,20 @@ class ExcelSearchApp:
         
         tk.Entry(frame_mid, textvariable=self.keywords_var, width=50).pack(side="left", padx=5)
         
+        # 匹配方式
+        self.ignore_case_check = tk.Checkbutton(
+            frame_mid, text=t('ignore_case'), variable=self.ignore_case_var,
+            command=lambda: self.set_match_option(self.config.set_ignore_case, self.ignore_case_var))
+        self.ignore_case_check.pack(side="left")
+        self.whole_word_check = tk.Checkbutton(
+            frame_mid, text=t('whole_word'), variable=self.whole_word_var,
+            command=lambda: self.set_match_option(self.config.set_whole_word, self.whole_word_var))
+        self.whole_word_check.pack(side="left")
+        self.use_regex_check = tk.Checkbutton(
+            frame_mid, text=t('use_regex'), variable=self.use_regex_var,
+            command=lambda: self.set_match_option(self.config.set_use_regex, self.use_regex_var))
+        self.use_regex_check.pack(side="left")
+        
         # 按钮框架
         frame_btn = tk.Frame(self.root)
         frame_btn.pack(fill="x", padx=10, pady=5)
@@ -98,12 +218,19 @@ class ExcelSearchApp:
         self.search_btn = tk.Button(frame_btn, text=t('search_excel'), command=self.start_search)
         self.search_btn.pack(side="left")
         
+        self.cancel_btn = tk.Button(frame_btn, text=t('cancel'), command=self.cancel_search, state="disabled")
+        self.cancel_btn.pack(side="left", padx=10)
+        
         self.export_btn = tk.Button(frame_btn, text=t('export_csv'), command=self.export_csv)
         self.export_btn.pack(side="left", padx=10)
         
         self.open_btn = tk.Button(frame_btn, text=t('open_file'), command=self.open_file)
         self.open_btn.pack(side="left", padx=10)
         
+        tk.Entry(frame_btn, textvariable=self.filter_var, width=30).pack(side="right")
+        self.filter_label = tk.Label(frame_btn, text=t('filter_results'))
+        self.filter_label.pack(side="right")
+        
         # 结果显示表格
         self.create_result_tree()
         
@@ -112,16 +239,49 @@ class ExcelSearchApp:
         self.status_bar.pack(fill="x")
     
     def create_result_tree(self):
-        """创建结果显示表格"""
+        """创建结果显示表格（虚拟化：表格只显示可见窗口的行，全部结果保存在 result_store 中）"""
         columns = [t('file_name'), t('worksheet'), t('cell'), t('keyword'), t('content'), t('file_path')]
-        self.tree = ttk.Treeview(self.root, columns=columns, show="headings")
+        self.result_view = VirtualTreeview(self.root, columns, self.result_store)
+        self.tree = self.result_view.tree
         
-        for col in columns:
-            self.tree.heading(col, text=col)
+        for i, col in enumerate(columns):
+            self.tree.heading(col, text=col, command=lambda c=i: self.sort_results(c))
             width = 150 if col not in [t('content'), t('file_path')] else 300
             self.tree.column(col, width=width)
         
-        self.tree.pack(fill="both", expand=True, padx=10, pady=5)
+        self.result_view.pack(fill="both", expand=True, padx=10, pady=5)
+    
+    def update_headings(self):
+        """更新表格列标题（当前语言和排序标记）"""
+        columns = [t('file_name'), t('worksheet'), t('cell'), t('keyword'), t('content'), t('file_path')]
+        for i, col in enumerate(columns):
+            if i == self.result_store.sort_column:
+                col += SORT_MARKS[self.result_store.sort_reverse]
+            self.tree.heading(f"#{i+1}", text=col)
+    
+    def sort_results(self, column):
+        """点击列标题排序：升序、降序、恢复原始顺序循环切换"""
+        store = self.result_store
+        if store.sort_column != column:
+            store.sort(column)
+        elif not store.sort_reverse:
+            store.sort(column, reverse=True)
+        else:
+            store.sort(None)
+        self.update_headings()
+        self.result_view.reset()
+    
+    def schedule_filter(self):
+        """输入筛选文本后延迟执行筛选，避免每输入一个字符都遍历全部结果"""
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(FILTER_DELAY_MS, self.apply_filter)
+    
+    def apply_filter(self):
+        """按筛选文本过滤结果"""
+        self.filter_job = None
+        self.result_store.filter(self.filter_var.get())
+        self.result_view.reset()
     
     def change_language(self, language):
         """切换语言"""
@@ -138,13 +298,18 @@ class ExcelSearchApp:
         self.keywords_label.config(text=t('keywords'))
         self.browse_btn.config(text=t('browse'))
         self.search_btn.config(text=t('search_excel'))
+        self.cancel_btn.config(text=t('cancel'))
         self.export_btn.config(text=t('export_csv'))
         self.open_btn.config(text=t('open_file'))
+        self.filter_label.config(text=t('filter_results'))
+        self.ignore_case_check.config(text=t('ignore_case'))
+        self.whole_word_check.config(text=t('whole_word'))
+        self.use_regex_check.config(text=t('use_regex'))
         
-        # 更新表格列标题
-        columns = [t('file_name'), t('worksheet'), t('cell'), t('keyword'), t('content'), t('file_path')]
-        for i, col in enumerate(columns):
-            self.tree.heading(f"#{i+1}", text=col)
+        # 更新表格列标题和关键词列文本
+        self.update_headings()
+        self.result_store.relabel()
+        self.result_view.refresh()
             
         # 重新创建菜单以更新语言
         self.create_menu()
@@ -153,69 +318,132 @@ class ExcelSearchApp:
         """更新窗口标题"""
         self.root.title(t('app_title'))
     
-    def search_excel(self, file_path, keywords):
-        """搜索Excel文件"""
-        matches = []
-        keyword_counts = {keyword: 0 for keyword in keywords}
+    def format_keyword_label(self, keyword, count):
+        """生成关键词列显示文本（附加本文件内总次数）"""
+        return f"{keyword}{t('total_occurrences', count=count)}"
+    
+    def format_result_label(self, keyword, count, partial):
+        """结果表格关键词列的显示文本，结果不完整的文件附加标注"""
+        label = self.format_keyword_label(keyword, count)
+        if partial is not None:
+            label += t('partial_marker')
+        return label
+    
+    def format_file_label(self, file_name, duplicate_of):
+        """结果表格文件名列的显示文本，重复文件标注内容相同的第一个文件"""
+        return file_name + t('duplicate_marker', path=duplicate_of)
+    
+    def report_file_error(self, file_path, error):
+        """输出单个文件的处理错误"""
+        print(t('processing_error', filepath=file_path, error=error))
+    
+    def report_partial_file(self, file_path, reason):
+        """输出因超出处理限制而结果不完整的文件"""
+        print(t('partial_file', filepath=file_path, reason=t(f'partial_{reason}')))
+    
+    def get_search_limits(self):
+        """根据配置创建单个文件的处理限制"""
+        return search_engine.make_limits(self.config.get_max_file_size_mb(),
+                                         self.config.get_max_cells_per_sheet(),
+                                         self.config.get_file_timeout(),
+                                         self.config.get_max_results())
+    
+    def get_search_cache(self):
+        """按配置的内存上限返回会话搜索缓存，上限为 0 时不使用缓存"""
+        max_bytes = int(self.config.get_result_cache_mb() * 1024 * 1024)
+        self.search_cache.set_max_bytes(max_bytes)
+        return self.search_cache if max_bytes > 0 else None
+    
+    def get_search_scope(self):
+        """根据配置创建搜索范围，未限定时返回 None；格式有误时抛出 ValueError"""
+        spec = self.config.get_search_scope()
+        return make_scope(**{field: spec.get(field) for field in SCOPE_FIELDS})
+    
+    def edit_search_scope(self):
+        """编辑搜索范围：每项为逗号分隔的列表，保存前检查格式"""
+        window = tk.Toplevel(self.root)
+        window.title(t('search_scope'))
+        window.transient(self.root)
         
-        try:
-            wb = load_workbook(file_path, data_only=True)
-            
-            # 第一遍：收集所有匹配的单元格，同时统计关键词总数
-            for sheet_name in wb.sheetnames:
-                sheet = wb[sheet_name]
-                for row in sheet.iter_rows():
-                    for cell in row:
-                        if cell.value is not None:
-                            cell_str = str(cell.value)
-                            for keyword in keywords:
-                                if keyword in cell_str:
-                                    # 统计该关键词在当前单元格中的出现次数
-                                    count_in_cell = cell_str.count(keyword)
-                                    keyword_counts[keyword] += count_in_cell
-                                    
-                                    # 只存储匹配项，关键词信息稍后添加
-                                    matches.append([
-                                        os.path.basename(file_path),
-                                        sheet_name,
-                                        cell.coordinate,
-                                        keyword,  # 暂时只存储关键词
-                                        cell_str,
-                                        file_path
-                                    ])
-            wb.close()
-            
-        except Exception as e:
-            print(t('processing_error', filepath=file_path, error=str(e)))
+        spec = self.config.get_search_scope()
+        variables = {}
+        for row, field in enumerate(SCOPE_FIELDS):
+            tk.Label(window, text=t(f'scope_{field}'), anchor="w").grid(row=row, column=0, sticky="w", padx=10, pady=3)
+            variables[field] = tk.StringVar(value=", ".join(spec.get(field) or ()))
+            tk.Entry(window, textvariable=variables[field], width=50).grid(row=row, column=1, padx=10, pady=3)
+        tk.Label(window, text=t('scope_hint'), anchor="w", justify="left").grid(
+            row=len(SCOPE_FIELDS), column=0, columnspan=2, sticky="w", padx=10, pady=5)
+        
+        def save():
+            values = {field: [item.strip() for item in variable.get().split(",") if item.strip()]
+                      for field, variable in variables.items()}
+            try:
+                make_scope(**values)
+            except ValueError as e:
+                messagebox.showerror(t('error'), t('invalid_scope', error=e), parent=window)
+                return
+            self.config.set_search_scope(values)
+            window.destroy()
+        
+        def clear():
+            for variable in variables.values():
+                variable.set('')
         
-        # 第二遍：为每个匹配项添加完整的关键词统计信息
-        final_matches = []
-        for match in matches:
-            keyword = match[3]
-            total_count = keyword_counts[keyword]
-            updated_match = match.copy()
-            updated_match[3] = f"{keyword}{t('total_occurrences', count=total_count)}"
-            final_matches.append(updated_match)
+        frame_btn = tk.Frame(window)
+        frame_btn.grid(row=len(SCOPE_FIELDS) + 1, column=0, columnspan=2, pady=5)
+        tk.Button(frame_btn, text=t('ok'), command=save).pack(side="left", padx=5)
+        tk.Button(frame_btn, text=t('scope_clear'), command=clear).pack(side="left", padx=5)
+        tk.Button(frame_btn, text=t('cancel'), command=window.destroy).pack(side="left", padx=5)
+    
+    def get_match_options(self):
+        """根据配置创建关键词匹配方式"""
+        return make_match_options(self.config.get_ignore_case(),
+                                  self.config.get_whole_word(),
+                                  self.config.get_use_regex(),
+                                  self.config.get_regex_timeout())
+    
+    def search_excel(self, file_path, keywords):
+        """搜索Excel文件"""
+        matches, keyword_counts, error = search_engine.search_excel(
+            file_path, keywords, self.config.get_reader_engine(), self.get_match_options(),
+            scope=self.get_search_scope())
+        if error is not None:
+            self.report_file_error(file_path, error)
         
+        # 为每个匹配项添加完整的关键词统计信息
+        final_matches = search_engine.add_keyword_totals(matches, keyword_counts, self.format_keyword_label)
         return final_matches, keyword_counts
     
     def search_all_excels(self, directory, keywords):
         """搜索目录中的所有Excel文件"""
-        results = []
-        global_keyword_counts = {keyword: 0 for keyword in keywords}  # 全局关键词统计
-        
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.lower().endswith('.xlsx'):
-                    file_path = os.path.join(root, file)
-                    file_results, file_keyword_counts = self.search_excel(file_path, keywords)
-                    results += file_results
-                    
-                    # 累加到全局统计
-                    for keyword, count in file_keyword_counts.items():
-                        global_keyword_counts[keyword] += count
-        
-        return results, global_keyword_counts
+        return search_engine.search_all_excels(
+            directory, keywords,
+            engine=self.config.get_reader_engine(),
+            workers=self.config.get_search_workers(),
+            format_label=self.format_keyword_label,
+            on_error=self.report_file_error,
+            index_path=self.get_search_index_path(),
+            limits=self.get_search_limits(),
+            on_partial=self.report_partial_file,
+            match_options=self.get_match_options(),
+            scope=self.get_search_scope()
+        )
+    
+    def find_search_files(self, directory):
+        """按配置的通配符查找要搜索的文件（同一会话内重复搜索时使用缓存的目录列表）"""
+        return search_engine.find_excel_files(
+            directory,
+            self.config.get_include_patterns(),
+            self.config.get_exclude_patterns(),
+            self.config.get_discovery_workers(),
+            self.config.get_discovery_cache_ttl()
+        )
+    
+    def get_search_index_path(self):
+        """启用索引时返回索引位置，否则返回 None"""
+        if self.config.get_use_index():
+            return self.config.get_index_path()
+        return None
     
     def browse_directory(self):
         """浏览目录"""
@@ -226,7 +454,10 @@ class ExcelSearchApp:
             self.config.set_last_search_path(path)
     
     def start_search(self):
-        """开始搜索"""
+        """开始搜索（在后台线程中执行，结果边搜索边显示）"""
+        if self.search_thread is not None and self.search_thread.is_alive():
+            return
+        
         directory = self.path_var.get()
         keyword_input = self.keywords_var.get()
         
@@ -239,42 +470,495 @@ class ExcelSearchApp:
             return
             
         keywords = [kw.strip() for kw in keyword_input.split(",") if kw.strip()]
-        results, total_stats = self.search_all_excels(directory, keywords)  # 现在直接返回统计信息
-        self.current_search_results = results
+        match_options = self.get_match_options()
+        try:
+            # 正则表达式有误时在开始搜索前提示
+            get_matcher(keywords, match_options)
+        except re.error as e:
+            messagebox.showerror(t('error'), t('invalid_regex', error=e))
+            return
+        try:
+            # 手动修改的配置文件中范围格式可能有误
+            self.search_scope = self.get_search_scope()
+        except ValueError as e:
+            messagebox.showerror(t('error'), t('invalid_scope', error=e))
+            return
+        
+        # 清空之前的结果和排序筛选条件，搜索过程中按多文件模式显示
+        self.result_store.clear()
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+            self.filter_job = None
+        self.filter_var.set('')
+        self.update_headings()
+        self.result_view.reset()
+        self.tree["displaycolumns"] = (0, 1, 2, 3, 4, 5)
+        self.single_file_path = None
+        
+        self.search_keyword_counts = {keyword: 0 for keyword in keywords}
+        self.search_files_done = 0
+        self.search_files_total = 0
+        self.search_partial_files = 0
+        self.search_duplicate_files = 0
+        self.search_matched_files = 0
+        self.search_finished = None
+        self.search_error = None
+        self.search_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        
+        engine = self.config.get_reader_engine()
+        workers = self.config.get_search_workers()
+        self.search_mode = self.config.get_search_mode()
+        if self.search_mode not in search_engine.SEARCH_MODES:
+            self.search_mode = search_engine.SEARCH_ALL
+        self.search_limits = self.get_search_limits()
+        server = self.config.get_search_server()
+        if self.config.get_live_search() and not match_options.regex and not server:
+            self.start_warm_search(directory, engine, workers)
+            return
+        self.search_report = None
+        if self.config.get_collect_stats():
+            self.search_report = SearchReport(directory, keywords, engine, workers)
         
-        # 清空之前的结果
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+        self.search_btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
+        self.status_var.set(t('searching'))
+        
+        if server:
+            # 瘦客户端模式：由搜索服务读取文件，共用服务中预热的缓存
+            from search_server import make_request
+            request = make_request(
+                directory, keywords, engine, self.search_limits, match_options, self.search_mode,
+                self.config.get_search_scope(), self.config.get_dedupe_files(),
+                self.config.get_include_patterns(), self.config.get_exclude_patterns(),
+                self.config.get_use_index(), self.search_report is not None)
+            target = self.run_remote_search_worker
+            args = (server, request, self.search_queue, self.cancel_event)
+        else:
+            target = self.run_search_worker
+            args = (directory, keywords, engine, workers, self.get_search_index_path(),
+                    self.search_queue, self.cancel_event, self.search_report is not None,
+                    self.search_limits, match_options, self.get_search_cache(),
+                    self.config.get_dedupe_files(), self.search_mode, self.search_scope)
+        self.search_thread = threading.Thread(target=target, args=args, daemon=True)
+        self.search_thread.start()
+        self.root.after(QUEUE_POLL_INTERVAL_MS, self.poll_search_queue)
+    
+    def run_search_worker(self, directory, keywords, engine, workers, index_path, result_queue, cancel_event,
+                          collect_stats=False, limits=search_engine.NO_LIMITS, match_options=EXACT_MATCH,
+                          cache=None, dedupe=False, mode=search_engine.SEARCH_ALL, scope=None):
+        """后台搜索线程：逐个文件搜索，把结果放入队列（不直接操作界面）"""
+        try:
+            file_paths = self.find_search_files(directory)
+            result_queue.put(('total', len(file_paths)))
+            
+            on_stats = None
+            if collect_stats:
+                on_stats = lambda stats: result_queue.put(('stats', stats))
+            duplicates = {}
+            for _, file_path, matches, keyword_counts, error, partial in search_engine.iter_file_results(
+                    file_paths, keywords, engine, workers, cancel_event, index_path, on_stats, limits,
+                    match_options, cache, dedupe, duplicates.__setitem__, mode, scope):
+                if error is not None:
+                    self.report_file_error(file_path, error)
+                if partial is not None:
+                    self.report_partial_file(file_path, partial)
+                # 关键词列文本（含本文件内总次数）由结果存储在显示时生成
+                result_queue.put(('file', file_path, matches, keyword_counts, partial, duplicates.get(file_path)))
+        except Exception as e:
+            result_queue.put(('error', str(e)))
+        finally:
+            result_queue.put(('done', cancel_event.is_set()))
+    
+    def run_remote_search_worker(self, server, request, result_queue, cancel_event):
+        """后台线程：把搜索请求发送给搜索服务，响应中的消息转换为与本地搜索相同的队列消息"""
+        try:
+            from search_server import iter_remote_results
+            for message in iter_remote_results(server, request, cancel_event):
+                kind = message['type']
+                if kind == 'total':
+                    result_queue.put(('total', message['files']))
+                elif kind == 'file':
+                    file_path = message['path']
+                    if message['error'] is not None:
+                        self.report_file_error(file_path, message['error'])
+                    if message['partial'] is not None:
+                        self.report_partial_file(file_path, message['partial'])
+                    matches = [tuple(match) for match in message['matches']]
+                    result_queue.put(('file', file_path, matches, message['counts'], message['partial'],
+                                      message['duplicate_of']))
+                elif kind == 'stats':
+                    result_queue.put(('stats', message['stats']))
+                elif kind == 'error':
+                    result_queue.put(('error', message['error']))
+        except Exception as e:
+            result_queue.put(('error', str(e)))
+        finally:
+            result_queue.put(('done', cancel_event.is_set()))
+    
+    def poll_search_queue(self):
+        """在主线程中取出后台结果，存入结果存储并刷新可见窗口和进度"""
+        received = False
+        try:
+            while True:
+                message = self.search_queue.get_nowait()
+                kind = message[0]
+                if kind == 'total':
+                    self.search_files_total = message[1]
+                elif kind == 'file':
+                    _, file_path, matches, keyword_counts, partial, duplicate_of = message
+                    self.search_files_done += 1
+                    if partial is not None:
+                        self.search_partial_files += 1
+                    if duplicate_of is not None:
+                        self.search_duplicate_files += 1
+                    if any(keyword_counts.values()):
+                        self.search_matched_files += 1
+                    if matches:
+                        self.result_store.add_file(file_path, matches, keyword_counts, partial, duplicate_of)
+                        received = True
+                    for keyword, count in keyword_counts.items():
+                        self.search_keyword_counts[keyword] += count
+                elif kind == 'stats':
+                    self.search_report.add(message[1])
+                elif kind == 'error':
+                    self.search_error = message[1]
+                elif kind == 'done':
+                    self.search_finished = message[1]
+        except queue.Empty:
+            pass
+        
+        # 无论结果有多少，每次只刷新可见的几十行
+        if received:
+            self.result_view.refresh()
+        
+        if self.search_finished is not None:
+            self.finish_search(self.search_finished)
+            return
+        
+        if self.search_finished is None:
+            self.status_var.set(t('search_progress',
+                                  done=self.search_files_done,
+                                  total=self.search_files_total,
+                                  count=self.result_store.row_count()))
+        self.root.after(QUEUE_POLL_INTERVAL_MS, self.poll_search_queue)
+    
+    def finish_search(self, cancelled, live_seconds=None):
+        """
+        搜索结束后恢复按钮状态并显示汇总信息
+        :param live_seconds: 在内存索引中查询的耗时，不是内存索引查询时为 None
+        """
+        self.search_btn.config(state="normal")
+        self.cancel_btn.config(state="disabled")
+        if self.search_report is not None:
+            self.search_report.finish()
+        
+        if self.search_error is not None:
+            messagebox.showerror(t('error'), t('search_failed', error=self.search_error))
+        
+        # 暂存到磁盘后排序和筛选视图延迟更新，结束时并入全部结果
+        if self.result_store.spilled:
+            self.result_store.flush()
+            self.result_view.refresh()
+        
+        result_count = self.result_store.row_count()
+        total_stats = self.search_keyword_counts
+        stats_text = " | ".join([t('keyword_stats', keyword=kw, count=count) for kw, count in total_stats.items()])
+        summary = t('search_complete', count=result_count)
+        if cancelled:
+            summary = t('search_cancelled', done=self.search_files_done,
+                        total=self.search_files_total, count=result_count)
+        if self.search_partial_files:
+            summary += f" | {t('partial_files', count=self.search_partial_files)}"
+        if self.search_duplicate_files:
+            summary += f" | {t('duplicate_files', count=self.search_duplicate_files)}"
+        if self.search_mode != search_engine.SEARCH_ALL:
+            summary += f" | {t('matched_files', count=self.search_matched_files)}"
+        if self.search_scope is not None:
+            summary += f" | {t('scope_active')}"
+        max_results = self.search_limits.max_matches
+        if max_results and result_count >= max_results:
+            summary += f" | {t('max_results_reached', count=max_results)}"
+        if self.result_store.spilled:
+            summary += f" | {t('results_on_disk')}"
+        if live_seconds is not None:
+            summary += f" | {t('live_search_time', ms=round(live_seconds * 1000))}"
         
         # 检查是否单文件搜索
-        unique_files = set(row[5] for row in results)
+        unique_files = self.result_store.file_paths()
         is_single_file = len(unique_files) == 1
         
-        if is_single_file and results:
-            file_path = list(unique_files)[0]
+        if is_single_file:
+            file_path = unique_files[0]
             file_name = os.path.basename(file_path)
             
             # 单文件模式：隐藏文件名和路径列
+            self.single_file_path = file_path
             self.tree["displaycolumns"] = (1, 2, 3, 4)
-            
-            for row in results:
-                self.tree.insert('', 'end', values=row)
-            
-            stats_text = " | ".join([t('keyword_stats', keyword=kw, count=count) for kw, count in total_stats.items()])
-            self.status_var.set(f"{t('search_complete', count=len(results))} | {t('file_info', filename=file_name)} | {stats_text}")
+            self.status_var.set(f"{summary} | {t('file_info', filename=file_name)} | {stats_text}")
         else:
-            # 多文件模式：显示所有列
-            self.tree["displaycolumns"] = (0, 1, 2, 3, 4, 5)
-            
-            for row in results:
-                self.tree.insert('', 'end', values=row)
-            
-            stats_text = " | ".join([t('keyword_stats', keyword=kw, count=count) for kw, count in total_stats.items()])
-            self.status_var.set(f"{t('search_complete', count=len(results))} | {stats_text}")
+            self.status_var.set(f"{summary} | {stats_text}")
+    
+    def cancel_search(self):
+        """取消正在进行的搜索"""
+        if self.cancel_event is not None and not self.cancel_event.is_set():
+            self.cancel_event.set()
+            self.cancel_btn.config(state="disabled")
+            self.status_var.set(t('cancelling'))
+    
+    def set_match_option(self, setter, variable):
+        """保存匹配方式，边输入边搜索时立即按新的方式查询"""
+        setter(variable.get())
+        self.schedule_live_search()
+    
+    def toggle_live_search(self):
+        """开关边输入边搜索，关闭时释放内存索引"""
+        enabled = self.live_search_var.get()
+        self.config.set_live_search(enabled)
+        if not enabled:
+            self.warm_index = None
+    
+    def schedule_live_search(self):
+        """关键词或匹配方式改变后，停止输入一段时间再查询内存索引"""
+        if self.warm_index is None or not self.config.get_live_search():
+            return
+        if self.live_job is not None:
+            self.root.after_cancel(self.live_job)
+        self.live_job = self.root.after(LIVE_SEARCH_DELAY_MS, self.live_search)
+    
+    def live_search(self):
+        """在内存索引中查询当前关键词（内存索引属于其他目录、正在搜索或关键词太短时不查询）"""
+        self.live_job = None
+        index = self.warm_index
+        if index is None or (self.search_thread is not None and self.search_thread.is_alive()):
+            return
+        if index.settings[0] != os.path.abspath(self.path_var.get()):
+            return
+        keywords = [kw.strip() for kw in self.keywords_var.get().split(",") if kw.strip()]
+        if not keywords or any(len(kw) < LIVE_MIN_KEYWORD_LENGTH and kw.isascii() for kw in keywords):
+            return
+        match_options = self.get_match_options()
+        if not index.supports(match_options):
+            return
+        self.run_live_search(keywords, match_options, self.config.get_live_search_max_results())
+    
+    def start_warm_search(self, directory, engine, workers):
+        """边输入边搜索模式下的搜索：内存索引仍与文件一致时直接查询，否则先在后台建立索引"""
+        max_bytes = int(self.config.get_live_index_mb() * 1024 * 1024)
+        self.search_btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
+        self.status_var.set(t('warm_index_checking'))
+        self.search_thread = threading.Thread(
+            target=self.run_warm_index_worker,
+            args=(directory, engine, workers, self.search_limits, self.search_scope, self.config.get_dedupe_files(),
+                  self.config.get_ignore_case(), max_bytes, self.warm_index, self.search_queue, self.cancel_event),
+            daemon=True
+        )
+        self.search_thread.start()
+        self.root.after(QUEUE_POLL_INTERVAL_MS, self.poll_warm_queue)
+    
+    def run_warm_index_worker(self, directory, engine, workers, limits, scope, dedupe, fold, max_bytes,
+                              current, result_queue, cancel_event):
+        """后台线程：检查现有的内存索引，文件或设置有变化时重新建立"""
+        try:
+            from warm_index import build_warm_index, warm_settings
+            file_paths = self.find_search_files(directory)
+            if current is not None and current.is_current(warm_settings(directory, limits, scope, dedupe), file_paths):
+                result_queue.put(('ready', current))
+                return
+            index = build_warm_index(
+                directory, file_paths, engine, workers, limits, scope, dedupe, fold, max_bytes, cancel_event,
+                lambda done, total: result_queue.put(('progress', done, total)))
+            result_queue.put(('ready', index))
+        except Exception as e:
+            result_queue.put(('error', str(e)))
+    
+    def poll_warm_queue(self):
+        """在主线程中处理内存索引的建立进度，建立完成后查询"""
+        try:
+            while True:
+                message = self.search_queue.get_nowait()
+                kind = message[0]
+                if kind == 'progress':
+                    self.status_var.set(t('warm_index_progress', done=message[1], total=message[2]))
+                elif kind == 'error':
+                    self.search_btn.config(state="normal")
+                    self.cancel_btn.config(state="disabled")
+                    self.status_var.set(t('ready'))
+                    messagebox.showerror(t('error'), t('warm_index_failed', error=message[1]))
+                    return
+                elif kind == 'ready':
+                    self.search_btn.config(state="normal")
+                    self.cancel_btn.config(state="disabled")
+                    if message[1] is None:
+                        self.status_var.set(t('ready'))
+                        return
+                    self.warm_index = message[1]
+                    keywords = list(self.search_keyword_counts)
+                    self.run_live_search(keywords, self.get_match_options(), self.search_limits.max_matches)
+                    return
+        except queue.Empty:
+            pass
+        self.root.after(QUEUE_POLL_INTERVAL_MS, self.poll_warm_queue)
+    
+    def run_live_search(self, keywords, match_options, max_results):
+        """在内存索引中查询并显示结果（在主线程中执行），保留当前的排序和筛选"""
+        index = self.warm_index
+        sort_column = self.result_store.sort_column
+        sort_reverse = self.result_store.sort_reverse
+        filter_text = self.filter_var.get()
+        self.result_store.clear()
+        self.tree["displaycolumns"] = (0, 1, 2, 3, 4, 5)
+        self.single_file_path = None
+        
+        self.search_keyword_counts = {keyword: 0 for keyword in keywords}
+        self.search_files_total = len(index.file_paths)
+        self.search_files_done = self.search_files_total
+        self.search_partial_files = 0
+        self.search_duplicate_files = 0
+        self.search_matched_files = 0
+        self.search_error = None
+        self.search_report = None
+        self.search_mode = self.config.get_search_mode()
+        if self.search_mode not in search_engine.SEARCH_MODES:
+            self.search_mode = search_engine.SEARCH_ALL
+        self.search_limits = self.search_limits._replace(max_matches=max_results)
+        self.search_scope = index.settings[3]
+        
+        start = time.perf_counter()
+        for _, file_path, matches, keyword_counts, _, partial in search_engine.limit_results(
+                index.search(keywords, match_options), self.search_mode, max_results, len(index.file_paths),
+                match_options):
+            duplicate_of = index.duplicates.get(file_path)
+            if partial is not None:
+                self.search_partial_files += 1
+            if duplicate_of is not None:
+                self.search_duplicate_files += 1
+            if any(keyword_counts.values()):
+                self.search_matched_files += 1
+            self.result_store.add_file(file_path, matches, keyword_counts, partial, duplicate_of)
+            for keyword, count in keyword_counts.items():
+                self.search_keyword_counts[keyword] += count
+        elapsed = time.perf_counter() - start
+        
+        if filter_text:
+            self.result_store.filter(filter_text)
+        if sort_column is not None:
+            self.result_store.sort(sort_column, sort_reverse)
+        self.result_view.reset()
+        self.finish_search(False, elapsed)
+    
+    def show_search_report(self):
+        """显示上次搜索的报告：汇总信息和最慢的文件"""
+        report = self.search_report
+        if report is None:
+            messagebox.showinfo(t('info'), t('no_report'))
+            return
+        
+        top_n = self.config.get_stats_top_n()
+        summary = report.summary()
+        window = tk.Toplevel(self.root)
+        window.title(t('search_report'))
+        window.geometry("900x400")
+        
+        tk.Label(window, anchor="w", text=t('report_summary', files=summary['files'], failed=summary['failed'],
+                                            cells=summary['cells'], hits=summary['hits'],
+                                            seconds=f"{summary['wall_seconds']:.2f}")).pack(fill="x", padx=10, pady=5)
+        tk.Label(window, anchor="w", text=t('slowest_files', count=top_n)).pack(fill="x", padx=10)
+        
+        columns = [t('file_path'), t('stat_total'), t('stat_open'), t('stat_parse'), t('stat_match'),
+                   t('stat_sheets'), t('stat_cells'), t('stat_size'), t('stat_hits'), t('stat_error')]
+        tree = ttk.Treeview(window, columns=columns, show="headings")
+        for i, col in enumerate(columns):
+            tree.heading(col, text=col)
+            tree.column(col, width=300 if i == 0 else 80)
+        for stats in report.slowest(top_n):
+            size = '' if stats['bytes'] is None else f"{stats['bytes'] / 1024:.0f}"
+            tree.insert('', 'end', values=(
+                stats['file_path'], f"{stats['total_seconds']:.3f}", f"{stats['open_seconds']:.3f}",
+                f"{stats['parse_seconds']:.3f}", f"{stats['match_seconds']:.3f}",
+                stats['sheets'], stats['cells'], size, stats['hits'],
+                stats['error_type'] or stats['partial'] or ''))
+        tree.pack(fill="both", expand=True, padx=10, pady=5)
+        
+        tk.Button(window, text=t('export_json'),
+                  command=lambda: self.export_search_report(report, top_n)).pack(pady=5)
+    
+    def export_search_report(self, report, top_n):
+        """导出搜索报告为JSON"""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json")]
+        )
+        if file_path:
+            try:
+                report.save_json(file_path, top_n)
+            except Exception as e:
+                messagebox.showerror(t('error'), t('export_failed', error=str(e)))
+                return
+            messagebox.showinfo(t('success'), t('saved_to', filepath=file_path))
+    
+    def start_build_index(self):
+        """为当前搜索路径建立或刷新全文索引（后台执行）"""
+        if self.search_thread is not None and self.search_thread.is_alive():
+            return
+        
+        directory = self.path_var.get()
+        if not os.path.exists(directory):
+            messagebox.showerror(t('error'), t('invalid_path'))
+            return
+        
+        self.search_btn.config(state="disabled")
+        self.status_var.set(t('building_index', done=0, total=0))
+        self.index_queue = queue.Queue()
+        self.search_thread = threading.Thread(
+            target=self.run_build_index_worker,
+            args=(directory, self.config.get_index_path(), self.config.get_reader_engine(),
+                  self.config.get_index_use_hash(), self.index_queue),
+            daemon=True
+        )
+        self.search_thread.start()
+        self.root.after(QUEUE_POLL_INTERVAL_MS, self.poll_index_queue)
+    
+    def run_build_index_worker(self, directory, index_path, engine, use_hash, result_queue):
+        """后台建立索引线程（增量刷新，只处理新增、修改和删除的文件）"""
+        try:
+            import search_index
+            file_paths = self.find_search_files(directory)
+            stats = search_index.refresh_index(
+                index_path, file_paths, directory, engine, use_hash,
+                on_progress=lambda done, total: result_queue.put(('progress', done, total)),
+                on_error=self.report_file_error)
+            result_queue.put(('done', stats))
+        except Exception as e:
+            result_queue.put(('error', str(e)))
+    
+    def poll_index_queue(self):
+        """刷新建立索引的进度"""
+        try:
+            while True:
+                message = self.index_queue.get_nowait()
+                kind = message[0]
+                if kind == 'progress':
+                    self.status_var.set(t('building_index', done=message[1], total=message[2]))
+                elif kind == 'done':
+                    self.search_btn.config(state="normal")
+                    self.status_var.set(t('index_built', **message[1]))
+                    return
+                elif kind == 'error':
+                    self.search_btn.config(state="normal")
+                    self.status_var.set(t('ready'))
+                    messagebox.showerror(t('error'), t('index_failed', error=message[1]))
+                    return
+        except queue.Empty:
+            pass
+        self.root.after(QUEUE_POLL_INTERVAL_MS, self.poll_index_queue)
     
     def export_csv(self):
-        """导出CSV"""
-        if not self.tree.get_children():
+        """导出CSV（后台线程直接从结果存储写出，不读取表格控件）"""
+        if self.export_thread is not None and self.export_thread.is_alive():
+            return
+        if not len(self.result_store):
             messagebox.showinfo(t('info'), t('no_results'))
             return
             
@@ -284,51 +968,74 @@ class ExcelSearchApp:
         )
         
         if file_path:
-            with open(file_path, "w", newline="", encoding="utf-8-sig") as f:
-                writer = csv.writer(f)
-                
-                displayed_columns = self.tree["displaycolumns"]
-                if len(displayed_columns) == 4:  # 单文件模式
-                    headers = [t('worksheet'), t('cell'), t('keyword'), t('content')]
-                    writer.writerow(headers)
-                    
-                    status_text = self.status_var.get()
-                    if t('file_info', filename='') in status_text:
-                        file_name = status_text.split(t('file_info', filename=''))[1].split(' |')[0]
-                        writer.writerow([t('file_comment', filename=file_name), "", "", ""])
-                    
-                    for row_id in self.tree.get_children():
-                        values = self.tree.item(row_id)["values"]
-                        writer.writerow([values[1], values[2], values[3], values[4]])
-                else:  # 多文件模式
-                    headers = [t('file_name'), t('worksheet'), t('cell'), t('keyword'), t('content'), t('file_path')]
-                    writer.writerow(headers)
-                    for row_id in self.tree.get_children():
-                        writer.writerow(self.tree.item(row_id)["values"])
-                        
-            messagebox.showinfo(t('success'), t('saved_to', filepath=file_path))
+            if self.single_file_path is not None:  # 单文件模式
+                headers = [t('worksheet'), t('cell'), t('keyword'), t('content')]
+                columns = (1, 2, 3, 4)
+                comment = t('file_comment', filename=os.path.basename(self.single_file_path))
+            else:  # 多文件模式
+                headers = [t('file_name'), t('worksheet'), t('cell'), t('keyword'), t('content'), t('file_path')]
+                columns = None
+                comment = None
+            
+            rows = self.result_store.snapshot()
+            self.export_btn.config(state="disabled")
+            self.status_var.set(t('exporting', done=0, total=len(rows)))
+            self.export_queue = queue.Queue()
+            self.export_thread = threading.Thread(
+                target=self.run_export_worker,
+                args=(file_path, rows, headers, columns, comment, self.export_queue),
+                daemon=True
+            )
+            self.export_thread.start()
+            self.root.after(QUEUE_POLL_INTERVAL_MS, self.poll_export_queue)
+    
+    def run_export_worker(self, file_path, rows, headers, columns, comment, result_queue):
+        """后台导出线程"""
+        try:
+            export_rows_csv(file_path, rows, headers, columns, comment, total=len(rows),
+                            on_progress=lambda done, total: result_queue.put(('progress', done, total)))
+            result_queue.put(('done', file_path))
+        except Exception as e:
+            result_queue.put(('error', str(e)))
+    
+    def poll_export_queue(self):
+        """刷新导出进度"""
+        try:
+            while True:
+                message = self.export_queue.get_nowait()
+                kind = message[0]
+                if kind == 'progress':
+                    self.status_var.set(t('exporting', done=message[1], total=message[2]))
+                elif kind == 'done':
+                    self.export_btn.config(state="normal")
+                    self.status_var.set(t('saved_to', filepath=message[1]))
+                    messagebox.showinfo(t('success'), t('saved_to', filepath=message[1]))
+                    return
+                elif kind == 'error':
+                    self.export_btn.config(state="normal")
+                    self.status_var.set(t('ready'))
+                    messagebox.showerror(t('error'), t('export_failed', error=message[1]))
+                    return
+        except queue.Empty:
+            pass
+        self.root.after(QUEUE_POLL_INTERVAL_MS, self.poll_export_queue)
     
     def open_file(self):
         """打开选中的文件"""
-        selection = self.tree.selection()
-        if not selection:
+        values = self.result_view.get_selected_row()
+        if values is None:
             messagebox.showinfo(t('info'), t('select_record'))
             return
         
-        item = self.tree.item(selection[0])
-        displayed_columns = self.tree["displaycolumns"]
-        
-        if len(displayed_columns) == 4:  # 单文件模式
-            values = item['values']
-            file_path = values[5]
-        else:  # 多文件模式
-            values = item['values']
-            file_path = values[5]
+        # 单文件模式下文件路径列虽然隐藏，结果存储中仍保留完整数据
+        file_path = values[5]
         
         if not os.path.exists(file_path):
             messagebox.showerror(t('error'), t('file_not_exist', filepath=file_path))
             return
         
+        import platform
+        import subprocess
         try:
             if platform.system() == 'Windows':
                 os.startfile(file_path)
@@ -345,9 +1052,14 @@ class ExcelSearchApp:
     
     def on_closing(self):
         """窗口关闭时的处理"""
-        # 保存窗口大小
+        # 停止后台搜索
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        
+        # 保存窗口大小，并写入尚未保存的配置
         geometry = self.root.geometry()
         self.config.set_window_geometry(geometry)
+        self.config.flush()
         
         # 关闭窗口
         self.root.destroy()
@@ -358,4 +1070,6 @@ def main():
     app.run()
 
 if __name__ == "__main__":
+    # 打包后的程序使用多进程搜索时需要
+    multiprocessing.freeze_support()
     main()
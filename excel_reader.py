@@ -0,0 +1,152 @@
+"""
+Excel读取模块
+提供可切换的工作簿读取引擎，逐个产出非空单元格
+openpyxl 和预筛选读取模块在第一次读取文件时才导入，只用到引擎常量和坐标格式化的模块（如界面）启动时不加载
+"""
+from functools import lru_cache
+
+from keyword_matcher import EXACT_MATCH
+from search_scope import HEADER_ROW
+
+# 读取引擎
+ENGINE_FULL = 'full'            # 完整加载：构建全部单元格对象（原有方式）
+ENGINE_STREAMING = 'streaming'  # 流式只读：按行解析，内存占用与文件大小无关
+ENGINE_PREFILTER = 'prefilter'  # 共享字符串预筛选：直接解析XML，只转换可能命中的单元格
+ENGINES = (ENGINE_FULL, ENGINE_STREAMING, ENGINE_PREFILTER)
+DEFAULT_ENGINE = ENGINE_PREFILTER
+
+
+@lru_cache(maxsize=None)
+def _column_letter(column):
+    """列号转换为列字母，如 1 -> A，27 -> AA（与 openpyxl.utils.get_column_letter 相同）"""
+    if not 1 <= column <= 18278:
+        raise ValueError(f"Invalid column index {column}")
+    letters = ''
+    while column:
+        column, remainder = divmod(column - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def format_coordinate(row, column):
+    """把行列号转换为单元格坐标，如 (3, 2) -> B3"""
+    return f"{_column_letter(column)}{row}"
+
+
+def iter_cells(file_path, engine=DEFAULT_ENGINE, keywords=None, max_cells_per_sheet=0, on_truncated=None,
+               match_options=EXACT_MATCH, scope=None):
+    """
+    逐个读取工作簿中的非空单元格
+    :param file_path: Excel文件路径
+    :param engine: 读取引擎，见 ENGINES
+    :param keywords: 关键词列表，预筛选引擎只产出可能包含关键词的单元格，其他引擎忽略
+    :param max_cells_per_sheet: 每个工作表最多读取的单元格数，0 表示不限制；超出时跳过该工作表的其余部分
+    :param on_truncated: 工作表因超出限制未读完时的回调 on_truncated(工作表名)
+    :param match_options: 关键词匹配方式，预筛选引擎使用
+    :param scope: 搜索范围 search_scope.SearchScope，为 None 时读取整个工作簿；
+                  范围外的工作表不读取，流式和预筛选引擎读完范围内的最后一行后即停止读取该工作表
+    :return: 生成器，元素为 (工作表名, 行号, 列号, 值)
+    """
+    if engine == ENGINE_FULL:
+        return _iter_cells_full(file_path, max_cells_per_sheet, on_truncated, scope)
+    if engine == ENGINE_STREAMING:
+        return _iter_cells_streaming(file_path, max_cells_per_sheet, on_truncated, scope)
+    if engine == ENGINE_PREFILTER:
+        from xlsx_prefilter import iter_candidate_cells
+        return iter_candidate_cells(file_path, keywords, max_cells_per_sheet, on_truncated, match_options, scope)
+    raise ValueError(f"Unknown reader engine: {engine}")
+
+
+def _limit_cells(cells, sheet_name, max_cells, on_truncated):
+    """单个工作表的单元格最多产出 max_cells 个，停止产出后不再继续读取该工作表"""
+    if not max_cells:
+        return cells
+    return _truncate_cells(cells, sheet_name, max_cells, on_truncated)
+
+
+def _truncate_cells(cells, sheet_name, max_cells, on_truncated):
+    for count, cell in enumerate(cells):
+        if count >= max_cells:
+            if on_truncated is not None:
+                on_truncated(sheet_name)
+            return
+        yield cell
+
+
+def _sheet_scopes(wb, scope):
+    """按搜索范围筛选工作表，产出 (工作表名, 单个工作表的范围)，不限制时范围为 None"""
+    for sheet_name in wb.sheetnames:
+        if scope is None:
+            yield sheet_name, None
+            continue
+        sheet_scope = scope.for_sheet(sheet_name)
+        if sheet_scope is not None:
+            yield sheet_name, sheet_scope
+
+
+def _resolve_headers(sheet, sheet_scope):
+    """需要时读取表头行确定列，返回范围内是否还有单元格"""
+    if sheet_scope.needs_header:
+        header = next(sheet.iter_rows(min_row=HEADER_ROW, max_row=HEADER_ROW, values_only=True), ())
+        sheet_scope.resolve_headers(enumerate(header, 1))
+    return not sheet_scope.empty
+
+
+def _scoped_cells(cells, sheet_scope):
+    """只保留范围内的单元格（边界矩形内可能有多个区域或不连续的列）"""
+    contains = sheet_scope.contains
+    return ((row_idx, col_idx, value) for row_idx, col_idx, value in cells if contains(row_idx, col_idx))
+
+
+def _iter_cells_full(file_path, max_cells_per_sheet=0, on_truncated=None, scope=None):
+    """完整加载模式（整个工作簿都会加载，范围只减少遍历的单元格）"""
+    from openpyxl import load_workbook
+    wb = load_workbook(file_path, data_only=True)
+    try:
+        for sheet_name, sheet_scope in _sheet_scopes(wb, scope):
+            sheet = wb[sheet_name]
+            if sheet_scope is None:
+                rows = sheet.iter_rows()
+            else:
+                if not _resolve_headers(sheet, sheet_scope):
+                    continue
+                min_row, min_col, max_row, max_col = sheet_scope.bounds()
+                # 完整加载模式下 iter_rows 会创建范围内缺失的单元格，结束行列不超过已有内容
+                max_row = min(max_row or sheet.max_row, sheet.max_row)
+                max_col = min(max_col or sheet.max_column, sheet.max_column)
+                rows = sheet.iter_rows(min_row, max_row, min_col, max_col)
+            cells = ((cell.row, cell.column, cell.value) for row in rows for cell in row if cell.value is not None)
+            if sheet_scope is not None:
+                cells = _scoped_cells(cells, sheet_scope)
+            for row_idx, col_idx, value in _limit_cells(cells, sheet_name, max_cells_per_sheet, on_truncated):
+                yield sheet_name, row_idx, col_idx, value
+    finally:
+        wb.close()
+
+
+def _iter_cells_streaming(file_path, max_cells_per_sheet=0, on_truncated=None, scope=None):
+    """流式只读模式：只保留当前行，行列号由遍历位置推算；范围外的工作表不解析"""
+    from openpyxl import load_workbook
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet_name, sheet_scope in _sheet_scopes(wb, scope):
+            sheet = wb[sheet_name]
+            # 部分软件写出的dimension不准确，清除后按实际内容读取，避免漏读
+            sheet.reset_dimensions()
+            min_row = min_col = 1
+            max_row = max_col = None
+            if sheet_scope is not None:
+                if not _resolve_headers(sheet, sheet_scope):
+                    continue
+                min_row, min_col, max_row, max_col = sheet_scope.bounds()
+            # 只读模式会补齐缺失的行列，因此行列号从起始行列开始连续递增；读完结束行后不再解析
+            rows = sheet.iter_rows(min_row, max_row, min_col, max_col, values_only=True)
+            cells = ((row_idx, col_idx, value)
+                     for row_idx, row in enumerate(rows, min_row)
+                     for col_idx, value in enumerate(row, min_col) if value is not None)
+            if sheet_scope is not None:
+                cells = _scoped_cells(cells, sheet_scope)
+            for row_idx, col_idx, value in _limit_cells(cells, sheet_name, max_cells_per_sheet, on_truncated):
+                yield sheet_name, row_idx, col_idx, value
+    finally:
+        wb.close()
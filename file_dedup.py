@@ -0,0 +1,91 @@
+"""
+重复文件识别模块
+按内容找出完全相同的工作簿（如保存到多个目录的邮件附件、"副本"文件），每份内容只需搜索一次：
+先按文件大小分组，大小唯一的文件不读取内容；大小相同的文件先比较开头部分的哈希，仍相同时再比较完整内容的哈希
+"""
+import hashlib
+import os
+
+from file_discovery import DEFAULT_DISCOVERY_WORKERS
+
+# 计算哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+# 第一轮只比较开头的字节数
+HEAD_HASH_SIZE = 64 * 1024
+
+
+def file_hash(file_path, limit=None):
+    """
+    计算文件内容哈希
+    :param limit: 只计算开头 limit 字节，为 None 时计算完整内容
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        if limit is not None:
+            digest.update(f.read(limit))
+        else:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hash_all(file_paths, limit, workers):
+    """并行计算哈希（主要耗时在读取文件），无法读取的文件哈希为 None"""
+    def safe_hash(file_path):
+        try:
+            return file_hash(file_path, limit)
+        except OSError:
+            return None
+
+    if workers <= 1 or len(file_paths) <= 1:
+        return [safe_hash(file_path) for file_path in file_paths]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(workers, len(file_paths))) as executor:
+        return list(executor.map(safe_hash, file_paths))
+
+
+def _split_by_hash(groups, limit, workers):
+    """按哈希细分每组文件，只保留仍有多个文件的组"""
+    file_paths = [file_path for group in groups for file_path in group]
+    hashes = dict(zip(file_paths, _hash_all(file_paths, limit, workers)))
+    result = []
+    for group in groups:
+        by_hash = {}
+        for file_path in group:
+            content_hash = hashes[file_path]
+            if content_hash is not None:
+                by_hash.setdefault(content_hash, []).append(file_path)
+        result.extend(same for same in by_hash.values() if len(same) > 1)
+    return result
+
+
+def find_duplicates(file_paths, workers=DEFAULT_DISCOVERY_WORKERS):
+    """
+    找出内容相同的文件
+    :param workers: 并行计算哈希的线程数
+    :return: {重复文件路径: 内容相同的第一个文件路径}，"第一个"按 file_paths 中的顺序；
+             不在结果中的文件内容唯一（或无法读取）
+    """
+    sizes = {}
+    by_size = {}
+    for file_path in file_paths:
+        try:
+            size = sizes[file_path] = os.path.getsize(file_path)
+        except OSError:
+            continue
+        by_size.setdefault(size, []).append(file_path)
+
+    groups = [group for group in by_size.values() if len(group) > 1]
+    if not groups:
+        return {}
+    groups = _split_by_hash(groups, HEAD_HASH_SIZE, workers)
+    # 开头部分已包含整个文件时无需再计算完整内容的哈希
+    large = [group for group in groups if sizes[group[0]] > HEAD_HASH_SIZE]
+    groups = [group for group in groups if sizes[group[0]] <= HEAD_HASH_SIZE]
+    groups += _split_by_hash(large, None, workers)
+
+    duplicates = {}
+    for group in groups:
+        for file_path in group[1:]:
+            duplicates[file_path] = group[0]
+    return duplicates
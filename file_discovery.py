@@ -0,0 +1,165 @@
+"""
+文件发现模块
+基于 os.scandir 遍历目录，按包含/排除通配符尽早剪枝，多线程并行遍历子目录；
+可缓存目录列表，缓存过期后只重新列出修改时间发生变化的目录
+"""
+import os
+import re
+import threading
+import time
+from fnmatch import translate
+
+# 默认包含的文件
+DEFAULT_INCLUDE_PATTERNS = ['*.xlsx']
+# 默认排除的文件和目录：Office锁文件、版本库目录、系统目录和备份
+DEFAULT_EXCLUDE_PATTERNS = ['~$*', '.~lock.*', '.git', '.svn', '.hg', '__MACOSX', '$RECYCLE.BIN',
+                            'System Volume Information', 'backup', 'backups', '*.bak']
+# 并行遍历目录的线程数（网络共享上主要耗时在等待I/O）
+DEFAULT_DISCOVERY_WORKERS = 8
+
+# 目录列表缓存：{缓存键: (检查时间, {目录: (修改时间, 文件列表, 子目录列表)})}
+_listing_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _normalize_patterns(patterns):
+    """通配符统一为小写（匹配不区分大小写），含 / 的模式匹配相对路径，否则匹配名称"""
+    return tuple(pattern.strip().lower().replace('\\', '/') for pattern in patterns if pattern.strip())
+
+
+class _PatternSet:
+    """把一组通配符编译为两个正则表达式（名称和相对路径），每个目录项只匹配一次"""
+
+    def __init__(self, patterns):
+        name_patterns = [translate(pattern) for pattern in patterns if '/' not in pattern]
+        path_patterns = [translate(pattern) for pattern in patterns if '/' in pattern]
+        self.name_regex = re.compile('|'.join(name_patterns)) if name_patterns else None
+        self.path_regex = re.compile('|'.join(path_patterns)) if path_patterns else None
+
+    def __bool__(self):
+        return self.name_regex is not None or self.path_regex is not None
+
+    def matches(self, name, path, root):
+        if self.name_regex is not None and self.name_regex.match(name.lower()):
+            return True
+        if self.path_regex is not None:
+            relative = os.path.relpath(path, root).replace(os.sep, '/').lower()
+            return self.path_regex.match(relative) is not None
+        return False
+
+
+def _scan_directory(path, root, include, exclude, previous, track_mtime, mtime=None):
+    """
+    列出单个目录
+    目录修改时间与上次相同时直接使用上次的结果（目录中增删文件会改变目录的修改时间）
+    :param previous: 上次的遍历结果，为 None 时直接列出
+    :param track_mtime: 是否记录目录修改时间（缓存时需要）
+    :param mtime: 上级目录列出时已取得的修改时间，避免再次访问文件系统
+    :return: (目录, (修改时间, 文件列表, 子目录列表), [(子目录, 修改时间)])，目录无法读取时列表为 None
+    """
+    if previous is not None or (track_mtime and mtime is None):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return path, None, ()
+    if previous is not None:
+        cached = previous.get(path)
+        if cached is not None and cached[0] == mtime:
+            return path, cached, [(subdir, None) for subdir in cached[2]]
+
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if exclude and exclude.matches(entry.name, entry.path, root):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    # 与 os.walk 相同：不进入指向目录的符号链接
+                    if not entry.is_symlink():
+                        subdir_mtime = None
+                        if track_mtime and previous is None:
+                            # Windows 上目录项自带修改时间，无需额外请求
+                            try:
+                                subdir_mtime = entry.stat(follow_symlinks=False).st_mtime_ns
+                            except OSError:
+                                pass
+                        subdirs.append((entry.path, subdir_mtime))
+                elif include.matches(entry.name, entry.path, root):
+                    files.append(entry.path)
+    except OSError:
+        return path, None, ()
+    return path, (mtime, files, [subdir for subdir, _ in subdirs]), subdirs
+
+
+def _crawl(root, include, exclude, workers, track_mtime=False, previous=None):
+    """并行遍历目录树，返回 {目录: (修改时间, 文件列表, 子目录列表)}"""
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+    include = _PatternSet(include)
+    exclude = _PatternSet(exclude)
+    tree = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = {executor.submit(_scan_directory, root, root, include, exclude, previous, track_mtime)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, listing, subdirs = future.result()
+                if listing is None:
+                    continue
+                tree[path] = listing
+                for subdir, mtime in subdirs:
+                    pending.add(executor.submit(_scan_directory, subdir, root, include, exclude,
+                                                previous, track_mtime, mtime))
+    return tree
+
+
+def _ordered_files(tree, root):
+    """按 os.walk 的顺序展开文件列表：先列出当前目录的文件，再依次进入各子目录"""
+    files = []
+    stack = [root]
+    while stack:
+        listing = tree.get(stack.pop())
+        if listing is None:
+            continue
+        files.extend(listing[1])
+        stack.extend(reversed(listing[2]))
+    return files
+
+
+def discover_files(directory, include_patterns=None, exclude_patterns=None,
+                   workers=DEFAULT_DISCOVERY_WORKERS, cache_ttl=0):
+    """
+    查找目录中符合条件的文件
+    :param include_patterns: 文件名通配符列表，为 None 时使用 DEFAULT_INCLUDE_PATTERNS
+    :param exclude_patterns: 排除的文件或目录通配符列表，匹配的目录整个跳过，为 None 时使用 DEFAULT_EXCLUDE_PATTERNS
+    :param workers: 并行遍历的线程数
+    :param cache_ttl: 目录列表缓存有效期（秒），有效期内直接返回缓存；过期后只重新列出有变化的目录；0 表示不缓存
+    :return: 文件路径列表（与 os.walk 的遍历顺序相同）
+    """
+    include = _normalize_patterns(DEFAULT_INCLUDE_PATTERNS if include_patterns is None else include_patterns)
+    exclude = _normalize_patterns(DEFAULT_EXCLUDE_PATTERNS if exclude_patterns is None else exclude_patterns)
+
+    if not cache_ttl:
+        return _ordered_files(_crawl(directory, include, exclude, workers), directory)
+
+    key = (directory, os.path.abspath(directory), include, exclude)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _listing_cache.get(key)
+    if cached is not None and now - cached[0] < cache_ttl:
+        tree = cached[1]
+    else:
+        tree = _crawl(directory, include, exclude, workers, True, None if cached is None else cached[1])
+        with _cache_lock:
+            _listing_cache[key] = (now, tree)
+    return _ordered_files(tree, directory)
+
+
+def clear_cache():
+    """清空目录列表缓存"""
+    with _cache_lock:
+        _listing_cache.clear()
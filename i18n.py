@@ -1,33 +1,34 @@
 """
 国际化(i18n)支持模块
 支持中文和英文界面
+翻译文件在第一次使用某种语言时才读取，启动时只解析当前语言
 """
 import json
 import os
 import locale
 from config import get_config
 
+LOCALES_DIR = os.path.join(os.path.dirname(__file__), 'locales')
+
 class I18n:
     def __init__(self, default_language='zh_CN'):
         self.current_language = default_language
         self.translations = {}
-        self.load_translations()
         
-    def load_translations(self):
-        """加载所有语言翻译文件"""
-        locales_dir = os.path.join(os.path.dirname(__file__), 'locales')
-        if not os.path.exists(locales_dir):
-            return
-            
-        for filename in os.listdir(locales_dir):
-            if filename.endswith('.json'):
-                lang_code = filename[:-5]  # 移除.json后缀
-                file_path = os.path.join(locales_dir, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        self.translations[lang_code] = json.load(f)
-                except Exception as e:
-                    print(f"Failed to load translation file {filename}: {e}")
+    def load_translations(self, language):
+        """加载指定语言的翻译文件，已加载时直接返回，文件不存在或无法读取时返回 False"""
+        if language in self.translations:
+            return True
+        file_path = os.path.join(LOCALES_DIR, f'{language}.json')
+        if not os.path.exists(file_path):
+            return False
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                self.translations[language] = json.load(f)
+        except Exception as e:
+            print(f"Failed to load translation file {language}.json: {e}")
+            return False
+        return True
     
     def detect_system_language(self):
         """检测系统语言"""
@@ -42,19 +43,21 @@ class I18n:
             pass
         return 'zh_CN'  # 默认中文
     
-    def set_language(self, language):
-        """设置当前语言"""
-        if language in self.translations:
+    def set_language(self, language, save=True):
+        """设置当前语言，save 为 True 时同时保存到配置文件"""
+        if self.load_translations(language):
             self.current_language = language
-            # 保存到配置文件
-            config = get_config()
-            config.set_language(language)
+            if save:
+                config = get_config()
+                config.set_language(language)
             return True
         return False
     
     def get_available_languages(self):
-        """获取可用语言列表"""
-        return list(self.translations.keys())
+        """获取可用语言列表（只列出翻译文件，不读取内容）"""
+        if not os.path.exists(LOCALES_DIR):
+            return []
+        return sorted(filename[:-5] for filename in os.listdir(LOCALES_DIR) if filename.endswith('.json'))
     
     def get_language_name(self, lang_code):
         """获取语言显示名称"""
@@ -71,7 +74,7 @@ class I18n:
         :param kwargs: 格式化参数
         :return: 翻译后的文本
         """
-        if self.current_language not in self.translations:
+        if not self.load_translations(self.current_language):
             return key
             
         text = self.translations[self.current_language].get(key, key)
@@ -89,11 +92,11 @@ class I18n:
         """获取当前语言"""
         return self.current_language
 
-# 全局实例
+# 全局实例（创建时不读取任何文件）
 _i18n = I18n()
 
 def init_i18n(language=None):
-    """初始化国际化"""
+    """初始化国际化（只读取所选语言的翻译文件，不改写配置文件）"""
     if language is None:
         # 从配置文件读取语言设置
         config = get_config()
@@ -102,7 +105,7 @@ def init_i18n(language=None):
             language = _i18n.detect_system_language()
         else:
             language = saved_language
-    _i18n.set_language(language)
+    _i18n.set_language(language, save=False)
     return _i18n
 
 def t(key, **kwargs):
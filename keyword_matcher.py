@@ -0,0 +1,167 @@
+"""
+多关键词匹配模块
+把关键词列表编译成一个前缀树形状的正则表达式，每个单元格只需扫描一遍
+即可得到所有关键词的出现次数，计数规则与 str.count 相同；
+支持不区分大小写、全词匹配和正则表达式模式，各模式都在编译时合并进同一个表达式
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# 正则表达式模式下单个文件的默认时间限制（秒），防止回溯失控的表达式卡住搜索
+DEFAULT_REGEX_TIMEOUT = 30
+
+# 匹配方式，可以组合使用
+# ignore_case: 不区分大小写；whole_word: 关键词前后不能紧邻字母、数字或下划线；
+# regex: 关键词按正则表达式解释；regex_timeout: 正则表达式模式下单个文件的时间限制（秒），0 表示不限制
+MatchOptions = namedtuple('MatchOptions', ['ignore_case', 'whole_word', 'regex', 'regex_timeout'])
+EXACT_MATCH = MatchOptions(False, False, False, DEFAULT_REGEX_TIMEOUT)
+
+_WORD_CHAR = re.compile(r'\w')
+# 编号反向引用 \1 或命名反向引用 (?P=name)
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+def make_match_options(ignore_case=False, whole_word=False, regex=False, regex_timeout=DEFAULT_REGEX_TIMEOUT):
+    """根据配置值创建匹配方式"""
+    return MatchOptions(bool(ignore_case), bool(whole_word), bool(regex), float(regex_timeout))
+
+
+def _trie_pattern(keywords):
+    """把关键词构造成前缀树，再转换为正则表达式（同一位置优先匹配最长的关键词）"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}  # 关键词结束标记
+
+    def emit(node):
+        is_end = '' in node
+        branches = [re.escape(char) + emit(child) for char, child in node.items() if char != '']
+        if not branches:
+            return ''
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        body = '(?:' + '|'.join(branches) + ')'
+        # 已经构成完整关键词时，后续部分可选（贪婪匹配，优先更长的关键词）
+        return body + '?' if is_end else body
+
+    return emit(trie)
+
+
+class _BaseMatcher:
+    def match(self, text):
+        """
+        匹配文本
+        :return: [(关键词, 次数)]，按关键词列表顺序排列，未命中时为空列表
+        """
+        counts = self.count(text)
+        if not counts:
+            return []
+        return [(keyword, counts[keyword]) for keyword in self.keywords if keyword in counts]
+
+
+class KeywordMatcher(_BaseMatcher):
+    def __init__(self, keywords, options=EXACT_MATCH):
+        self.keywords = list(keywords)
+        self._fold = str.lower if options.ignore_case else None
+        self._whole_word = options.whole_word
+        unique_keywords = list(dict.fromkeys(keyword for keyword in self.keywords if keyword))
+        # 不区分大小写时按小写形式构造表达式，大小写不同的关键词共用一个分支
+        keys = list(dict.fromkeys(self._key(keyword) for keyword in unique_keywords))
+
+        # 在某位置匹配到最长关键词时，它的前缀关键词也在同一位置出现
+        self._prefixes = {
+            key: [keyword for keyword in unique_keywords if key.startswith(self._key(keyword))]
+            for key in keys
+        }
+        self._pattern = None
+        if keys:
+            body = '(' + _trie_pattern(keys) + ')'
+            flags = re.IGNORECASE if options.ignore_case else 0
+            if options.whole_word:
+                # 最长的关键词后面紧跟字母时回溯到较短的关键词
+                self._pattern = re.compile(r'(?<!\w)(?=' + body + r'(?!\w))', flags)
+            else:
+                # 零宽前瞻让每个位置都参与匹配，不同关键词之间可以重叠
+                self._pattern = re.compile('(?=' + body + ')', flags)
+
+    def _key(self, text):
+        return text if self._fold is None else self._fold(text)
+
+    def count(self, text):
+        """
+        统计文本中各关键词的出现次数，同一关键词的多次出现互不重叠（与 str.count 一致）
+        :return: {关键词: 次数}，只包含出现过的关键词
+        """
+        counts = {}
+        if self._pattern is None:
+            return counts
+
+        ends = {}
+        for match in self._pattern.finditer(text):
+            start = match.start()
+            for keyword in self._prefixes.get(self._key(match.group(1)), ()):
+                end = start + len(keyword)
+                if start < ends.get(keyword, 0):
+                    continue
+                # 全词匹配时，较短的前缀关键词后面同样不能紧邻字母
+                if self._whole_word and _WORD_CHAR.match(text, end):
+                    continue
+                counts[keyword] = counts.get(keyword, 0) + 1
+                ends[keyword] = end
+        return counts
+
+
+class RegexMatcher(_BaseMatcher):
+    """
+    正则表达式模式：所有表达式合并为一个表达式，先判断单元格是否可能命中，
+    只有命中的单元格才逐个表达式计数（互不重叠，忽略空匹配）
+    """
+
+    def __init__(self, keywords, options):
+        self.keywords = list(keywords)
+        flags = re.IGNORECASE if options.ignore_case else 0
+        sources = {}
+        for keyword in dict.fromkeys(keyword for keyword in self.keywords if keyword):
+            source = keyword
+            if options.whole_word:
+                source = r'(?<!\w)(?:' + source + r')(?!\w)'
+            sources[keyword] = source
+        # 表达式有误时在这里抛出 re.error
+        self._patterns = [(keyword, re.compile(source, flags)) for keyword, source in sources.items()]
+
+        self._screen = None
+        if len(self._patterns) > 1 and not any(_BACKREFERENCE.search(keyword) for keyword in sources):
+            # 反向引用的组号在合并后会改变，这种情况下不合并
+            self._screen = re.compile('|'.join('(?:' + source + ')' for source in sources.values()), flags)
+
+    def count(self, text):
+        """:return: {关键词: 次数}，只包含出现过的关键词"""
+        counts = {}
+        if self._screen is not None and self._screen.search(text) is None:
+            return counts
+        for keyword, pattern in self._patterns:
+            count = 0
+            for match in pattern.finditer(text):
+                if match.end() > match.start():
+                    count += 1
+            if count:
+                counts[keyword] = count
+        return counts
+
+
+@lru_cache(maxsize=16)
+def _get_matcher(keywords, options):
+    if options.regex:
+        return RegexMatcher(keywords, options)
+    return KeywordMatcher(keywords, options)
+
+
+def get_matcher(keywords, options=EXACT_MATCH):
+    """
+    获取关键词匹配器，同一组关键词和匹配方式只编译一次
+    正则表达式有误时抛出 re.error
+    """
+    return _get_matcher(tuple(keywords), options)
@@ -0,0 +1,51 @@
+"""
+结果导出模块
+把搜索结果逐行写入CSV文件，数据直接来自结果存储或搜索生成器，不经过界面控件，
+单元格文本原样保留（前导零、长数字编号等不会被转换）
+"""
+import csv
+import os
+
+# 导出文件的写缓冲大小（字节）
+EXPORT_BUFFER_SIZE = 1024 * 1024
+# 每写出多少行报告一次进度
+EXPORT_PROGRESS_ROWS = 10000
+
+
+def export_rows_csv(file_path, rows, headers, columns=None, comment=None,
+                    total=None, on_progress=None, cancel_event=None):
+    """
+    流式导出CSV
+    :param rows: 结果行的可迭代对象（列表或生成器均可）
+    :param headers: 表头
+    :param columns: 要导出的列序号，None 表示全部列
+    :param comment: 表头下方的说明行（如单文件模式的文件名），None 表示不写
+    :param total: 总行数，仅用于进度报告
+    :param on_progress: 进度回调 on_progress(已写行数, 总行数)
+    :param cancel_event: 取消事件，取消时删除未写完的文件
+    :return: 写出的行数，取消时返回 None
+    """
+    written = 0
+    with open(file_path, "w", newline="", encoding="utf-8-sig", buffering=EXPORT_BUFFER_SIZE) as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        if comment is not None:
+            writer.writerow([comment] + [""] * (len(headers) - 1))
+
+        for row in rows:
+            if columns is not None:
+                row = [row[i] for i in columns]
+            writer.writerow(row)
+            written += 1
+            if written % EXPORT_PROGRESS_ROWS == 0:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                if on_progress is not None:
+                    on_progress(written, total)
+
+    if cancel_event is not None and cancel_event.is_set():
+        os.remove(file_path)
+        return None
+    if on_progress is not None:
+        on_progress(written, total)
+    return written
@@ -0,0 +1,691 @@
+"""
+搜索结果存储模块
+在Python端保存全部结果，排序和过滤只调整行号视图，不依赖界面控件
+
+结果按列保存：文件、工作表和关键词只保存一次，每行只记录编号；
+单元格位置压缩为一个整数；关键词列的显示文本（含本文件内总次数）在显示时才生成并按文件缓存
+
+结果估计占用的内存超过上限后，每行的数据转存到临时 SQLite 数据库（暂存到磁盘），之后的结果按文件分批写入；
+分页、排序、过滤和导出仍针对全部结果，排序和过滤由 SQLite 完成，内存中只保留文件、工作表和关键词表
+"""
+import os
+import re
+import threading
+import time
+import weakref
+from array import array
+
+from excel_reader import format_coordinate
+
+_DIGITS = re.compile(r'(\d+)')
+# 可能是单元格坐标一部分的文本（列字母的结尾 + 行号的开头）
+_COORDINATE_PART = re.compile(r'^[A-Z]*[0-9]*$')
+# 自然排序键中数字部分的前缀，小于单元格文本中可能出现的字符
+_NUMBER_MARK = '\x01'
+
+# 单元格位置 = 行号 << CELL_COLUMN_BITS | 列号（Excel 最多 16384 列）
+CELL_COLUMN_BITS = 15
+_CELL_COLUMN_MASK = (1 << CELL_COLUMN_BITS) - 1
+MAX_COLUMN = 16384
+
+# 结果列序号
+COLUMN_FILE_NAME = 0
+COLUMN_SHEET = 1
+COLUMN_CELL = 2
+COLUMN_KEYWORD = 3
+COLUMN_CONTENT = 4
+COLUMN_FILE_PATH = 5
+
+# 估计内存占用时每行除内容文本外的字节数（编号、位置和字符串对象的开销）
+ROW_OVERHEAD_BYTES = 80
+# 暂存到磁盘后顺序遍历（导出）时每次读取的行数
+SPILL_FETCH_ROWS = 1000
+# 暂存到磁盘后，新增结果至少间隔上次重建视图耗时的这么多倍才重建排序或过滤视图
+SPILL_VIEW_REBUILD_RATIO = 10
+# SQLite 页缓存上限（KB）
+SPILL_CACHE_KB = 64 * 1024
+SPILL_FILE_PREFIX = 'excel-search-results-'
+
+_SPILL_SCHEMA = """
+CREATE TABLE rows (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER,
+    sheet_id INTEGER,
+    keyword_id INTEGER,
+    cell INTEGER,
+    content TEXT,
+    content_key TEXT
+);
+CREATE TABLE view_rows (pos INTEGER PRIMARY KEY, row_id INTEGER);
+CREATE TABLE sort_keys (id INTEGER PRIMARY KEY, key);
+CREATE TABLE label_keys (file_id INTEGER, keyword_id INTEGER, key TEXT, PRIMARY KEY (file_id, keyword_id)) WITHOUT ROWID;
+CREATE TABLE filter_files (id INTEGER PRIMARY KEY);
+CREATE TABLE filter_sheets (id INTEGER PRIMARY KEY);
+CREATE TABLE filter_labels (file_id INTEGER, keyword_id INTEGER, PRIMARY KEY (file_id, keyword_id)) WITHOUT ROWID;
+"""
+
+
+def _natural_key(value):
+    """
+    自然排序键：数字部分按数值比较，如 A2 排在 A10 之前；
+    键为字符串（数字部分换成 前缀 + 位数 + 去掉前导零的数字），在 Python 和 SQLite 中比较结果相同
+    """
+    parts = _DIGITS.split(str(value))
+    for i in range(1, len(parts), 2):
+        part = parts[i]
+        digits = (part.lstrip('0') or '0') if part.isascii() else str(int(part))
+        parts[i] = f'{_NUMBER_MARK}{len(digits):04d}{digits}'
+    return ''.join(parts)
+
+
+def _default_label(keyword, count, partial):
+    return keyword
+
+
+def _default_file_label(file_name, duplicate_of):
+    return file_name
+
+
+def _coordinate(cell):
+    return format_coordinate(cell >> CELL_COLUMN_BITS, cell & _CELL_COLUMN_MASK)
+
+
+class _Columns:
+    """一次搜索的全部结果（列式）"""
+
+    def __init__(self):
+        # 文件表，只记录有匹配项的文件
+        self.file_paths = []
+        self.file_names = []
+        self.file_counts = []   # 每个文件的关键词统计 {关键词: 次数}
+        self.file_partial = []  # 每个文件结果不完整的原因，完整时为 None
+        self.file_duplicate_of = []  # 内容相同的第一个文件路径，不是重复文件时为 None
+        # 工作表名和关键词按值编号
+        self.sheets = []
+        self.sheet_ids = {}
+        self.keywords = []
+        self.keyword_ids = {}
+        # 每行一项
+        self.file_col = array('I')
+        self.sheet_col = array('I')
+        self.keyword_col = array('I')
+        self.cell_col = array('Q')
+        self.content = []
+        # 估计的内存占用（字节）
+        self.nbytes = 0
+        # 关键词列显示文本缓存 {(文件编号, 关键词编号): 文本}
+        self.labels = {}
+        # 重复文件的文件名列显示文本缓存 {文件编号: 文本}
+        self.file_labels = {}
+
+    def __len__(self):
+        return len(self.content)
+
+    def intern_sheet(self, sheet_name):
+        sheet_id = self.sheet_ids.get(sheet_name)
+        if sheet_id is None:
+            sheet_id = self.sheet_ids[sheet_name] = len(self.sheets)
+            self.sheets.append(sheet_name)
+        return sheet_id
+
+    def intern_keyword(self, keyword):
+        keyword_id = self.keyword_ids.get(keyword)
+        if keyword_id is None:
+            keyword_id = self.keyword_ids[keyword] = len(self.keywords)
+            self.keywords.append(keyword)
+        return keyword_id
+
+    def add_file(self, file_path, keyword_counts, partial, duplicate_of):
+        """登记有匹配项的文件，返回文件编号"""
+        file_id = len(self.file_paths)
+        self.file_paths.append(file_path)
+        self.file_names.append(os.path.basename(file_path))
+        self.file_counts.append(keyword_counts)
+        self.file_partial.append(partial)
+        self.file_duplicate_of.append(duplicate_of)
+        return file_id
+
+    def records(self, file_id, matches):
+        """把紧凑格式的匹配项转换为 (文件编号, 工作表编号, 关键词编号, 单元格位置, 内容)"""
+        sheet_id = None
+        last_sheet = None
+        for sheet_name, row_idx, col_idx, keyword, cell_str in matches:
+            if sheet_name is not last_sheet:
+                last_sheet = sheet_name
+                sheet_id = self.intern_sheet(sheet_name)
+            yield file_id, sheet_id, self.intern_keyword(keyword), row_idx << CELL_COLUMN_BITS | col_idx, cell_str
+
+    def append(self, file_id, matches):
+        """追加一个文件的匹配项"""
+        size = 0
+        for _, sheet_id, keyword_id, cell, cell_str in self.records(file_id, matches):
+            self.file_col.append(file_id)
+            self.sheet_col.append(sheet_id)
+            self.keyword_col.append(keyword_id)
+            self.cell_col.append(cell)
+            self.content.append(cell_str)
+            size += ROW_OVERHEAD_BYTES + len(cell_str)
+        self.nbytes += size
+
+    def label(self, file_id, keyword_id, format_label):
+        key = (file_id, keyword_id)
+        text = self.labels.get(key)
+        if text is None:
+            keyword = self.keywords[keyword_id]
+            text = self.labels[key] = format_label(
+                keyword, self.file_counts[file_id].get(keyword, 0), self.file_partial[file_id])
+        return text
+
+    def file_label(self, file_id, format_file_label):
+        duplicate_of = self.file_duplicate_of[file_id]
+        if duplicate_of is None:
+            return self.file_names[file_id]
+        text = self.file_labels.get(file_id)
+        if text is None:
+            text = self.file_labels[file_id] = format_file_label(self.file_names[file_id], duplicate_of)
+        return text
+
+    def coordinate(self, i):
+        return _coordinate(self.cell_col[i])
+
+    def make_row(self, file_id, sheet_id, keyword_id, cell, content, format_label, format_file_label):
+        """生成显示用的结果行 [文件名, 工作表, 单元格, 关键词, 内容, 文件路径]"""
+        return [
+            self.file_label(file_id, format_file_label),
+            self.sheets[sheet_id],
+            _coordinate(cell),
+            self.label(file_id, keyword_id, format_label),
+            content,
+            self.file_paths[file_id],
+        ]
+
+    def row(self, i, format_label, format_file_label):
+        return self.make_row(self.file_col[i], self.sheet_col[i], self.keyword_col[i], self.cell_col[i],
+                             self.content[i], format_label, format_file_label)
+
+
+def _discard_spill(conn, path):
+    conn.close()
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class _SpilledColumns(_Columns):
+    """
+    暂存到磁盘的结果：文件、工作表和关键词表仍在内存中，每行的数据保存在临时 SQLite 数据库；
+    行 i 在数据库中的 id 为 i + 1。后台线程导出时共用连接，每次访问都持有锁
+    """
+
+    def __init__(self, data, directory=None):
+        import sqlite3
+        import tempfile
+
+        super().__init__()
+        # 接管文件、工作表和关键词表及显示文本缓存
+        for name in ('file_paths', 'file_names', 'file_counts', 'file_partial', 'file_duplicate_of',
+                     'sheets', 'sheet_ids', 'keywords', 'keyword_ids', 'labels', 'file_labels'):
+            setattr(self, name, getattr(data, name))
+        self.file_col = self.sheet_col = self.keyword_col = self.cell_col = self.content = None
+
+        fd, self.path = tempfile.mkstemp(suffix='.db', prefix=SPILL_FILE_PREFIX, dir=directory or None)
+        os.close(fd)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        # 数据库删除后关闭连接并删除文件（正在导出的快照仍引用本对象）
+        weakref.finalize(self, _discard_spill, self.conn, self.path)
+        self.lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode = OFF')
+        self.conn.execute('PRAGMA synchronous = OFF')
+        self.conn.execute(f'PRAGMA cache_size = -{SPILL_CACHE_KB}')
+        self.conn.executescript(_SPILL_SCHEMA)
+        self.conn.create_function('natural_key', 1, _natural_key, deterministic=True)
+        self.conn.create_function('coordinate', 1, _coordinate, deterministic=True)
+        self.count = 0
+        self.content_keys = 0  # 已生成内容排序键的行数
+        self.snapshots = 0
+        self.write(zip(data.file_col, data.sheet_col, data.keyword_col, data.cell_col, data.content))
+
+    def __len__(self):
+        return self.count
+
+    def write(self, records):
+        with self.lock:
+            cursor = self.conn.executemany(
+                'INSERT INTO rows (file_id, sheet_id, keyword_id, cell, content) VALUES (?, ?, ?, ?, ?)', records)
+            self.conn.commit()
+            self.count += cursor.rowcount
+
+    def append(self, file_id, matches):
+        self.write(list(self.records(file_id, matches)))
+
+    def row(self, i, format_label, format_file_label):
+        record, = self.fetch(i, i + 1)
+        return self.make_row(*record, format_label, format_file_label)
+
+    def fetch(self, start, stop, table=None):
+        """
+        读取 [start, stop) 范围的行 (文件编号, 工作表编号, 关键词编号, 单元格位置, 内容)
+        :param table: 视图表名，为 None 时按原始顺序
+        """
+        if table is None:
+            sql = ('SELECT file_id, sheet_id, keyword_id, cell, content FROM rows '
+                   'WHERE id > ? AND id <= ? ORDER BY id')
+        else:
+            sql = (f'SELECT r.file_id, r.sheet_id, r.keyword_id, r.cell, r.content FROM {table} v '
+                   f'JOIN rows r ON r.id = v.row_id WHERE v.pos > ? AND v.pos <= ? ORDER BY v.pos')
+        with self.lock:
+            return self.conn.execute(sql, (start, stop)).fetchall()
+
+    def iter_records(self, size, table=None):
+        for start in range(0, size, SPILL_FETCH_ROWS):
+            yield from self.fetch(start, min(start + SPILL_FETCH_ROWS, size), table)
+
+    def fill(self, table, rows):
+        """替换排序键或过滤条件表的内容"""
+        rows = list(rows)
+        with self.lock:
+            self.conn.execute(f'DELETE FROM {table}')
+            if rows:
+                placeholders = ', '.join('?' * len(rows[0]))
+                self.conn.executemany(f'INSERT INTO {table} VALUES ({placeholders})', rows)
+            self.conn.commit()
+
+    def update_content_keys(self):
+        """为新增的行生成内容列的排序键（只在按内容排序时生成）"""
+        with self.lock:
+            self.conn.execute('UPDATE rows SET content_key = natural_key(content) WHERE id > ?',
+                              (self.content_keys,))
+            self.conn.commit()
+            self.content_keys = self.count
+
+    def build_view(self, join, where, order, params):
+        """按条件和顺序重建 view_rows 表，返回视图中的行数"""
+        with self.lock:
+            self.conn.execute('DELETE FROM view_rows')
+            cursor = self.conn.execute(
+                f'INSERT INTO view_rows (row_id) SELECT r.id FROM rows r {join} {where} ORDER BY {order}', params)
+            self.conn.commit()
+            return cursor.rowcount
+
+    def copy_view(self):
+        """复制当前视图供快照使用，返回表名"""
+        with self.lock:
+            self.snapshots += 1
+            table = f'snapshot_{self.snapshots}'
+            self.conn.execute(f'CREATE TABLE {table} (pos INTEGER PRIMARY KEY, row_id INTEGER)')
+            self.conn.execute(f'INSERT INTO {table} (row_id) SELECT row_id FROM view_rows ORDER BY pos')
+            self.conn.commit()
+            return table
+
+    def drop_table(self, table):
+        with self.lock:
+            self.conn.execute(f'DROP TABLE {table}')
+            self.conn.commit()
+
+
+class _DiskView:
+    """暂存到磁盘后的排序或过滤视图（数据库中的 view_rows 表），新增结果后延迟重建"""
+
+    def __init__(self, size, cost):
+        self.size = size
+        self.cost = cost  # 重建耗时（秒）
+        self.built = time.monotonic()
+        self.stale = False
+
+    def __len__(self):
+        return self.size
+
+    def due(self):
+        """有新增结果且距离上次重建已足够久"""
+        return self.stale and time.monotonic() - self.built >= self.cost * SPILL_VIEW_REBUILD_RATIO
+
+
+class _Snapshot:
+    """结果的只读快照：固定当时的行数和视图顺序，遍历时才生成行"""
+
+    def __init__(self, data, positions, format_label, format_file_label):
+        self._data = data
+        self._positions = positions
+        self._format_label = format_label
+        self._format_file_label = format_file_label
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __iter__(self):
+        data = self._data
+        format_label = self._format_label
+        format_file_label = self._format_file_label
+        return (data.row(i, format_label, format_file_label) for i in self._positions)
+
+
+class _SpilledSnapshot:
+    """暂存到磁盘的结果的快照：视图复制为单独的表，遍历时分批读取"""
+
+    def __init__(self, data, table, size, format_label, format_file_label):
+        self._data = data
+        self._table = table
+        self._size = size
+        self._format_label = format_label
+        self._format_file_label = format_file_label
+        if table is not None:
+            weakref.finalize(self, data.drop_table, table)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        # 生成器引用快照本身，遍历结束前视图副本不会被删除
+        make_row = self._data.make_row
+        format_label = self._format_label
+        format_file_label = self._format_file_label
+        for record in self._data.iter_records(self._size, self._table):
+            yield make_row(*record, format_label, format_file_label)
+
+
+class ResultStore:
+    def __init__(self, format_label=None, format_file_label=None, max_bytes=0, spill_dir=None):
+        """
+        :param format_label: 关键词列显示文本 format_label(关键词, 本文件内总次数, 结果不完整的原因)
+        :param format_file_label: 重复文件的文件名列显示文本 format_file_label(文件名, 内容相同的第一个文件路径)
+        :param max_bytes: 结果在内存中的估计占用上限（字节），超出后暂存到磁盘，0 表示不限制
+        :param spill_dir: 暂存数据库所在目录，为 None 时使用系统临时目录
+        """
+        self.format_label = format_label or _default_label
+        self.format_file_label = format_file_label or _default_file_label
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self._data = _Columns()
+        # 排序或过滤后的行号列表（暂存到磁盘后为 _DiskView），None 表示按原始顺序显示全部行
+        self._view = None
+        self._sort_column = None
+        self._sort_reverse = False
+        self._filter_text = ''
+
+    def clear(self):
+        """清空结果并重置排序和过滤（正在导出的快照仍引用原来的数据）"""
+        self._data = _Columns()
+        self._view = None
+        self._sort_column = None
+        self._sort_reverse = False
+        self._filter_text = ''
+
+    @property
+    def spilled(self):
+        """结果是否已暂存到磁盘"""
+        return isinstance(self._data, _SpilledColumns)
+
+    def add_file(self, file_path, matches, keyword_counts, partial=None, duplicate_of=None):
+        """
+        追加一个文件的结果，已有排序或过滤时同步更新视图（暂存到磁盘后延迟更新，见 flush）
+        :param matches: 紧凑格式的匹配项 (工作表, 行号, 列号, 关键词, 内容)，见 search_engine.search_file
+        :param keyword_counts: 本文件的关键词统计，关键词列显示时使用
+        :param partial: 结果不完整的原因
+        :param duplicate_of: 重复文件内容相同的第一个文件路径，见 search_engine.iter_file_results 的 dedupe
+        """
+        if not matches:
+            return
+        data = self._data
+        file_id = data.add_file(file_path, keyword_counts, partial, duplicate_of)
+        start = len(data)
+        data.append(file_id, matches)
+
+        if self.spilled:
+            if self._view is not None:
+                self._view.stale = True
+            return
+        if self.max_bytes and data.nbytes > self.max_bytes:
+            self._spill()
+            return
+        if self._view is None:
+            return
+        accepts = self._acceptor()
+        self._view.extend(i for i in range(start, len(data)) if accepts(i))
+        if self._sort_column is not None:
+            self._sort_view()
+
+    def _spill(self):
+        """把内存中的结果转存到临时数据库，之后的结果直接写入数据库"""
+        self._data = _SpilledColumns(self._data, self.spill_dir)
+        self._rebuild_view()
+
+    def flush(self):
+        """立即把暂存到磁盘后新增的结果并入排序或过滤视图"""
+        if isinstance(self._view, _DiskView) and self._view.stale:
+            self._rebuild_view()
+
+    def relabel(self):
+        """关键词列和文件名列显示文本的格式改变（如切换语言）后调用"""
+        self._data.labels.clear()
+        self._data.file_labels.clear()
+        if self._view is not None:
+            self._rebuild_view()
+
+    def _current_view(self):
+        """当前视图；暂存到磁盘后新增的结果按间隔并入视图，避免每个文件都重新排序全部结果"""
+        if isinstance(self._view, _DiskView) and self._view.due():
+            self._rebuild_view()
+        return self._view
+
+    def __len__(self):
+        """视图中的行数"""
+        view = self._current_view()
+        if view is None:
+            return len(self._data)
+        return len(view)
+
+    def row_count(self):
+        """全部结果行数（不受过滤影响）"""
+        return len(self._data)
+
+    def file_paths(self):
+        """有匹配结果的文件列表"""
+        return list(self._data.file_paths)
+
+    def get(self, position):
+        """获取视图中指定位置的行"""
+        if self.spilled:
+            positions = range(len(self))
+            rows = self.slice(positions[position], positions[position] + 1)
+            return rows[0]
+        if self._view is not None:
+            position = self._view[position]
+        return self._data.row(position, self.format_label, self.format_file_label)
+
+    def slice(self, start, stop):
+        """获取视图中 [start, stop) 范围的行"""
+        data = self._data
+        if self.spilled:
+            view = self._current_view()
+            positions = range(len(self))[start:stop]
+            records = data.fetch(positions.start, max(positions.start, positions.stop),
+                                 None if view is None else 'view_rows')
+            return [data.make_row(*record, self.format_label, self.format_file_label) for record in records]
+        if self._view is None:
+            positions = range(len(data))[start:stop]
+        else:
+            positions = self._view[start:stop]
+        return [data.row(i, self.format_label, self.format_file_label) for i in positions]
+
+    def iter_rows(self):
+        """按视图顺序遍历所有行"""
+        return iter(self.snapshot())
+
+    def snapshot(self):
+        """
+        当前视图的快照，供后台线程导出，不受之后的排序、过滤和新搜索影响；
+        只复制行号，行在遍历时才生成
+        """
+        data = self._data
+        if self.spilled:
+            self.flush()
+            if self._view is None:
+                return _SpilledSnapshot(data, None, len(data), self.format_label, self.format_file_label)
+            return _SpilledSnapshot(data, data.copy_view(), len(self._view),
+                                    self.format_label, self.format_file_label)
+        if self._view is None:
+            positions = range(len(data))
+        else:
+            positions = list(self._view)
+        return _Snapshot(data, positions, self.format_label, self.format_file_label)
+
+    @property
+    def sort_column(self):
+        return self._sort_column
+
+    @property
+    def sort_reverse(self):
+        return self._sort_reverse
+
+    def sort(self, column, reverse=False):
+        """按列排序，column 为 None 时恢复原始顺序"""
+        self._sort_column = column
+        self._sort_reverse = reverse
+        self._rebuild_view()
+
+    def filter(self, text):
+        """只显示任意一列包含 text 的行，空字符串表示不过滤"""
+        self._filter_text = text
+        self._rebuild_view()
+
+    def _file_hits(self, text):
+        data = self._data
+        return [text in data.file_label(file_id, self.format_file_label) or text in path
+                for file_id, path in enumerate(data.file_paths)]
+
+    def _acceptor(self):
+        """返回判断行号是否通过过滤的函数；文件、工作表和关键词列按编号只判断一次"""
+        if not self._filter_text:
+            return lambda i: True
+        text = self._filter_text
+        data = self._data
+        format_label = self.format_label
+        file_hit = self._file_hits(text)
+        sheet_hit = [text in sheet for sheet in data.sheets]
+        label_hit = {}
+
+        def accepts(i):
+            file_id = data.file_col[i]
+            if file_hit[file_id] or sheet_hit[data.sheet_col[i]] or text in data.content[i]:
+                return True
+            key = (file_id, data.keyword_col[i])
+            hit = label_hit.get(key)
+            if hit is None:
+                hit = label_hit[key] = text in data.label(file_id, key[1], format_label)
+            return hit or text in data.coordinate(i)
+        return accepts
+
+    def _sort_key(self, column):
+        """返回行号到排序键的函数；按编号保存的列每个值只计算一次排序键"""
+        data = self._data
+        if column == COLUMN_FILE_NAME:
+            keys = [_natural_key(data.file_label(file_id, self.format_file_label))
+                    for file_id in range(len(data.file_names))]
+            return lambda i: keys[data.file_col[i]]
+        if column == COLUMN_FILE_PATH:
+            keys = [_natural_key(path) for path in data.file_paths]
+            return lambda i: keys[data.file_col[i]]
+        if column == COLUMN_SHEET:
+            keys = [_natural_key(sheet) for sheet in data.sheets]
+            return lambda i: keys[data.sheet_col[i]]
+        if column == COLUMN_KEYWORD:
+            format_label = self.format_label
+            keys = {}
+
+            def label_key(i):
+                key = (data.file_col[i], data.keyword_col[i])
+                value = keys.get(key)
+                if value is None:
+                    value = keys[key] = _natural_key(data.label(key[0], key[1], format_label))
+                return value
+            return label_key
+        if column == COLUMN_CELL:
+            return lambda i: _natural_key(data.coordinate(i))
+        return lambda i: _natural_key(data.content[i])
+
+    def _sort_view(self):
+        self._view.sort(key=self._sort_key(self._sort_column), reverse=self._sort_reverse)
+
+    def _label_ids(self):
+        """全部 (文件编号, 关键词编号)"""
+        data = self._data
+        for file_id, counts in enumerate(data.file_counts):
+            for keyword in counts:
+                keyword_id = data.keyword_ids.get(keyword)
+                if keyword_id is not None:
+                    yield file_id, keyword_id
+
+    def _spilled_filter(self):
+        """
+        过滤条件的 SQL 和参数；文件、工作表和关键词列先在 Python 中按编号判断，写入条件表
+        """
+        text = self._filter_text
+        if not text:
+            return '', ()
+        data = self._data
+        data.fill('filter_files', ((file_id,) for file_id, hit in enumerate(self._file_hits(text)) if hit))
+        data.fill('filter_sheets', ((sheet_id,) for sheet_id, sheet in enumerate(data.sheets) if text in sheet))
+        data.fill('filter_labels', (key for key in self._label_ids()
+                                    if text in data.label(key[0], key[1], self.format_label)))
+        conditions = [
+            'r.file_id IN (SELECT id FROM filter_files)',
+            'r.sheet_id IN (SELECT id FROM filter_sheets)',
+            'instr(r.content, ?) > 0',
+            '(r.file_id, r.keyword_id) IN (SELECT file_id, keyword_id FROM filter_labels)',
+        ]
+        params = [text]
+        # 只有可能是坐标一部分的文本才需要逐行生成坐标
+        if _COORDINATE_PART.match(text):
+            conditions.append('instr(coordinate(r.cell), ?) > 0')
+            params.append(text)
+        return 'WHERE ' + ' OR '.join(conditions), params
+
+    def _spilled_order(self):
+        """排序的 JOIN 和 ORDER BY 子句；按编号保存的列每个值的排序键写入排序键表"""
+        column = self._sort_column
+        if column is None:
+            return '', 'r.id'
+        data = self._data
+        direction = ' DESC' if self._sort_reverse else ''
+        join = 'JOIN sort_keys k ON k.id = r.file_id'
+        order = f'k.key{direction}'
+        if column == COLUMN_FILE_NAME:
+            data.fill('sort_keys', ((file_id, _natural_key(data.file_label(file_id, self.format_file_label)))
+                                    for file_id in range(len(data.file_names))))
+        elif column == COLUMN_FILE_PATH:
+            data.fill('sort_keys', ((file_id, _natural_key(path)) for file_id, path in enumerate(data.file_paths)))
+        elif column == COLUMN_SHEET:
+            data.fill('sort_keys', ((sheet_id, _natural_key(sheet)) for sheet_id, sheet in enumerate(data.sheets)))
+            join = 'JOIN sort_keys k ON k.id = r.sheet_id'
+        elif column == COLUMN_KEYWORD:
+            data.fill('label_keys', ((file_id, keyword_id, _natural_key(data.label(file_id, keyword_id, self.format_label)))
+                                     for file_id, keyword_id in self._label_ids()))
+            join = 'JOIN label_keys k ON k.file_id = r.file_id AND k.keyword_id = r.keyword_id'
+        elif column == COLUMN_CELL:
+            # 坐标的自然顺序：列字母按文本顺序，同一列按行号
+            letters = sorted(range(1, MAX_COLUMN + 1), key=lambda col: format_coordinate(1, col)[:-1])
+            data.fill('sort_keys', ((col, rank) for rank, col in enumerate(letters)))
+            join = f'JOIN sort_keys k ON k.id = (r.cell & {_CELL_COLUMN_MASK})'
+            order = f'k.key{direction}, r.cell >> {CELL_COLUMN_BITS}{direction}'
+        else:
+            data.update_content_keys()
+            join = ''
+            order = f'r.content_key{direction}'
+        return join, f'{order}, r.id'
+
+    def _rebuild_view(self):
+        if self._sort_column is None and not self._filter_text:
+            self._view = None
+            return
+        if self.spilled:
+            start = time.monotonic()
+            where, params = self._spilled_filter()
+            join, order = self._spilled_order()
+            size = self._data.build_view(join, where, order, params)
+            self._view = _DiskView(size, time.monotonic() - start)
+            return
+        accepts = self._acceptor()
+        self._view = [i for i in range(len(self._data)) if accepts(i)]
+        if self._sort_column is not None:
+            self._sort_view()
@@ -0,0 +1,221 @@
+"""
+会话搜索缓存模块
+在内存中缓存每个文件的搜索结果和读出的单元格文本，同一会话内重复搜索时不再重新解析工作簿
+
+- 结果按 (文件路径, 大小, 修改时间, 单元格数限制, 搜索范围, 匹配方式, 关键词) 缓存，完全相同的搜索直接返回
+- 单元格文本按 (文件路径, 大小, 修改时间, 单元格数限制, 搜索范围) 缓存，同时记录每个关键词命中的单元格；
+  之后换用或增加关键词时，只需在缓存的文本中匹配新的关键词
+- 两类缓存共用一个内存上限，超出时淘汰最久未使用的项
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from excel_reader import ENGINE_PREFILTER
+from keyword_matcher import get_matcher
+
+# 默认内存上限（MB）
+DEFAULT_CACHE_MB = 256
+# 估算内存时每个单元格或结果项的固定开销（元组、整数、字符串对象头等，字节）
+CELL_OVERHEAD_BYTES = 150
+
+
+def estimate_cell_bytes(cell_str):
+    """估算缓存一个单元格文本或结果项占用的内存"""
+    return len(cell_str) + CELL_OVERHEAD_BYTES
+
+
+def file_fingerprint(file_path):
+    """文件指纹 (大小, 修改时间)，文件无法访问时返回 None"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def match_cells(cells, keywords, match_options):
+    """
+    在单元格文本中匹配关键词
+    :param cells: [(工作表, 行号, 列号, 文本)]
+    :return: {关键词: [(单元格序号, 单元格内出现次数)]}
+    """
+    matcher = get_matcher(keywords, match_options)
+    hits = {keyword: [] for keyword in keywords}
+    for ordinal, cell in enumerate(cells):
+        for keyword, count_in_cell in matcher.count(cell[3]).items():
+            hits[keyword].append((ordinal, count_in_cell))
+    return hits
+
+
+def assemble_matches(cells, hits, keywords):
+    """
+    由各关键词命中的单元格生成结果，顺序与直接搜索相同（按单元格顺序，同一单元格内按关键词顺序）
+    :return: (匹配列表, 关键词统计)
+    """
+    by_cell = {}
+    for keyword in dict.fromkeys(keywords):
+        for ordinal, count_in_cell in hits[keyword]:
+            by_cell.setdefault(ordinal, {})[keyword] = count_in_cell
+
+    matches = []
+    keyword_counts = {keyword: 0 for keyword in keywords}
+    for ordinal in sorted(by_cell):
+        cell_hits = by_cell[ordinal]
+        sheet_name, row_idx, col_idx, cell_str = cells[ordinal]
+        for keyword in keywords:
+            count_in_cell = cell_hits.get(keyword)
+            if count_in_cell:
+                keyword_counts[keyword] += count_in_cell
+                matches.append((sheet_name, row_idx, col_idx, keyword, cell_str))
+    return matches, keyword_counts
+
+
+def _options_key(match_options):
+    # 时间限制不影响匹配结果
+    return match_options._replace(regex_timeout=0)
+
+
+class _TextEntry:
+    def __init__(self, cells, partial):
+        self.cells = cells
+        self.partial = partial
+        self.hits = {}  # {匹配方式: {关键词: [(单元格序号, 次数)]}}
+        self.nbytes = sum(estimate_cell_bytes(cell[3]) for cell in cells)
+
+    def add_hits(self, options_key, hits):
+        known = self.hits.setdefault(options_key, {})
+        for keyword, keyword_hits in hits.items():
+            if keyword not in known:
+                known[keyword] = keyword_hits
+                self.nbytes += CELL_OVERHEAD_BYTES + 16 * len(keyword_hits)
+
+
+class _ResultEntry:
+    def __init__(self, matches, keyword_counts, partial):
+        self.matches = matches
+        self.keyword_counts = keyword_counts
+        self.partial = partial
+        self.nbytes = CELL_OVERHEAD_BYTES + sum(estimate_cell_bytes(match[4]) for match in matches)
+
+
+class SearchCache:
+    def __init__(self, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        """:param max_bytes: 内存上限（字节，估算值）"""
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._seen = {}  # {文件路径: (指纹, 搜索范围)}，本会话中搜索过的文件
+        self._lock = threading.Lock()
+
+    def set_max_bytes(self, max_bytes):
+        """修改内存上限，超出部分立即淘汰"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._seen.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, file_path, fingerprint, keywords, match_options, max_cells=0, scope=None):
+        """
+        查找缓存的结果
+        有缓存的文本时，只在文本中匹配尚未匹配过的关键词（正则表达式模式除外：
+        回溯失控的表达式在当前进程中无法中断，仍交给可终止的工作进程重新搜索）
+        :return: (匹配列表, 关键词统计, 结果不完整的原因)，没有缓存时返回 None
+        """
+        options_key = _options_key(match_options)
+        text_key = ('text', file_path, fingerprint, max_cells, scope)
+        with self._lock:
+            text = self._get(text_key)
+            if text is not None:
+                known = dict(text.hits.get(options_key, {}))
+                missing = [keyword for keyword in dict.fromkeys(keywords) if keyword not in known]
+                if missing and match_options.regex:
+                    text = None
+                else:
+                    self.hits += 1
+
+            if text is None:
+                result = self._get(('result', file_path, fingerprint, max_cells, scope, options_key, tuple(keywords)))
+                if result is not None:
+                    self.hits += 1
+                    return result.matches, dict(result.keyword_counts), result.partial
+                self.misses += 1
+                return None
+
+        if missing:
+            # 匹配新关键词时不持有锁，以免阻塞其他线程查找缓存
+            hits = match_cells(text.cells, missing, match_options)
+            with self._lock:
+                # 同时匹配同一关键词时只保存先完成的结果
+                old_size = text.nbytes
+                text.add_hits(options_key, hits)
+                # 匹配期间已被淘汰或替换的文本不再计入内存占用
+                if self._entries.get(text_key) is text:
+                    self.nbytes += text.nbytes - old_size
+                    self._evict()
+                known = dict(text.hits[options_key])
+        matches, keyword_counts = assemble_matches(text.cells, known, keywords)
+        return matches, keyword_counts, text.partial
+
+    def text_budget(self, file_path, fingerprint, engine, max_cells=0, scope=None):
+        """
+        搜索这个文件时最多保留多少字节的单元格文本，0 表示不保留
+        完整加载和流式引擎本来就读出全部单元格，总是保留；预筛选引擎只读出可能命中的单元格，
+        要保留文本需读出全部单元格，只在同一文件以相同范围第二次搜索时才这样做。
+        预筛选引擎跳过的工作表不计入单元格数限制，设置了该限制时不保留文本，以免结果是否完整的判断不同
+        """
+        if not self.max_bytes:
+            return 0
+        if engine == ENGINE_PREFILTER and (max_cells or self._seen.get(file_path) != (fingerprint, scope)):
+            return 0
+        return self.max_bytes // 4
+
+    def store(self, file_path, fingerprint, keywords, match_options, max_cells,
+              matches, keyword_counts, partial, text=None, scope=None):
+        """
+        缓存一个文件的搜索结果
+        :param text: (单元格列表, 各关键词命中的单元格)，见 search_engine.search_file 的 keep_text
+        :param scope: 搜索范围 search_scope.SearchScope，不同范围的结果分别缓存
+        """
+        options_key = _options_key(match_options)
+        with self._lock:
+            self._seen[file_path] = (fingerprint, scope)
+            if text is not None:
+                cells, hits = text
+                entry = _TextEntry(cells, partial)
+                entry.add_hits(options_key, hits)
+                self._put(('text', file_path, fingerprint, max_cells, scope), entry)
+            else:
+                entry = _ResultEntry(matches, dict(keyword_counts), partial)
+                self._put(('result', file_path, fingerprint, max_cells, scope, options_key, tuple(keywords)), entry)
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, entry):
+        if entry.nbytes > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        self._entries[key] = entry
+        self.nbytes += entry.nbytes
+        self._evict()
+
+    def _evict(self):
+        while self._entries and self.nbytes > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self.nbytes -= entry.nbytes
@@ -0,0 +1,286 @@
+"""
+命令行搜索模块
+无界面运行搜索，适合定时任务和服务器批处理；匹配结果边搜索边输出到标准输出
+退出码：0 有匹配，1 无匹配，2 参数错误或有文件处理失败
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+
+from config import get_config
+from excel_reader import ENGINES, format_coordinate
+from keyword_matcher import get_matcher, make_match_options
+import search_engine
+from search_scope import SCOPE_FIELDS, make_scope
+from search_stats import SearchReport
+
+OUTPUT_FIELDS = ['file_name', 'sheet', 'cell', 'keyword', 'content', 'file_path', 'file_keyword_count',
+                 'file_partial', 'duplicate_of']
+
+EXIT_MATCH = 0
+EXIT_NO_MATCH = 1
+EXIT_ERROR = 2
+# 下游关闭管道：与被 SIGPIPE 终止的进程相同（128 + 13），不当作搜索失败
+EXIT_BROKEN_PIPE = 141
+
+
+class JsonLinesWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write_header(self):
+        pass
+
+    def write(self, record):
+        self.stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class CsvWriter:
+    def __init__(self, stream):
+        self.writer = csv.writer(stream, lineterminator='\n')
+
+    def write_header(self):
+        self.writer.writerow(OUTPUT_FIELDS)
+
+    def write(self, record):
+        self.writer.writerow([record[field] for field in OUTPUT_FIELDS])
+
+
+WRITERS = {
+    'jsonl': JsonLinesWriter,
+    'csv': CsvWriter,
+}
+
+
+def parse_keywords(values):
+    """解析关键词参数，支持逗号分隔和多个参数"""
+    keywords = []
+    for value in values:
+        keywords += [kw.strip() for kw in value.split(',') if kw.strip()]
+    return keywords
+
+
+def build_parser():
+    """创建命令行参数解析器"""
+    config = get_config()
+    parser = argparse.ArgumentParser(
+        description='Search keywords in all .xlsx files under a directory and stream matches to stdout')
+    parser.add_argument('directory', help='directory to search')
+    parser.add_argument('keywords', nargs='+', help='keywords, separated by commas or spaces')
+    parser.add_argument('-w', '--workers', type=int, default=config.get_search_workers(),
+                        help='worker processes, 0 = all CPU cores, 1 = serial (default: %(default)s)')
+    parser.add_argument('-f', '--format', choices=sorted(WRITERS), default='jsonl',
+                        help='output format (default: %(default)s)')
+    parser.add_argument('--engine', choices=ENGINES, default=config.get_reader_engine(),
+                        help='workbook reader engine (default: %(default)s)')
+    parser.add_argument('--index', default=None,
+                        help='full-text index database to query before live scanning')
+    parser.add_argument('--include', action='append', default=None, metavar='PATTERN',
+                        help='file name glob to search, repeatable (default: %s)'
+                             % ' '.join(config.get_include_patterns()))
+    parser.add_argument('--exclude', action='append', default=None, metavar='PATTERN',
+                        help='file or directory glob to skip, repeatable; replaces the configured list')
+    parser.add_argument('--max-file-size', type=float, default=config.get_max_file_size_mb(),
+                        help='skip files larger than this many MB, 0 = no limit (default: %(default)s)')
+    parser.add_argument('--max-cells', type=int, default=config.get_max_cells_per_sheet(),
+                        help='stop reading a sheet after this many cells, 0 = no limit (default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=config.get_file_timeout(),
+                        help='per-file time limit in seconds, 0 = no limit (default: %(default)s)')
+    parser.add_argument('-i', '--ignore-case', action='store_true', default=config.get_ignore_case(),
+                        help='match keywords case-insensitively')
+    parser.add_argument('--whole-word', action='store_true', default=config.get_whole_word(),
+                        help='only match keywords not adjacent to letters, digits or underscores')
+    parser.add_argument('-E', '--regex', action='store_true', default=config.get_use_regex(),
+                        help='treat keywords as regular expressions')
+    parser.add_argument('--regex-timeout', type=float, default=config.get_regex_timeout(),
+                        help='per-file time limit in regex mode when --timeout is not set, '
+                             '0 = no limit (default: %(default)s)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('-l', '--files-only', dest='mode', action='store_const', const=search_engine.SEARCH_FILES,
+                      default=search_engine.SEARCH_ALL,
+                      help='only list the first match of each keyword per file and stop reading a file '
+                           'once every keyword has been seen')
+    mode.add_argument('-c', '--count', dest='mode', action='store_const', const=search_engine.SEARCH_COUNT,
+                      help='only write per-file keyword counts, without match rows')
+    parser.add_argument('-m', '--max-results', type=int, default=0,
+                        help='stop the search after this many matches, 0 = no limit (default: %(default)s)')
+    parser.add_argument('--sheet', dest='sheets', action='append', default=None, metavar='PATTERN',
+                        help='only search sheets matching this glob, repeatable or comma-separated')
+    parser.add_argument('--exclude-sheet', dest='exclude_sheets', action='append', default=None, metavar='PATTERN',
+                        help='skip sheets matching this glob, repeatable or comma-separated')
+    parser.add_argument('--columns', dest='columns', action='append', default=None, metavar='COLUMNS',
+                        help='only search these columns, e.g. A,C:F')
+    parser.add_argument('--header', dest='headers', action='append', default=None, metavar='NAME',
+                        help='only search columns whose row-1 header is NAME, repeatable or comma-separated')
+    parser.add_argument('--range', dest='ranges', action='append', default=None, metavar='RANGE',
+                        help='only search these cell ranges, e.g. A1:D100, B:D, 5:100 or Data!A1:D100; '
+                             'sheets without an applicable range are skipped')
+    parser.add_argument('--dedupe', action='store_true', default=config.get_dedupe_files(),
+                        help='search byte-identical files only once and repeat their matches for every copy')
+    parser.add_argument('--report', default=None,
+                        help='collect per-file timings and write a JSON search report to this file')
+    parser.add_argument('--top', type=int, default=config.get_stats_top_n(),
+                        help='slowest files to list with --report (default: %(default)s)')
+    return parser
+
+
+def get_match_options(args):
+    """根据命令行参数创建关键词匹配方式"""
+    return make_match_options(args.ignore_case, args.whole_word, args.regex, args.regex_timeout)
+
+
+def get_search_scope(args):
+    """
+    根据命令行参数创建搜索范围，未指定的项使用配置
+    :raises ValueError: 列或区域格式不正确
+    """
+    configured = get_config().get_search_scope()
+    values = {}
+    for field in SCOPE_FIELDS:
+        specified = getattr(args, field)
+        if specified is None:
+            values[field] = configured.get(field)
+        else:
+            values[field] = [item for value in specified for item in value.split(',')]
+    return make_scope(**values)
+
+
+def run_search(args, output, cancel_event=None, report=None):
+    """
+    执行搜索并逐条写出匹配结果
+    :param report: SearchReport，不为 None 时收集每个文件的统计信息
+    :return: (匹配数, 全局关键词统计, 失败文件数)，只统计时匹配数为关键词出现总次数
+    """
+    limits = search_engine.make_limits(args.max_file_size, args.max_cells, args.timeout, args.max_results)
+    keywords = parse_keywords(args.keywords)
+    writer = WRITERS[args.format](output)
+    writer.write_header()
+
+    match_count = 0
+    error_count = 0
+    global_keyword_counts = {keyword: 0 for keyword in keywords}
+    config = get_config()
+    file_paths = search_engine.find_excel_files(
+        args.directory,
+        config.get_include_patterns() if args.include is None else args.include,
+        config.get_exclude_patterns() if args.exclude is None else args.exclude,
+        config.get_discovery_workers())
+
+    duplicates = {}
+    for _, file_path, matches, keyword_counts, error, partial in search_engine.iter_file_results(
+            file_paths, keywords, args.engine, args.workers, cancel_event, args.index,
+            on_stats=None if report is None else report.add, limits=limits,
+            match_options=get_match_options(args), dedupe=args.dedupe, on_duplicate=duplicates.__setitem__,
+            mode=args.mode, scope=get_search_scope(args)):
+        if error is not None:
+            error_count += 1
+            print(f"[Error] Failed to process file: {file_path}, reason: {error}", file=sys.stderr)
+        if partial is not None:
+            print(f"[Partial] Results are incomplete: {file_path}, reason: {partial}", file=sys.stderr)
+
+        file_name = os.path.basename(file_path)
+        duplicate_of = duplicates.get(file_path)
+        if args.mode == search_engine.SEARCH_COUNT:
+            # 只统计时每个文件中出现的每个关键词输出一条记录
+            for keyword, count in keyword_counts.items():
+                if count:
+                    writer.write({
+                        'file_name': file_name,
+                        'sheet': None,
+                        'cell': None,
+                        'keyword': keyword,
+                        'content': None,
+                        'file_path': file_path,
+                        'file_keyword_count': count,
+                        'file_partial': partial,
+                        'duplicate_of': duplicate_of,
+                    })
+        for sheet_name, row_idx, col_idx, keyword, content in matches:
+            writer.write({
+                'file_name': file_name,
+                'sheet': sheet_name,
+                'cell': format_coordinate(row_idx, col_idx),
+                'keyword': keyword,
+                'content': content,
+                'file_path': file_path,
+                'file_keyword_count': keyword_counts[keyword],
+                'file_partial': partial,
+                'duplicate_of': duplicate_of,
+            })
+        match_count += sum(keyword_counts.values()) if args.mode == search_engine.SEARCH_COUNT else len(matches)
+        output.flush()
+
+        for keyword, count in keyword_counts.items():
+            global_keyword_counts[keyword] += count
+
+    return match_count, global_keyword_counts, error_count
+
+
+def write_report(report, file_path, top_n):
+    """保存搜索报告，并在标准错误中列出最慢的文件"""
+    report.finish()
+    report.save_json(file_path, top_n)
+    print(f"Slowest {top_n} files:", file=sys.stderr)
+    for stats in report.slowest(top_n):
+        print(f"  {stats['total_seconds']:8.3f}s  {stats['cells']:>10} cells  {stats['file_path']}",
+              file=sys.stderr)
+    print(f"Search report saved to {file_path}", file=sys.stderr)
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        print(f"[Error] Not a directory: {args.directory}", file=sys.stderr)
+        return EXIT_ERROR
+    if not parse_keywords(args.keywords):
+        print("[Error] Please enter at least one keyword", file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        get_matcher(parse_keywords(args.keywords), get_match_options(args))
+    except re.error as e:
+        print(f"[Error] Invalid regular expression: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        get_search_scope(args)
+    except ValueError as e:
+        print(f"[Error] Invalid search scope: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    cancel_event = threading.Event()
+    report = None
+    if args.report:
+        report = SearchReport(args.directory, parse_keywords(args.keywords), args.engine, args.workers)
+    try:
+        match_count, keyword_counts, error_count = run_search(args, sys.stdout, cancel_event, report)
+    except KeyboardInterrupt:
+        cancel_event.set()
+        return 130
+    except BrokenPipeError:
+        # 下游（如 head）提前关闭管道时安静退出，避免退出时刷新stdout再次报错
+        cancel_event.set()
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return EXIT_BROKEN_PIPE
+
+    stats_text = ' | '.join(f"{keyword}: {count}" for keyword, count in keyword_counts.items())
+    print(f"{match_count} matches | {stats_text}", file=sys.stderr)
+    if report is not None:
+        write_report(report, args.report, args.top)
+
+    if error_count:
+        return EXIT_ERROR
+    return EXIT_MATCH if match_count else EXIT_NO_MATCH
+
+
+if __name__ == "__main__":
+    # 打包后的程序使用多进程搜索时需要
+    multiprocessing.freeze_support()
+    sys.exit(main())
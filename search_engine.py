@@ -0,0 +1,582 @@
+"""
+搜索引擎模块
+与界面无关的Excel关键词搜索逻辑，支持串行和多进程并行搜索
+进程池、可终止的工作进程池和全文索引模块在第一次用到时才导入，以缩短界面启动时间
+"""
+import itertools
+import os
+import time
+from collections import namedtuple
+
+from excel_reader import DEFAULT_ENGINE, format_coordinate, iter_cells
+from file_discovery import DEFAULT_DISCOVERY_WORKERS, discover_files
+from keyword_matcher import EXACT_MATCH, get_matcher
+from search_cache import estimate_cell_bytes, file_fingerprint
+from search_stats import new_file_stats
+
+# 并行搜索时检查取消标志的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.2
+
+# 结果不完整的原因
+PARTIAL_FILE_TOO_LARGE = 'file_too_large'  # 文件超过大小限制，未读取
+PARTIAL_CELL_LIMIT = 'cell_limit'          # 有工作表超过单元格数限制，只读取了前面的部分
+PARTIAL_TIMEOUT = 'timeout'                # 超过单个文件的时间限制，已终止
+PARTIAL_MAX_MATCHES = 'max_matches'        # 已达到结果数上限，没有读完
+
+# 搜索方式
+SEARCH_ALL = 'all'        # 列出全部匹配项
+SEARCH_FILES = 'files'    # 只找出包含关键词的文件：每个关键词只列出第一个匹配项，全部关键词都出现后不再读取该文件
+SEARCH_COUNT = 'count'    # 只统计各关键词的出现次数，不生成匹配项
+SEARCH_MODES = (SEARCH_ALL, SEARCH_FILES, SEARCH_COUNT)
+
+# 处理限制，各项为 0 表示不限制
+# max_file_size: 文件大小（字节）；max_cells_per_sheet: 每个工作表读取的单元格数；timeout: 墙钟时间（秒）；
+# max_matches: 整个搜索的结果数，达到后停止搜索（单个文件达到时也不再继续读取）
+SearchLimits = namedtuple('SearchLimits', ['max_file_size', 'max_cells_per_sheet', 'timeout', 'max_matches'],
+                          defaults=(0,))
+NO_LIMITS = SearchLimits(0, 0, 0)
+
+
+def make_limits(max_file_size_mb=0, max_cells_per_sheet=0, timeout=0, max_matches=0):
+    """根据配置值创建处理限制（文件大小以MB为单位）"""
+    return SearchLimits(int(max_file_size_mb * 1024 * 1024), int(max_cells_per_sheet), float(timeout),
+                        int(max_matches))
+
+
+def resolve_workers(workers):
+    """解析进程数，0 或 None 表示使用全部CPU核心"""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def find_excel_files(directory, include_patterns=None, exclude_patterns=None,
+                     workers=DEFAULT_DISCOVERY_WORKERS, cache_ttl=0):
+    """
+    遍历目录，返回所有.xlsx文件路径（保持os.walk顺序）
+    默认跳过Office锁文件（~$开头）、版本库和备份目录，参数说明见 file_discovery.discover_files
+    """
+    return discover_files(directory, include_patterns, exclude_patterns, workers, cache_ttl)
+
+
+def _timed_cells(cells, stats):
+    """包装单元格生成器，统计读取耗时、单元格数和工作表数"""
+    clock = time.perf_counter
+    sheets = set()
+    read_seconds = 0.0
+    opened = False
+    start = None
+    try:
+        start = clock()
+        for cell in cells:
+            elapsed = clock() - start
+            if opened:
+                read_seconds += elapsed
+            else:
+                stats['open_seconds'] = elapsed
+                opened = True
+            stats['cells'] += 1
+            sheets.add(cell[0])
+            start = None
+            yield cell
+            start = clock()
+    finally:
+        # 读取结束或读取时出错：计入最后一次读取的耗时
+        if start is not None:
+            elapsed = clock() - start
+            if opened:
+                read_seconds += elapsed
+            else:
+                stats['open_seconds'] = elapsed
+        stats['parse_seconds'] = read_seconds
+        stats['sheets'] = len(sheets)
+
+
+def _scan_file(file_path, keywords, engine, limits=NO_LIMITS, stats=None, match_options=EXACT_MATCH, keep_text=0,
+               mode=SEARCH_ALL, scope=None):
+    """
+    搜索单个文件，stats 不为 None 时同时填入统计信息
+    匹配项为紧凑格式 (工作表, 行号, 列号, 关键词, 内容)，文件信息不在每个匹配项中重复
+    :param keep_text: 大于 0 时读出全部单元格并保留文本（最多约 keep_text 字节，超出时不保留），供会话缓存使用
+    :param mode: 搜索方式 SEARCH_*，SEARCH_FILES 时关键词统计为是否出现（0 或 1）
+    :param scope: 搜索范围 search_scope.SearchScope，为 None 时搜索整个工作簿
+    :return: (匹配列表, 关键词统计, 错误信息, 结果不完整的原因, 保留的文本)，
+             保留的文本为 (单元格列表 [(工作表, 行号, 列号, 文本)], {关键词: [(单元格序号, 次数)]}) 或 None
+    """
+    matches = []
+    keyword_counts = {keyword: 0 for keyword in keywords}
+    error = None
+    truncated_sheets = []
+    stopped = False
+    count_only = mode == SEARCH_COUNT
+    # 只找文件时尚未出现的关键词，全部出现后停止读取
+    unseen = set(keywords) if mode == SEARCH_FILES else None
+    text_cells = text_hits = None
+    if keep_text:
+        text_cells = []
+        text_hits = {keyword: [] for keyword in keywords}
+        text_bytes = 0
+
+    try:
+        if limits.max_file_size and os.path.getsize(file_path) > limits.max_file_size:
+            return matches, keyword_counts, error, PARTIAL_FILE_TOO_LARGE, None
+
+        matcher = get_matcher(keywords, match_options)
+        # 保留文本时需要全部单元格，不按关键词预筛选
+        cells = iter_cells(file_path, engine, None if keep_text else keywords, limits.max_cells_per_sheet,
+                           truncated_sheets.append, match_options, scope)
+        if stats is not None:
+            cells = _timed_cells(cells, stats)
+        for sheet_name, row_idx, col_idx, value in cells:
+            cell_str = str(value)
+            if text_cells is not None:
+                ordinal = len(text_cells)
+                text_cells.append((sheet_name, row_idx, col_idx, cell_str))
+                text_bytes += estimate_cell_bytes(cell_str)
+                if text_bytes > keep_text:
+                    text_cells = text_hits = None
+            # 一次扫描得到所有命中关键词及其在当前单元格中的出现次数
+            for keyword, count_in_cell in matcher.match(cell_str):
+                if count_only:
+                    keyword_counts[keyword] += count_in_cell
+                    continue
+                if unseen is not None:
+                    if keyword not in unseen:
+                        continue
+                    unseen.discard(keyword)
+                    keyword_counts[keyword] = 1
+                else:
+                    keyword_counts[keyword] += count_in_cell
+                matches.append((sheet_name, row_idx, col_idx, keyword, cell_str))
+                if text_hits is not None:
+                    keyword_hits = text_hits[keyword]
+                    # 重复的关键词只记录一次
+                    if not keyword_hits or keyword_hits[-1][0] != ordinal:
+                        keyword_hits.append((ordinal, count_in_cell))
+            if unseen is not None and not unseen:
+                break
+            if limits.max_matches and len(matches) >= limits.max_matches:
+                stopped = True
+                break
+    except Exception as e:
+        error = str(e)
+        if stats is not None:
+            stats['error'] = error
+            stats['error_type'] = type(e).__name__
+
+    partial = PARTIAL_MAX_MATCHES if stopped else PARTIAL_CELL_LIMIT if truncated_sheets else None
+    text = (text_cells, text_hits) if text_cells is not None and error is None and not stopped else None
+    return matches, keyword_counts, error, partial, text
+
+
+def search_excel(file_path, keywords, engine=DEFAULT_ENGINE, match_options=EXACT_MATCH, mode=SEARCH_ALL,
+                 scope=None):
+    """
+    搜索单个Excel文件
+    匹配项格式为 [文件名, 工作表, 单元格, 关键词, 内容, 文件路径]，关键词列尚未附加统计信息
+    :param match_options: 关键词匹配方式 MatchOptions
+    :param mode: 搜索方式 SEARCH_*
+    :param scope: 搜索范围 search_scope.SearchScope
+    :return: (匹配列表, 关键词统计, 错误信息)，成功时错误信息为 None
+    """
+    matches, keyword_counts, error, _, _ = _scan_file(file_path, keywords, engine, match_options=match_options,
+                                                      mode=mode, scope=scope)
+    return expand_matches(file_path, matches), keyword_counts, error
+
+
+def expand_matches(file_path, matches):
+    """把紧凑格式的匹配项展开为 [文件名, 工作表, 单元格, 关键词, 内容, 文件路径]"""
+    file_name = os.path.basename(file_path)
+    return [
+        [file_name, sheet_name, format_coordinate(row_idx, col_idx), keyword, cell_str, file_path]
+        for sheet_name, row_idx, col_idx, keyword, cell_str in matches
+    ]
+
+
+def search_file(file_path, keywords, engine=DEFAULT_ENGINE, limits=NO_LIMITS, collect_stats=False,
+                match_options=EXACT_MATCH, keep_text=0, mode=SEARCH_ALL, scope=None):
+    """
+    按处理限制搜索单个Excel文件，可同时收集统计信息（见 search_stats.new_file_stats）
+    匹配项为紧凑格式 (工作表, 行号, 列号, 关键词, 内容)，可用 expand_matches 展开
+    :param keep_text: 保留单元格文本的字节上限，0 表示不保留，见 _scan_file
+    :param mode: 搜索方式 SEARCH_*
+    :param scope: 搜索范围 search_scope.SearchScope
+    :return: (匹配列表, 关键词统计, 错误信息, 结果不完整的原因, 统计信息, 保留的文本)，
+             结果完整时原因为 None，不收集统计时统计信息为 None，不保留文本时文本为 None
+    """
+    if not collect_stats:
+        matches, keyword_counts, error, partial, text = _scan_file(
+            file_path, keywords, engine, limits, match_options=match_options, keep_text=keep_text, mode=mode,
+            scope=scope)
+        return matches, keyword_counts, error, partial, None, text
+
+    stats = new_file_stats(file_path)
+    start = time.perf_counter()
+    matches, keyword_counts, error, partial, text = _scan_file(
+        file_path, keywords, engine, limits, stats, match_options, keep_text, mode, scope)
+    stats['total_seconds'] = time.perf_counter() - start
+    stats['match_seconds'] = max(0.0, stats['total_seconds'] - stats['open_seconds'] - stats['parse_seconds'])
+    stats['hits'] = len(matches)
+    stats['partial'] = partial
+    return matches, keyword_counts, error, partial, stats, text
+
+
+def add_keyword_totals(matches, keyword_counts, format_label=None):
+    """
+    第二遍：为每个匹配项的关键词列附加本文件内的总次数
+    :param format_label: 标签格式化函数 (keyword, count) -> str，为 None 时保持原样
+    """
+    if format_label is None:
+        return matches
+
+    final_matches = []
+    for match in matches:
+        keyword = match[3]
+        updated_match = match.copy()
+        updated_match[3] = format_label(keyword, keyword_counts[keyword])
+        final_matches.append(updated_match)
+    return final_matches
+
+
+def _search_index(index_path, keywords, positions, match_options=EXACT_MATCH, scope=None):
+    """
+    从索引中查询已建立索引且未变化的文件
+    :param positions: [(文件序号, 文件路径)]
+    :return: (索引命中的结果列表, 仍需实时搜索的 positions)
+    """
+    if not os.path.exists(index_path):
+        # 尚未建立索引
+        return [], positions
+
+    from search_index import SearchIndex
+    try:
+        with SearchIndex(index_path, readonly=True) as index:
+            file_ids = index.get_file_ids(file_path for _, file_path in positions)
+            indexed = index.search(keywords, file_ids, match_options, scope)
+    except Exception as e:
+        # 索引不可用时全部回退到实时搜索
+        print(f"[Error] Search index unavailable: {index_path}, reason: {e}")
+        return [], positions
+
+    results = []
+    remaining = []
+    for index, file_path in positions:
+        if file_path in indexed:
+            results.append((index, file_path) + indexed[file_path] + (None, None))
+        else:
+            remaining.append((index, file_path))
+    return results, remaining
+
+
+def reduce_matches(matches, keyword_counts, mode):
+    """
+    把完整的搜索结果转换为指定搜索方式的结果（用于索引和缓存返回的结果）
+    :return: (匹配列表, 关键词统计)
+    """
+    if mode == SEARCH_COUNT:
+        return [], keyword_counts
+    if mode == SEARCH_FILES:
+        first = {}
+        for match in matches:
+            first.setdefault(match[3], match)
+        return list(first.values()), {keyword: int(keyword in first) for keyword in keyword_counts}
+    return matches, keyword_counts
+
+
+def iter_file_results(file_paths, keywords, engine=DEFAULT_ENGINE, workers=1, cancel_event=None,
+                      index_path=None, on_stats=None, limits=NO_LIMITS, match_options=EXACT_MATCH, cache=None,
+                      dedupe=False, on_duplicate=None, mode=SEARCH_ALL, scope=None, executor=None):
+    """
+    逐个文件产出搜索结果，并行模式下按完成顺序产出（缓存命中的文件最先产出）
+    :param workers: 进程数，1 表示在当前进程串行搜索
+    :param cancel_event: threading.Event，被设置后不再处理剩余文件
+    :param index_path: 全文索引路径，索引中未变化的文件直接查询索引，其余文件实时搜索
+    :param on_stats: 每个文件的统计回调 on_stats(stats)，为 None 时不收集统计
+    :param limits: SearchLimits，设置了时间限制时每个文件都在可终止的工作进程中搜索；
+                   设置了结果数上限时，产出的匹配项达到上限后停止搜索，最后一个文件的结果截断并标记为不完整
+    :param match_options: 关键词匹配方式 MatchOptions；正则表达式模式下未设置时间限制时使用 regex_timeout
+    :param cache: 会话缓存 search_cache.SearchCache，未变化的文件直接使用缓存，实时搜索的结果存入缓存
+    :param dedupe: 是否先找出内容相同的文件（见 file_dedup），每份内容只搜索一次，
+                   结果紧接在第一个文件之后按原样产出给其余文件
+    :param on_duplicate: 产出重复文件的结果前调用 on_duplicate(文件路径, 内容相同的第一个文件路径)
+    :param mode: 搜索方式 SEARCH_*
+    :param scope: 搜索范围 search_scope.SearchScope，为 None 时搜索整个工作簿
+    :param executor: 多个搜索共用的进程池 ProcessPoolExecutor，为 None 时按 workers 创建；
+                     共用时每次最多提交 workers 个文件，多个搜索轮流使用进程（设置了时间限制时仍使用可终止的工作进程）
+    :return: 生成器，元素为 (文件序号, 文件路径, 匹配列表, 关键词统计, 错误信息, 结果不完整的原因)，
+             匹配项为紧凑格式 (工作表, 行号, 列号, 关键词, 内容)
+    """
+    positions = list(enumerate(file_paths))
+    total = len(positions)
+    copies = {}  # {第一个文件路径: [(文件序号, 重复文件路径)]}
+    if dedupe:
+        from file_dedup import find_duplicates
+        duplicates = find_duplicates(file_paths)
+        for index, file_path in positions:
+            original = duplicates.get(file_path)
+            if original is not None:
+                copies.setdefault(original, []).append((index, file_path))
+        positions = [(index, file_path) for index, file_path in positions if file_path not in duplicates]
+
+    results = _iter_results(positions, keywords, engine, workers, cancel_event, index_path, on_stats,
+                            limits, match_options, cache, mode, scope, executor)
+    if copies:
+        results = _with_copies(results, copies, on_duplicate, on_stats)
+    return limit_results(results, mode, limits.max_matches, total, match_options)
+
+
+def _count_matches(matches, keywords, mode, match_options):
+    """按截断后保留的匹配项重新统计关键词次数"""
+    keyword_counts = {keyword: 0 for keyword in keywords}
+    if mode == SEARCH_FILES:
+        for match in matches:
+            keyword_counts[match[3]] = 1
+        return keyword_counts
+    matcher = get_matcher(list(keywords), match_options)
+    for _, _, _, keyword, cell_str in matches:
+        keyword_counts[keyword] += dict(matcher.match(cell_str)).get(keyword, 0)
+    return keyword_counts
+
+
+def limit_results(results, mode=SEARCH_ALL, max_matches=0, total=None, match_options=EXACT_MATCH):
+    """
+    按搜索方式转换逐个文件的结果，产出的匹配项达到 max_matches 后停止（0 表示不限制），
+    还有文件未产出时最后一个文件标记为不完整；该文件的结果被截断时按保留的匹配项重新统计关键词次数
+    :param results: 可迭代对象，元素格式与 iter_file_results 相同
+    :param total: results 中的文件数，为 None 时不知道是否还有文件，达到上限时总是标记为不完整
+    :param match_options: 关键词匹配方式，用于重新统计截断后的关键词次数
+    """
+    found = 0
+    for done, (index, file_path, matches, keyword_counts, error, partial) in enumerate(results, 1):
+        if mode != SEARCH_ALL:
+            matches, keyword_counts = reduce_matches(matches, keyword_counts, mode)
+        if max_matches and found + len(matches) >= max_matches:
+            remaining = max_matches - found
+            if len(matches) > remaining:
+                matches = matches[:remaining]
+                keyword_counts = _count_matches(matches, keyword_counts, mode, match_options)
+                partial = PARTIAL_MAX_MATCHES
+            elif total is None or done < total:
+                # 恰好达到上限，后面的文件不再搜索
+                partial = PARTIAL_MAX_MATCHES
+            yield index, file_path, matches, keyword_counts, error, partial
+            return
+        found += len(matches)
+        yield index, file_path, matches, keyword_counts, error, partial
+
+
+def _with_copies(results, copies, on_duplicate, on_stats):
+    """每个文件的结果之后，按原样产出与其内容相同的重复文件"""
+    for result in results:
+        yield result
+        original = result[1]
+        for index, file_path in copies.get(original, ()):
+            if on_duplicate is not None:
+                on_duplicate(file_path, original)
+            if on_stats is not None:
+                stats = new_file_stats(file_path, source='duplicate')
+                stats.update(hits=len(result[2]), error=result[4], partial=result[5])
+                on_stats(stats)
+            yield (index, file_path) + result[2:]
+
+
+def _iter_results(positions, keywords, engine, workers, cancel_event, index_path, on_stats, limits, match_options,
+                  cache, mode, scope, executor=None):
+    """iter_file_results 的实现，positions 为 [(文件序号, 文件路径)]"""
+    collect_stats = on_stats is not None
+    if match_options.regex and not limits.timeout and match_options.regex_timeout:
+        # re 模块无法中断，回溯失控的表达式只能通过终止工作进程停止
+        limits = limits._replace(timeout=match_options.regex_timeout)
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    fingerprints = {}
+
+    def finish(index, file_path, result):
+        """交出统计信息（如有），存入缓存，返回统一格式的结果"""
+        matches, keyword_counts, error, partial, stats, text = result
+        if collect_stats:
+            on_stats(stats)
+        fingerprint = fingerprints.get(file_path)
+        # 提前结束的搜索方式没有读完文件，不存入缓存
+        if (fingerprint is not None and mode == SEARCH_ALL and error is None
+                and partial in (None, PARTIAL_CELL_LIMIT)):
+            cache.store(file_path, fingerprint, keywords, match_options, limits.max_cells_per_sheet,
+                        matches, keyword_counts, partial, text, scope)
+        return index, file_path, matches, keyword_counts, error, partial
+
+    def keep_text(file_path):
+        fingerprint = fingerprints.get(file_path)
+        if fingerprint is None or mode != SEARCH_ALL or limits.max_matches:
+            return 0
+        return cache.text_budget(file_path, fingerprint, engine, limits.max_cells_per_sheet, scope)
+
+    def failed(file_path, error=None, error_type=None, partial=None):
+        """工作进程失败或超时的文件"""
+        stats = None
+        if collect_stats:
+            stats = new_file_stats(file_path)
+            stats.update(error=error, error_type=error_type, partial=partial)
+            if partial == PARTIAL_TIMEOUT:
+                stats['total_seconds'] = limits.timeout
+        return [], {keyword: 0 for keyword in keywords}, error, partial, stats, None
+
+    if cache is not None:
+        remaining = []
+        for index, file_path in positions:
+            if cancelled():
+                return
+            fingerprint = file_fingerprint(file_path)
+            cached = None
+            if fingerprint is not None:
+                fingerprints[file_path] = fingerprint
+                cached = cache.lookup(file_path, fingerprint, keywords, match_options, limits.max_cells_per_sheet,
+                                      scope)
+            if cached is None:
+                remaining.append((index, file_path))
+                continue
+            matches, keyword_counts, partial = cached
+            if collect_stats:
+                stats = new_file_stats(file_path, source='cache')
+                stats['hits'] = len(matches)
+                stats['partial'] = partial
+                on_stats(stats)
+            yield index, file_path, matches, keyword_counts, None, partial
+        positions = remaining
+    if index_path:
+        indexed, positions = _search_index(index_path, keywords, positions, match_options, scope)
+        for result in indexed:
+            if cancelled():
+                return
+            if collect_stats:
+                stats = new_file_stats(result[1], source='index')
+                stats['hits'] = len(result[2])
+                on_stats(stats)
+            yield result
+    if not positions:
+        return
+
+    workers = min(resolve_workers(workers), len(positions))
+    if limits.timeout:
+        # 超时的文件直接终止其工作进程，继续处理下一个文件
+        from worker_pool import STATUS_OK, STATUS_TIMEOUT, run_with_timeout
+        tasks = [((index, file_path), (file_path, keywords, engine, limits, collect_stats, match_options,
+                                       keep_text(file_path), mode, scope))
+                 for index, file_path in positions]
+        for (index, file_path), status, result in run_with_timeout(
+                search_file, tasks, workers, limits.timeout, cancelled):
+            if status == STATUS_OK:
+                yield finish(index, file_path, result)
+            elif status == STATUS_TIMEOUT:
+                yield finish(index, file_path, failed(file_path, partial=PARTIAL_TIMEOUT))
+            else:
+                yield finish(index, file_path, failed(file_path, result))
+        return
+
+    if workers <= 1 and executor is None:
+        for index, file_path in positions:
+            if cancelled():
+                return
+            yield finish(index, file_path, search_file(file_path, keywords, engine, limits, collect_stats,
+                                                       match_options, keep_text(file_path), mode, scope))
+        return
+
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    shared = executor is not None
+    if not shared:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    waiting = iter(positions)
+    futures = {}
+    pending = set()
+
+    def submit(count):
+        for index, file_path in itertools.islice(waiting, count):
+            future = executor.submit(search_file, file_path, keywords, engine, limits, collect_stats,
+                                     match_options, keep_text(file_path), mode, scope)
+            futures[future] = (index, file_path)
+            pending.add(future)
+
+    # 自己的进程池一次提交全部文件；共用的进程池只保持 workers 个文件在运行或排队
+    submit(max(workers, 1) if shared else len(positions))
+    try:
+        while pending:
+            # 定时醒来检查取消标志，避免被耗时文件长时间阻塞
+            done, _ = wait(pending, timeout=CANCEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            pending -= done
+            if cancelled():
+                return
+            if shared:
+                submit(len(done))
+            for future in done:
+                index, file_path = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 子进程异常退出等情况，按单个文件失败处理
+                    result = failed(file_path, str(e), type(e).__name__)
+                yield finish(index, file_path, result)
+    finally:
+        if pending:
+            # 取消或提前结束：撤销排队中的任务，不等待正在运行的文件
+            for future in pending:
+                future.cancel()
+            if not shared:
+                executor.shutdown(wait=False)
+        elif not shared:
+            executor.shutdown()
+
+
+def search_all_excels(directory, keywords, engine=DEFAULT_ENGINE, workers=1,
+                      format_label=None, on_error=None, index_path=None, on_stats=None,
+                      limits=NO_LIMITS, on_partial=None, match_options=EXACT_MATCH, cache=None, dedupe=False,
+                      mode=SEARCH_ALL, scope=None, sink=None):
+    """
+    搜索目录中的所有Excel文件
+    并行模式在每个文件完成时合并统计，最终结果按文件遍历顺序排列，与串行模式一致
+    :param workers: 进程数，1 为串行，0 表示使用全部CPU核心
+    :param index_path: 全文索引路径，为 None 时全部实时搜索
+    :param format_label: 关键词标签格式化函数 (keyword, count) -> str
+    :param on_error: 单个文件处理失败时的回调 (file_path, error)
+    :param on_stats: 每个文件的统计回调 on_stats(stats)，为 None 时不收集统计
+    :param limits: 处理限制 SearchLimits，设置了结果数上限时达到后停止搜索
+    :param on_partial: 文件因超出限制而结果不完整时的回调 (file_path, reason)
+    :param match_options: 关键词匹配方式 MatchOptions
+    :param cache: 会话缓存 search_cache.SearchCache，为 None 时不使用缓存
+    :param dedupe: 内容相同的文件只搜索一次，见 iter_file_results
+    :param mode: 搜索方式 SEARCH_*，SEARCH_COUNT 时只返回统计
+    :param scope: 搜索范围 search_scope.SearchScope，为 None 时搜索整个工作簿
+    :param sink: 结果存储 result_store.ResultStore，不为 None 时每个文件完成后直接存入（按完成顺序），
+                 不在内存中累积匹配列表，结果较多时可暂存到磁盘；返回的匹配列表为空
+    :return: (匹配列表, 全局关键词统计)
+    """
+    file_paths = find_excel_files(directory)
+    file_results = [None] * len(file_paths)
+    global_keyword_counts = {keyword: 0 for keyword in keywords}  # 全局关键词统计
+
+    duplicates = {}
+
+    for index, file_path, matches, keyword_counts, error, partial in iter_file_results(
+            file_paths, keywords, engine, workers, index_path=index_path, on_stats=on_stats, limits=limits,
+            match_options=match_options, cache=cache, dedupe=dedupe, on_duplicate=duplicates.__setitem__,
+            mode=mode, scope=scope):
+        if error is not None and on_error is not None:
+            on_error(file_path, error)
+        if partial is not None and on_partial is not None:
+            on_partial(file_path, partial)
+        if sink is not None:
+            sink.add_file(file_path, matches, keyword_counts, partial, duplicates.get(file_path))
+        else:
+            file_results[index] = add_keyword_totals(
+                expand_matches(file_path, matches), keyword_counts, format_label)
+
+        # 累加到全局统计
+        for keyword, count in keyword_counts.items():
+            global_keyword_counts[keyword] += count
+
+    results = []
+    for matches in file_results:
+        # 达到结果数上限后未搜索的文件没有结果
+        if matches is not None:
+            results += matches
+    return results, global_keyword_counts
@@ -0,0 +1,313 @@
+"""
+全文索引模块
+把工作簿单元格文本保存到本地SQLite FTS5数据库，关键词搜索直接查询索引
+文件以 绝对路径 + 大小 + 修改时间 标识，变化后自动回退到实时搜索
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from urllib.request import pathname2url
+
+from excel_reader import DEFAULT_ENGINE, ENGINES, iter_cells
+from file_dedup import file_hash
+from keyword_matcher import EXACT_MATCH, get_matcher
+from search_cache import file_fingerprint
+from search_scope import HEADER_ROW
+
+# trigram分词器支持任意子串匹配，不足3个字符的关键词需要逐行比较
+MIN_MATCH_LENGTH = 3
+# 不区分大小写的分词器设置；索引中的候选单元格再由关键词匹配器精确判断，区分大小写的搜索也可使用
+_FOLDED_TOKENIZER = 'case_sensitive 0'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS cells USING fts5(
+    text,
+    file_id UNINDEXED,
+    sheet UNINDEXED,
+    row UNINDEXED,
+    col UNINDEXED,
+    tokenize = 'trigram case_sensitive 0'
+);
+"""
+
+
+def _quote_phrase(keyword):
+    """把关键词转换为FTS5短语查询"""
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+class SearchIndex:
+    def __init__(self, db_path, readonly=False):
+        """
+        :param readonly: 只读打开（用于查询），数据库文件不存在时抛出 sqlite3.OperationalError，不创建文件也不修改表结构
+        """
+        self.db_path = db_path
+        if readonly:
+            uri = 'file:' + pathname2url(os.path.abspath(db_path)) + '?mode=ro'
+            self.conn = sqlite3.connect(uri, uri=True)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self.conn = sqlite3.connect(db_path)
+            # WAL模式下建立索引时不阻塞其他连接的查询
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(_SCHEMA)
+            self._upgrade_schema()
+        self.folded = self._is_folded()
+
+    def _upgrade_schema(self):
+        """
+        旧版本索引（修改时间以秒为单位、分词器区分大小写）清空后重新建表，由下次刷新重新提取，
+        之后修改时间与会话缓存使用相同的指纹比较，不区分大小写的搜索也能查询索引
+        """
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(files)')]
+        if 'mtime_ns' not in columns or not self._is_folded():
+            with self.conn:
+                self.conn.execute('DROP TABLE cells')
+                self.conn.execute('DROP TABLE files')
+            self.conn.executescript(_SCHEMA)
+
+    def _is_folded(self):
+        """单元格文本表的分词器是否不区分大小写"""
+        row = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'cells'").fetchone()
+        return row is not None and _FOLDED_TOKENIZER in row[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_file_ids(self, file_paths):
+        """
+        找出索引中与磁盘文件一致（大小和修改时间均未变化）的文件
+        :return: {文件ID: 文件路径}
+        """
+        fresh = {}
+        for file_path in file_paths:
+            row = self.conn.execute(
+                'SELECT id, size, mtime_ns FROM files WHERE path = ?', (os.path.abspath(file_path),)).fetchone()
+            if row is not None and (row[1], row[2]) == file_fingerprint(file_path):
+                fresh[row[0]] = file_path
+        return fresh
+
+    def get_manifest(self):
+        """
+        获取索引中所有文件的指纹
+        :return: {绝对路径: (大小, 修改时间, 内容哈希)}
+        """
+        return {
+            path: (size, mtime, content_hash)
+            for path, size, mtime, content_hash in self.conn.execute(
+                'SELECT path, size, mtime_ns, hash FROM files')
+        }
+
+    def update_fingerprint(self, file_path, size, mtime_ns):
+        """只更新文件指纹，不重新提取内容（调用方负责提交事务）"""
+        self.conn.execute(
+            'UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?',
+            (size, mtime_ns, os.path.abspath(file_path)))
+
+    def remove_file(self, file_path):
+        """从索引中删除文件（调用方负责提交事务）"""
+        row = self.conn.execute(
+            'SELECT id FROM files WHERE path = ?', (os.path.abspath(file_path),)).fetchone()
+        if row is not None:
+            self.conn.execute('DELETE FROM cells WHERE file_id = ?', (row[0],))
+            self.conn.execute('DELETE FROM files WHERE id = ?', (row[0],))
+
+    def index_file(self, file_path, engine=DEFAULT_ENGINE, content_hash=None):
+        """
+        提取单个文件的单元格文本写入索引，替换该文件原有的条目
+        :param content_hash: 文件内容哈希，不使用哈希比较时为 None
+        :return: 错误信息，成功时为 None
+        """
+        fingerprint = file_fingerprint(file_path)
+        if fingerprint is None:
+            return f"Cannot access file: {file_path}"
+        try:
+            with self.conn:
+                self.remove_file(file_path)
+                cursor = self.conn.execute(
+                    'INSERT INTO files (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)',
+                    (os.path.abspath(file_path),) + fingerprint + (content_hash,))
+                file_id = cursor.lastrowid
+                # 以生成器逐行写入，内存占用与文件大小无关
+                self.conn.executemany(
+                    'INSERT INTO cells (text, file_id, sheet, row, col) VALUES (?, ?, ?, ?, ?)',
+                    ((str(value), file_id, sheet_name, row_idx, col_idx)
+                     for sheet_name, row_idx, col_idx, value in iter_cells(file_path, engine)))
+        except Exception as e:
+            return str(e)
+        return None
+
+    def _sheet_scope(self, scope, file_id, sheet_name):
+        """单个工作表的搜索范围，按表头名称选择列时从索引中读取表头行"""
+        sheet_scope = scope.for_sheet(sheet_name)
+        if sheet_scope is not None and sheet_scope.needs_header:
+            sheet_scope.resolve_headers(self.conn.execute(
+                'SELECT col, text FROM cells WHERE file_id = ? AND sheet = ? AND row = ?',
+                (file_id, sheet_name, HEADER_ROW)))
+        return sheet_scope
+
+    def search(self, keywords, file_ids, match_options=EXACT_MATCH, scope=None):
+        """
+        在索引中搜索关键词，只返回 file_ids 中的文件
+        :param file_ids: {文件ID: 文件路径}，通常来自 get_file_ids
+        :param match_options: 关键词匹配方式；正则表达式模式（以及不足3个字符的关键词不区分大小写时）无法用全文索引筛选，
+                              逐行比较 file_ids 中文件的单元格
+        :param scope: 搜索范围 search_scope.SearchScope，只返回范围内的单元格
+        :return: {文件路径: (匹配列表, 关键词统计)}，匹配项格式与 search_engine.search_file 相同
+        """
+        results = {
+            file_path: ([], {keyword: 0 for keyword in keywords})
+            for file_path in file_ids.values()
+        }
+        if not results or not keywords:
+            return results
+
+        can_match = all(len(keyword) >= MIN_MATCH_LENGTH for keyword in keywords)
+        if match_options.regex or (match_options.ignore_case and not (can_match and self.folded)):
+            condition = ''
+            params = []
+        elif can_match:
+            condition = 'cells MATCH ? AND'
+            params = [' OR '.join(_quote_phrase(keyword) for keyword in keywords)]
+        else:
+            condition = '(' + ' OR '.join('instr(text, ?) > 0' for _ in keywords) + ') AND'
+            params = list(keywords)
+
+        # 要查询的文件编号放在临时表中，只读取这些文件的单元格
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS query_files (id INTEGER PRIMARY KEY)')
+        self.conn.execute('DELETE FROM temp.query_files')
+        self.conn.executemany('INSERT INTO temp.query_files (id) VALUES (?)', ((file_id,) for file_id in file_ids))
+        query = (f"SELECT file_id, sheet, row, col, text FROM cells "
+                 f"WHERE {condition} file_id IN (SELECT id FROM temp.query_files) ORDER BY rowid")
+
+        matcher = get_matcher(keywords, match_options)
+        sheet_scopes = {}  # {(文件ID, 工作表名): 单个工作表的范围}
+        for file_id, sheet_name, row_idx, col_idx, cell_str in self.conn.execute(query, params):
+            file_path = file_ids[file_id]
+            if scope is not None:
+                key = (file_id, sheet_name)
+                if key not in sheet_scopes:
+                    sheet_scopes[key] = self._sheet_scope(scope, file_id, sheet_name)
+                sheet_scope = sheet_scopes[key]
+                if sheet_scope is None or not sheet_scope.contains(row_idx, col_idx):
+                    continue
+            matches, keyword_counts = results[file_path]
+            for keyword, count_in_cell in matcher.match(cell_str):
+                keyword_counts[keyword] += count_in_cell
+                matches.append((sheet_name, row_idx, col_idx, keyword, cell_str))
+        return results
+
+
+def refresh_index(db_path, file_paths, directory=None, engine=DEFAULT_ENGINE, use_hash=False,
+                  force=False, on_progress=None, on_error=None):
+    """
+    增量刷新索引：只重新提取新增或修改过的文件，并删除已不存在的文件
+    :param file_paths: 当前磁盘上的文件列表
+    :param directory: 文件列表对应的目录，索引中位于该目录下但已不存在的文件会被删除
+    :param use_hash: 大小或修改时间变化时再比较内容哈希，内容相同则只更新指纹
+    :param force: 忽略指纹，重新提取所有文件
+    :param on_progress: 进度回调 (已完成数, 总数)
+    :param on_error: 单个文件处理失败时的回调 (file_path, error)
+    :return: 统计信息 {'added', 'updated', 'removed', 'skipped', 'failed'}
+    """
+    stats = {'added': 0, 'updated': 0, 'removed': 0, 'skipped': 0, 'failed': 0}
+
+    with SearchIndex(db_path) as index:
+        manifest = index.get_manifest()
+        seen = set()
+
+        for done, file_path in enumerate(file_paths, 1):
+            path = os.path.abspath(file_path)
+            seen.add(path)
+            entry = manifest.get(path)
+            content_hash = None
+            try:
+                fingerprint = file_fingerprint(file_path)
+                if fingerprint is not None and entry is not None and not force and entry[:2] == fingerprint:
+                    stats['skipped'] += 1
+                    continue
+
+                if use_hash:
+                    content_hash = file_hash(file_path)
+                    if fingerprint is not None and entry is not None and not force and content_hash == entry[2]:
+                        # 仅修改时间等元数据变化，内容未变
+                        with index.conn:
+                            index.update_fingerprint(file_path, *fingerprint)
+                        stats['skipped'] += 1
+                        continue
+
+                error = index.index_file(file_path, engine, content_hash)
+            except OSError as e:
+                error = str(e)
+            finally:
+                if on_progress is not None:
+                    on_progress(done, len(file_paths))
+
+            if error is not None:
+                stats['failed'] += 1
+                if on_error is not None:
+                    on_error(file_path, error)
+            elif entry is None:
+                stats['added'] += 1
+            else:
+                stats['updated'] += 1
+
+        if directory is not None:
+            prefix = os.path.join(os.path.abspath(directory), '')
+            with index.conn:
+                for path in manifest:
+                    if path.startswith(prefix) and path not in seen:
+                        index.remove_file(path)
+                        stats['removed'] += 1
+
+    return stats
+
+
+def main():
+    """命令行入口：python search_index.py 目录 [--index 索引文件] [--hash] [--rebuild]"""
+    # 延迟导入，避免与 search_engine 循环引用
+    from config import get_config
+    from search_engine import find_excel_files
+
+    config = get_config()
+    parser = argparse.ArgumentParser(
+        description='Build or incrementally refresh the full-text index for Excel files in a directory')
+    parser.add_argument('directory', help='directory to index')
+    parser.add_argument('--index', default=config.get_index_path(), help='index database path')
+    parser.add_argument('--engine', default=config.get_reader_engine(), choices=ENGINES,
+                        help='workbook reader engine')
+    parser.add_argument('--hash', action='store_true', default=config.get_index_use_hash(),
+                        help='compare content hashes when size or mtime changed')
+    parser.add_argument('--rebuild', action='store_true', help='re-extract every file')
+    args = parser.parse_args()
+
+    directory = os.path.abspath(args.directory)
+    file_paths = find_excel_files(directory, config.get_include_patterns(), config.get_exclude_patterns(),
+                                  config.get_discovery_workers())
+    stats = refresh_index(
+        args.index, file_paths, directory, args.engine, args.hash, args.rebuild,
+        on_progress=lambda done, total: print(f"[{done}/{total}]", end='\r'),
+        on_error=lambda file_path, error: print(f"[Error] {file_path}: {error}"))
+    print(f"Index {args.index}: {stats['added']} added, {stats['updated']} updated, "
+          f"{stats['removed']} removed, {stats['skipped']} skipped, {stats['failed']} failed")
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
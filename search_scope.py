@@ -0,0 +1,186 @@
+"""
+搜索范围模块
+限定搜索的工作表、列和单元格区域。读取引擎按范围跳过整个工作表、范围外的行和列，
+读取量与范围的大小相关，而不是整个文件
+
+- 工作表：包含/排除通配符，不区分大小写
+- 列：列字母（A、C:F）或表头名称（第一行单元格的文本，不区分大小写）
+- 区域：A1:D100、B:D、5:100、C3 等，可用工作表名限定，如 数据!A1:D100；设置了区域时，
+  没有适用区域的工作表不搜索
+"""
+import re
+from collections import namedtuple
+from fnmatch import fnmatchcase
+
+# 按表头名称选择列时，表头所在的行
+HEADER_ROW = 1
+# Excel 最大列数
+MAX_COLUMN = 16384
+# 配置和 make_scope 参数中的各项
+SCOPE_FIELDS = ('sheets', 'exclude_sheets', 'columns', 'headers', 'ranges')
+
+_COLUMN_LETTERS = re.compile(r'^\$?([A-Za-z]{1,3})$')
+_RANGE = re.compile(r'^(?:(?P<sheet>.+)!)?(?P<start>\$?[A-Za-z]{0,3}\$?\d*)(?::(?P<end>\$?[A-Za-z]{0,3}\$?\d*))?$')
+_REFERENCE = re.compile(r'^\$?([A-Za-z]{0,3})\$?(\d*)$')
+
+
+class SearchScope(namedtuple('SearchScope', ['sheets', 'exclude_sheets', 'columns', 'headers', 'ranges'])):
+    """
+    搜索范围（可哈希，可作为缓存键的一部分），用 make_scope 创建
+    sheets / exclude_sheets: 小写的工作表名通配符；columns: 列号集合，None 表示不按列字母选择；
+    headers: 规范化的表头名称；ranges: (工作表名通配符或 None, 起始行, 起始列, 结束行, 结束列)，不限制的一边为 None
+    """
+    __slots__ = ()
+
+    def for_sheet(self, sheet_name):
+        """单个工作表的搜索范围 SheetScope，工作表不在范围内时返回 None"""
+        name = sheet_name.lower()
+        if self.sheets and not any(fnmatchcase(name, pattern) for pattern in self.sheets):
+            return None
+        if any(fnmatchcase(name, pattern) for pattern in self.exclude_sheets):
+            return None
+        rects = [rect[1:] for rect in self.ranges if rect[0] is None or fnmatchcase(name, rect[0])]
+        if self.ranges and not rects:
+            return None
+        return SheetScope(rects or [(None, None, None, None)], self.columns, self.headers)
+
+
+def column_index(letters):
+    """列字母转换为列号，如 A -> 1，AA -> 27"""
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + ord(char) - 64
+    if not 1 <= index <= MAX_COLUMN:
+        raise ValueError(f"Invalid column: {letters}")
+    return index
+
+
+def normalize_header(value):
+    """表头名称比较时的规范形式"""
+    return str(value).strip().casefold()
+
+
+def _parse_columns(specs):
+    """解析列字母和列范围（如 A、C:F），返回列号集合"""
+    columns = set()
+    for spec in specs:
+        parts = spec.split(':')
+        matches = [_COLUMN_LETTERS.match(part.strip()) for part in parts]
+        if len(parts) > 2 or not all(matches):
+            raise ValueError(f"Invalid column: {spec}")
+        first, last = (column_index(match.group(1)) for match in (matches[0], matches[-1]))
+        columns.update(range(min(first, last), max(first, last) + 1))
+    return frozenset(columns)
+
+
+def _parse_reference(text, spec):
+    """解析区域的一端，返回 (行号, 列号)，省略的部分为 None"""
+    match = _REFERENCE.match(text)
+    if match is None or not (match.group(1) or match.group(2)):
+        raise ValueError(f"Invalid range: {spec}")
+    letters, digits = match.groups()
+    row = int(digits) if digits else None
+    if row == 0:
+        raise ValueError(f"Invalid range: {spec}")
+    return row, column_index(letters) if letters else None
+
+
+def _parse_range(spec):
+    match = _RANGE.match(spec)
+    if match is None:
+        raise ValueError(f"Invalid range: {spec}")
+    sheet = match.group('sheet')
+    if sheet is not None:
+        sheet = sheet.strip().strip("'").lower()
+    start_row, start_col = _parse_reference(match.group('start'), spec)
+    end = match.group('end')
+    end_row, end_col = _parse_reference(end, spec) if end is not None else (start_row, start_col)
+    # 一端只写了行号（或列号）时另一端也必须如此，如 5:100、B:D
+    if (start_row is None) != (end_row is None) or (start_col is None) != (end_col is None):
+        raise ValueError(f"Invalid range: {spec}")
+    if start_row is not None:
+        start_row, end_row = min(start_row, end_row), max(start_row, end_row)
+    if start_col is not None:
+        start_col, end_col = min(start_col, end_col), max(start_col, end_col)
+    return sheet, start_row, start_col, end_row, end_col
+
+
+def _clean(values):
+    return [value.strip() for value in values or () if value and value.strip()]
+
+
+def make_scope(sheets=None, exclude_sheets=None, columns=None, headers=None, ranges=None):
+    """
+    根据配置值或命令行参数创建搜索范围，各项为字符串列表
+    :return: SearchScope，全部为空时返回 None（搜索整个工作簿）
+    :raises ValueError: 列或区域格式不正确
+    """
+    sheets, exclude_sheets, columns, headers, ranges = (
+        _clean(values) for values in (sheets, exclude_sheets, columns, headers, ranges))
+    if not (sheets or exclude_sheets or columns or headers or ranges):
+        return None
+    return SearchScope(
+        tuple(pattern.lower() for pattern in sheets),
+        tuple(pattern.lower() for pattern in exclude_sheets),
+        _parse_columns(columns) if columns else None,
+        tuple(normalize_header(header) for header in headers),
+        tuple(_parse_range(spec) for spec in ranges),
+    )
+
+
+class SheetScope:
+    """单个工作表的搜索范围：若干矩形区域与选中列的交集"""
+
+    def __init__(self, rects, columns, headers):
+        self.rects = rects
+        self.columns = columns
+        self.headers = headers
+        self._update()
+
+    @property
+    def needs_header(self):
+        """是否需要先读取表头行来确定列"""
+        return bool(self.headers)
+
+    def resolve_headers(self, cells):
+        """
+        根据表头行确定表头名称对应的列，与列字母选中的列合并
+        :param cells: 表头行的 (列号, 值)
+        """
+        wanted = set(self.headers)
+        found = {col for col, value in cells if value is not None and normalize_header(value) in wanted}
+        self.columns = found | (self.columns or frozenset())
+        self.headers = ()
+        self._update()
+
+    def _update(self):
+        min_rows, min_cols, max_rows, max_cols = zip(*self.rects)
+        self.min_row = min(row or 1 for row in min_rows)
+        self.max_row = None if None in max_rows else max(max_rows)
+        self.min_col = min(col or 1 for col in min_cols)
+        self.max_col = None if None in max_cols else max(max_cols)
+        if self.columns is not None and not self.headers:
+            # 表头名称确定之前不能按列缩小范围
+            self.min_col = max(self.min_col, min(self.columns, default=MAX_COLUMN + 1))
+            if self.columns:
+                self.max_col = min(self.max_col or MAX_COLUMN, max(self.columns))
+
+    @property
+    def empty(self):
+        """范围内没有任何单元格"""
+        if self.columns is not None and not self.headers and not self.columns:
+            return True
+        return self.max_col is not None and self.min_col > self.max_col
+
+    def bounds(self):
+        """包含整个范围的矩形 (起始行, 起始列, 结束行, 结束列)，结束行列为 None 表示不限制"""
+        return self.min_row, self.min_col, self.max_row, self.max_col
+
+    def contains(self, row, col):
+        if self.columns is not None and col not in self.columns:
+            return False
+        for min_row, min_col, max_row, max_col in self.rects:
+            if ((min_row is None or min_row <= row) and (max_row is None or row <= max_row)
+                    and (min_col is None or min_col <= col) and (max_col is None or col <= max_col)):
+                return True
+        return False
@@ -0,0 +1,438 @@
+"""
+本地搜索服务模块
+常驻后台运行，让同一台机器上的多个图形界面共用预热的缓存：目录列表缓存、会话搜索缓存（读出的单元格文本和结果）
+和全文索引，共享目录中的同一个文件只需解析一次；并发的搜索共用一个进程池。
+只监听本机地址，通过 HTTP/JSON 接口搜索，结果逐个文件流式返回：
+
+GET  /status  服务状态
+POST /search  请求体为 JSON（见 make_request），响应为 application/x-ndjson，每行一条消息：
+              {"type": "total", "files": 文件数}
+              {"type": "file", "path": 文件路径, "matches": [[工作表, 行号, 列号, 关键词, 内容], ...],
+               "counts": {关键词: 次数}, "error": 错误信息, "partial": 结果不完整的原因, "duplicate_of": 内容相同的第一个文件}
+              {"type": "stats", "stats": 单个文件的统计}（请求中 collect_stats 为 true 时）
+              {"type": "error", "error": 错误信息}
+              {"type": "done", "cancelled": 是否已取消}
+              客户端断开连接时停止该次搜索
+
+启动：python search_server.py [--port 端口] [-w 进程数]；图形界面中设置配置项 search_server 后作为客户端使用
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import re
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from config import get_config
+from excel_reader import ENGINES
+from keyword_matcher import get_matcher, make_match_options
+import search_engine
+from search_cache import SearchCache
+from search_scope import SCOPE_FIELDS, make_scope
+
+DEFAULT_HOST = '127.0.0.1'
+# 请求体的大小上限（字节）
+MAX_REQUEST_BYTES = 1024 * 1024
+# 客户端连接服务的超时（秒）
+CONNECT_TIMEOUT = 5.0
+NDJSON_TYPE = 'application/x-ndjson'
+JSON_TYPE = 'application/json'
+# 请求头 Host 允许的主机名（另加服务监听的地址），防止网页借助DNS重绑定访问服务
+LOCAL_HOST_NAMES = ('localhost', '127.0.0.1', '::1')
+
+
+class RemoteSearchError(Exception):
+    """搜索服务拒绝请求或返回错误"""
+
+
+def make_request(directory, keywords, engine=search_engine.DEFAULT_ENGINE, limits=search_engine.NO_LIMITS,
+                 match_options=None, mode=search_engine.SEARCH_ALL, scope=None, dedupe=False,
+                 include_patterns=None, exclude_patterns=None, use_index=False, collect_stats=False):
+    """
+    创建搜索请求（可直接转换为 JSON）
+    :param limits: SearchLimits
+    :param match_options: MatchOptions，为 None 时精确匹配
+    :param scope: 搜索范围配置 {项: 字符串列表}，见 search_scope.make_scope
+    :param use_index: 是否查询服务的全文索引（服务启动时指定了索引才有效）
+    """
+    return {
+        'directory': directory,
+        'keywords': list(keywords),
+        'engine': engine,
+        'limits': limits._asdict(),
+        'match_options': None if match_options is None else match_options._asdict(),
+        'mode': mode,
+        'scope': scope,
+        'dedupe': dedupe,
+        'include_patterns': include_patterns,
+        'exclude_patterns': exclude_patterns,
+        'use_index': use_index,
+        'collect_stats': collect_stats,
+    }
+
+
+def _get_object(data, key):
+    """取出请求中的 JSON 对象，未提供时为空字典"""
+    value = data.get(key)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError(f"{key} must be a JSON object")
+    return value
+
+
+def _get_string_list(data, key):
+    """取出请求中的字符串列表，未提供时为 None"""
+    value = data.get(key)
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{key} must be a list of strings")
+    return value
+
+
+def parse_request(data):
+    """
+    检查搜索请求并转换为搜索参数
+    :raises ValueError: 请求格式不正确、正则表达式或搜索范围有误
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Request must be a JSON object")
+    directory = data.get('directory')
+    if not isinstance(directory, str) or not directory:
+        raise ValueError("Missing directory")
+    keywords = [keyword.strip() for keyword in _get_string_list(data, 'keywords') or () if keyword.strip()]
+    if not keywords:
+        raise ValueError("Please enter at least one keyword")
+    engine = data.get('engine') or search_engine.DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    mode = data.get('mode') or search_engine.SEARCH_ALL
+    if mode not in search_engine.SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+    limits = _get_object(data, 'limits')
+    unknown = sorted(set(limits) - set(search_engine.SearchLimits._fields))
+    if unknown:
+        raise ValueError(f"Unknown limits: {', '.join(unknown)}")
+    # 未提供的项不限制
+    limits = search_engine.NO_LIMITS._replace(**limits)
+    if not all(isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value < math.inf
+               for value in limits):
+        raise ValueError("limits must be non-negative numbers")
+    if not all(isinstance(value, int) for value in (limits.max_file_size, limits.max_cells_per_sheet,
+                                                     limits.max_matches)):
+        raise ValueError("max_file_size, max_cells_per_sheet and max_matches must be integers")
+    try:
+        match_options = make_match_options(**_get_object(data, 'match_options'))
+    except TypeError as e:
+        raise ValueError(str(e))
+    try:
+        get_matcher(keywords, match_options)
+    except re.error as e:
+        raise ValueError(f"Invalid regular expression: {e}")
+    spec = _get_object(data, 'scope')
+    scope = make_scope(**{field: _get_string_list(spec, field) for field in SCOPE_FIELDS})
+    return {
+        'directory': directory,
+        'keywords': keywords,
+        'engine': engine,
+        'limits': limits,
+        'match_options': match_options,
+        'mode': mode,
+        'scope': scope,
+        'dedupe': bool(data.get('dedupe')),
+        'include_patterns': _get_string_list(data, 'include_patterns'),
+        'exclude_patterns': _get_string_list(data, 'exclude_patterns'),
+        'use_index': bool(data.get('use_index')),
+        'collect_stats': bool(data.get('collect_stats')),
+    }
+
+
+class SearchService:
+    """常驻的搜索状态：共用的进程池、会话缓存和目录列表缓存，供各个请求线程同时使用"""
+
+    def __init__(self, workers=0, cache_mb=256, index_path=None, discovery_workers=8, discovery_cache_ttl=30):
+        """
+        :param workers: 进程池大小，0 表示使用全部CPU核心
+        :param cache_mb: 会话缓存的内存上限（MB），0 表示不缓存
+        :param index_path: 全文索引路径，为 None 时全部实时搜索
+        :param discovery_cache_ttl: 目录列表缓存有效期（秒）
+        """
+        self.workers = search_engine.resolve_workers(workers)
+        self.cache = SearchCache(int(cache_mb * 1024 * 1024)) if cache_mb > 0 else None
+        self.index_path = index_path
+        self.discovery_workers = discovery_workers
+        self.discovery_cache_ttl = discovery_cache_ttl
+        self.started = time.time()
+        self.active = 0
+        self.searches = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get_executor(self):
+        """共用的进程池，第一次搜索时创建"""
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def status(self):
+        cache = self.cache
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'workers': self.workers,
+            'active_searches': self.active,
+            'searches': self.searches,
+            'index_path': self.index_path,
+            'cache': None if cache is None else {
+                'entries': len(cache),
+                'bytes': cache.nbytes,
+                'max_bytes': cache.max_bytes,
+                'hits': cache.hits,
+                'misses': cache.misses,
+            },
+        }
+
+    def search(self, request, cancel_event=None):
+        """
+        执行搜索，逐条产出消息（格式见模块说明）
+        :param request: parse_request 的返回值
+        """
+        with self._lock:
+            self.active += 1
+            self.searches += 1
+        try:
+            file_paths = search_engine.find_excel_files(
+                request['directory'], request['include_patterns'], request['exclude_patterns'],
+                self.discovery_workers, self.discovery_cache_ttl)
+            yield {'type': 'total', 'files': len(file_paths)}
+
+            stats = []
+            duplicates = {}
+            for _, file_path, matches, keyword_counts, error, partial in search_engine.iter_file_results(
+                    file_paths, request['keywords'], request['engine'], self.workers, cancel_event,
+                    self.index_path if request['use_index'] else None,
+                    stats.append if request['collect_stats'] else None, request['limits'],
+                    request['match_options'], self.cache, request['dedupe'], duplicates.__setitem__,
+                    request['mode'], request['scope'], self.get_executor()):
+                while stats:
+                    yield {'type': 'stats', 'stats': stats.pop(0)}
+                yield {
+                    'type': 'file',
+                    'path': file_path,
+                    'matches': matches,
+                    'counts': keyword_counts,
+                    'error': error,
+                    'partial': partial,
+                    'duplicate_of': duplicates.get(file_path),
+                }
+            yield {'type': 'done', 'cancelled': cancel_event is not None and cancel_event.is_set()}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'ExcelKeywordSearch'
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{JSON_TYPE}; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def check_host(self):
+        """检查请求头 Host 是否为服务自身的地址，不是时返回 403 并返回 False"""
+        host = self.headers.get('Host')
+        try:
+            hostname = urlsplit(f'//{host}').hostname if host else None
+        except ValueError:
+            hostname = None
+        if hostname not in self.server.allowed_hosts:
+            self.send_json(403, {'error': 'Host not allowed'})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self.check_host():
+            return
+        if self.path == '/status':
+            self.send_json(200, self.server.service.status())
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if not self.check_host():
+            return
+        if self.path != '/search':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        # 只接受 application/json，网页跨域发送这种请求前浏览器必须先预检，而服务从不允许跨域访问
+        if self.headers.get_content_type() != JSON_TYPE:
+            self.send_json(415, {'error': f'Content-Type must be {JSON_TYPE}'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_json(400, {'error': 'Invalid Content-Length'})
+            return
+        if length > MAX_REQUEST_BYTES:
+            self.send_json(413, {'error': 'Request too large'})
+            return
+        try:
+            request = parse_request(json.loads(self.rfile.read(length)))
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', f'{NDJSON_TYPE}; charset=utf-8')
+        self.end_headers()
+        cancel_event = threading.Event()
+        messages = self.server.service.search(request, cancel_event)
+        try:
+            for message in messages:
+                if not self.write_message(message):
+                    # 客户端断开连接（取消搜索或界面关闭），停止搜索
+                    cancel_event.set()
+                    return
+        except Exception as e:
+            self.write_message({'type': 'error', 'error': str(e)})
+            self.write_message({'type': 'done', 'cancelled': False})
+        finally:
+            messages.close()
+
+    def write_message(self, message):
+        """写出一行消息，客户端已断开连接时返回 False"""
+        try:
+            self.wfile.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+        except OSError:
+            return False
+        return True
+
+
+class SearchServer(ThreadingHTTPServer):
+    """每个请求一个线程，请求线程共用 service"""
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        super().__init__(address, SearchRequestHandler)
+        self.service = service
+        self.allowed_hosts = set(LOCAL_HOST_NAMES) | {address[0].lower()}
+
+
+def iter_remote_results(server_url, request, cancel_event=None):
+    """
+    把搜索请求发送给搜索服务，逐条产出响应中的消息；cancel_event 被设置后断开连接，服务随即停止搜索
+    :param server_url: 服务地址，如 http://127.0.0.1:8765
+    :param request: make_request 创建的请求
+    :raises OSError: 无法连接服务
+    :raises RemoteSearchError: 服务拒绝请求
+    """
+    import http.client
+
+    parts = urlsplit(server_url if '//' in server_url else f'http://{server_url}')
+    conn = http.client.HTTPConnection(parts.hostname or DEFAULT_HOST, parts.port, timeout=CONNECT_TIMEOUT)
+    finished = threading.Event()
+    response = None
+    try:
+        body = json.dumps(request, ensure_ascii=False).encode('utf-8')
+        conn.request('POST', '/search', body, {'Content-Type': JSON_TYPE})
+        # 服务以关闭连接表示响应结束，getresponse 之后连接对象不再持有套接字
+        sock = conn.sock
+        response = conn.getresponse()
+        if response.status != 200:
+            try:
+                error = json.loads(response.read()).get('error')
+            except ValueError:
+                error = response.reason
+            raise RemoteSearchError(error)
+        # 耗时的文件之间可能很久没有消息；取消时从另一个线程关闭连接来结束等待
+        sock.settimeout(None)
+        if cancel_event is not None:
+            threading.Thread(target=_close_on_cancel, args=(sock, cancel_event, finished), daemon=True).start()
+        for line in response:
+            yield json.loads(line)
+    except OSError:
+        if cancel_event is None or not cancel_event.is_set():
+            raise
+    finally:
+        finished.set()
+        if response is not None:
+            response.close()
+        conn.close()
+
+
+def _close_on_cancel(sock, cancel_event, finished):
+    while not finished.wait(search_engine.CANCEL_POLL_INTERVAL):
+        if cancel_event.is_set():
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            return
+
+
+def build_parser():
+    """创建命令行参数解析器"""
+    config = get_config()
+    parser = argparse.ArgumentParser(
+        description='Run a local search service that keeps caches warm and serves searches over HTTP/JSON')
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help='address to listen on; there is no authentication (default: %(default)s)')
+    parser.add_argument('-p', '--port', type=int, default=config.get_server_port(),
+                        help='port to listen on (default: %(default)s)')
+    parser.add_argument('-w', '--workers', type=int, default=config.get_search_workers(),
+                        help='shared worker processes, 0 = all CPU cores (default: %(default)s)')
+    parser.add_argument('--cache-mb', type=float, default=config.get_result_cache_mb(),
+                        help='memory limit of the shared result and cell text cache in MB, 0 = no cache '
+                             '(default: %(default)s)')
+    parser.add_argument('--index', default=config.get_index_path() if config.get_use_index() else None,
+                        help='full-text index database to query for requests that enable it')
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = build_parser().parse_args(argv)
+    config = get_config()
+    service = SearchService(args.workers, args.cache_mb, args.index,
+                            config.get_discovery_workers(), config.get_discovery_cache_ttl())
+    try:
+        server = SearchServer((args.host, args.port), service)
+    except OSError as e:
+        print(f"[Error] Cannot listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 2
+    print(f"Search service listening on http://{args.host}:{server.server_address[1]} "
+          f"with {service.workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    # 打包后的程序使用多进程搜索时需要
+    multiprocessing.freeze_support()
+    sys.exit(main())
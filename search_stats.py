@@ -0,0 +1,93 @@
+"""
+搜索统计模块
+收集每个文件的处理耗时、扫描量和错误信息，汇总为一次搜索的报告，可导出为JSON
+"""
+import json
+import os
+import time
+
+# 报告中默认列出的最慢文件数
+DEFAULT_TOP_N = 10
+
+
+def new_file_stats(file_path, source='scan'):
+    """
+    创建单个文件的统计记录（普通字典，可跨进程传递并直接写入JSON）
+    :param source: 'scan' 实时读取，'index' 由全文索引返回，'cache' 由会话缓存返回，
+                   'duplicate' 与之前搜索过的文件内容相同，直接沿用其结果
+    """
+    try:
+        size = os.path.getsize(file_path)
+    except OSError:
+        size = None
+    return {
+        'file_path': file_path,
+        'source': source,
+        'bytes': size,
+        'open_seconds': 0.0,    # 打开工作簿到读出第一个单元格
+        'parse_seconds': 0.0,   # 读取其余单元格
+        'match_seconds': 0.0,   # 关键词匹配和生成结果行
+        'total_seconds': 0.0,
+        'sheets': 0,            # 读出过单元格的工作表数
+        'cells': 0,             # 读出的单元格数（预筛选引擎只计候选单元格）
+        'hits': 0,              # 结果行数
+        'error': None,
+        'error_type': None,
+        'partial': None,        # 结果不完整的原因，见 search_engine.PARTIAL_*
+    }
+
+
+class SearchReport:
+    def __init__(self, directory=None, keywords=None, engine=None, workers=None):
+        self.info = {
+            'directory': directory,
+            'keywords': keywords,
+            'engine': engine,
+            'workers': workers,
+        }
+        self.files = []
+        self.started = time.time()
+        self.finished = None
+
+    def add(self, stats):
+        """添加一个文件的统计记录"""
+        self.files.append(stats)
+
+    def finish(self):
+        """记录搜索结束时间"""
+        self.finished = time.time()
+
+    def slowest(self, n=DEFAULT_TOP_N):
+        """耗时最长的 n 个文件"""
+        return sorted(self.files, key=lambda stats: stats['total_seconds'], reverse=True)[:n]
+
+    def summary(self):
+        """汇总信息"""
+        end = self.finished if self.finished is not None else time.time()
+        return {
+            'files': len(self.files),
+            'failed': sum(1 for stats in self.files if stats['error'] is not None),
+            'partial': sum(1 for stats in self.files if stats['partial'] is not None),
+            'from_index': sum(1 for stats in self.files if stats['source'] == 'index'),
+            'from_cache': sum(1 for stats in self.files if stats['source'] == 'cache'),
+            'duplicates': sum(1 for stats in self.files if stats['source'] == 'duplicate'),
+            'bytes': sum(stats['bytes'] or 0 for stats in self.files),
+            'cells': sum(stats['cells'] for stats in self.files),
+            'hits': sum(stats['hits'] for stats in self.files),
+            'file_seconds': sum(stats['total_seconds'] for stats in self.files),
+            'wall_seconds': end - self.started,
+        }
+
+    def to_dict(self, top_n=DEFAULT_TOP_N):
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(self.started)),
+            'search': self.info,
+            'summary': self.summary(),
+            'slowest': [stats['file_path'] for stats in self.slowest(top_n)],
+            'files': self.files,
+        }
+
+    def save_json(self, file_path, top_n=DEFAULT_TOP_N):
+        """导出报告为JSON文件"""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(top_n), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,167 @@
+"""
+虚拟化结果表格模块
+表格控件中只保留可见窗口的若干行，滚动时从结果存储中取出对应的数据重新填充，
+无论结果有多少条，界面开销都只与窗口高度有关
+"""
+import tkinter as tk
+from tkinter import ttk
+
+# 行高测量前使用的默认值（像素）
+DEFAULT_ROW_HEIGHT = 20
+DEFAULT_HEADER_HEIGHT = 25
+# 鼠标滚轮每格滚动的行数
+WHEEL_SCROLL_ROWS = 3
+
+
+class VirtualTreeview:
+    def __init__(self, master, columns, store):
+        self.store = store
+        self.first = 0           # 窗口第一行在视图中的位置
+        self.page_size = 1      # 窗口可显示的行数
+        self.selected = None     # 选中行在视图中的位置
+        self.row_height = DEFAULT_ROW_HEIGHT
+        self.header_height = DEFAULT_HEADER_HEIGHT
+        self.height = 0          # 表格控件当前高度（像素）
+        self._measured = False
+        self._rendering = False
+
+        self.frame = tk.Frame(master)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", selectmode="browse")
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-WHEEL_SCROLL_ROWS))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(WHEEL_SCROLL_ROWS))
+        for key, delta in (("<Up>", -1), ("<Down>", 1)):
+            self.tree.bind(key, lambda e, d=delta: self.move_selection(d))
+        self.tree.bind("<Prior>", lambda e: self.move_selection(-self.page_size))
+        self.tree.bind("<Next>", lambda e: self.move_selection(self.page_size))
+        self.tree.bind("<Home>", lambda e: self.move_selection(-len(self.store)))
+        self.tree.bind("<End>", lambda e: self.move_selection(len(self.store)))
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def reset(self):
+        """回到顶部并清除选中状态"""
+        self.first = 0
+        self.selected = None
+        self.refresh()
+
+    def refresh(self):
+        """按当前滚动位置重新填充可见行"""
+        total = len(self.store)
+        self.first = max(0, min(self.first, total - self.page_size))
+        if self.selected is not None and self.selected >= total:
+            self.selected = None
+        rows = self.store.slice(self.first, self.first + self.page_size)
+
+        self._rendering = True
+        try:
+            items = self.tree.get_children()
+            # 复用已有的行控件，只更新其中的值
+            for i, row in enumerate(rows):
+                if i < len(items):
+                    self.tree.item(items[i], values=row)
+                else:
+                    self.tree.insert('', 'end', values=row)
+            if len(items) > len(rows):
+                self.tree.delete(*items[len(rows):])
+
+            items = self.tree.get_children()
+            position = None if self.selected is None else self.selected - self.first
+            if position is not None and 0 <= position < len(items):
+                self.tree.selection_set(items[position])
+                self.tree.focus(items[position])
+            elif self.tree.selection():
+                self.tree.selection_remove(*self.tree.selection())
+        finally:
+            self._rendering = False
+
+        # 第一次渲染出行之后才能测得实际行高
+        if rows and not self._measured:
+            self._measure()
+            if self._measured:
+                self._update_page_size()
+
+        if total:
+            self.scrollbar.set(self.first / total, (self.first + len(rows)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, first):
+        self.first = first
+        self.refresh()
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.first + rows)
+
+    def on_scrollbar(self, *args):
+        """处理滚动条拖动和点击"""
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * len(self.store)))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.page_size
+            self.scroll_by(step)
+
+    def on_mouse_wheel(self, event):
+        """Windows和macOS的滚轮事件"""
+        steps = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll_by(-steps * WHEEL_SCROLL_ROWS)
+        return "break"
+
+    def on_resize(self, event):
+        """窗口大小变化时重新计算可见行数"""
+        self.height = event.height
+        self._update_page_size()
+
+    def _update_page_size(self):
+        page_size = max(1, (self.height - self.header_height) // self.row_height)
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.refresh()
+
+    def _measure(self):
+        """根据已渲染的行测量行高和表头高度"""
+        items = self.tree.get_children()
+        if not items:
+            return
+        bbox = self.tree.bbox(items[0])
+        if bbox and bbox[3] > 0:
+            self.header_height = bbox[1]
+            self.row_height = bbox[3]
+            self._measured = True
+
+    def on_select(self, event):
+        """记录用户选中的行在视图中的位置"""
+        if self._rendering:
+            return
+        selection = self.tree.selection()
+        if selection:
+            self.selected = self.first + self.tree.index(selection[0])
+
+    def move_selection(self, delta):
+        """键盘移动选中行，必要时滚动窗口"""
+        total = len(self.store)
+        if not total:
+            return "break"
+        current = self.selected if self.selected is not None else self.first - (1 if delta > 0 else 0)
+        self.selected = max(0, min(total - 1, current + delta))
+        if self.selected < self.first:
+            self.first = self.selected
+        elif self.selected >= self.first + self.page_size:
+            self.first = self.selected - self.page_size + 1
+        self.refresh()
+        return "break"
+
+    def get_selected_row(self):
+        """获取选中行的完整数据，没有选中时返回 None"""
+        if self.selected is None or self.selected >= len(self.store):
+            return None
+        return self.store.get(self.selected)
@@ -0,0 +1,357 @@
+"""
+内存单元格索引模块（边输入边搜索）
+读取一次目录中全部工作簿的单元格文本并常驻内存，之后修改关键词时直接在内存中查询，不再解析工作簿
+
+- 每个文件的单元格文本用 \\x00 连接成一个字符串（XML 中不允许出现该字符，单元格文本不会包含），
+  另用数组记录每个单元格的偏移、工作表和位置，内存占用约为文本本身加每个单元格十几个字节
+- 查询时用 str.find 在整个字符串中查找关键词（C 实现，每秒可扫描约 1GB），按偏移找到所在的单元格，
+  只对这些单元格用关键词匹配器计数，结果与实时搜索相同
+- 最近查询过的关键词记住其候选单元格；继续输入时新关键词包含以前的关键词，只需检查以前的候选单元格
+- 不区分大小写时在按字符折叠大小写后的副本中查找，折叠规则与 re.IGNORECASE 一致且不改变长度；
+  正则表达式模式不支持（回溯失控的表达式在当前进程中无法中断）
+"""
+import os
+import sys
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from functools import lru_cache
+
+from excel_reader import DEFAULT_ENGINE, iter_cells
+from keyword_matcher import get_matcher
+from result_store import CELL_COLUMN_BITS
+from search_cache import file_fingerprint
+from search_engine import (NO_LIMITS, PARTIAL_CELL_LIMIT, PARTIAL_FILE_TOO_LARGE, PARTIAL_TIMEOUT,
+                           resolve_workers)
+
+# 单元格文本之间的分隔符
+SEPARATOR = '\x00'
+# 记住候选单元格的最近查询关键词数
+CANDIDATE_CACHE_SIZE = 32
+# 以前的候选单元格少于文件单元格数的 1/NARROW_RATIO 时才在其中缩小范围，否则重新查找
+NARROW_RATIO = 8
+# 折叠大小写时检查的字符范围（有大小写的字符都在此范围内）
+FOLD_MAX_CODE = 0x20000
+
+_CELL_COLUMN_MASK = (1 << CELL_COLUMN_BITS) - 1
+
+
+@lru_cache(maxsize=None)
+def _fold_table():
+    """
+    大小写折叠表 {字符编码: 折叠后的字符}，只包含会改变的字符
+    先转大写再转小写，使 ſ 与 s、ς 与 σ 等 re.IGNORECASE 视为相同的字符也折叠为同一个字符；
+    结果不是单个字符时（如 İ、ß）取小写的第一个字符或保持不变，保证折叠前后长度相同
+    """
+    table = {}
+    for code in range(FOLD_MAX_CODE):
+        char = chr(code)
+        folded = char.upper().lower()
+        if len(folded) != 1:
+            folded = char.lower()[0]
+        if folded != char:
+            table[code] = folded
+    return table
+
+
+def fold_text(text):
+    """折叠大小写，长度不变"""
+    if text.isascii():
+        return text.lower()
+    return text.translate(_fold_table())
+
+
+class FileCells:
+    """单个文件的全部单元格文本（紧凑格式）"""
+    __slots__ = ('sheets', 'sheet_col', 'cell_col', 'offsets', 'text', 'folded')
+
+    def __init__(self, sheets, sheet_col, cell_col, offsets, text, folded=None):
+        """
+        :param sheets: 工作表名列表，sheet_col 中为其序号
+        :param cell_col: 每个单元格的 (行号, 列号)，按 result_store.CELL_COLUMN_BITS 压缩为一个整数
+        :param offsets: 每个单元格文本在 text 中的起始位置，最后多一项为 len(text) + 1
+        :param folded: 折叠大小写后的 text，为 None 时在第一次不区分大小写查询时生成
+        """
+        self.sheets = sheets
+        self.sheet_col = sheet_col
+        self.cell_col = cell_col
+        self.offsets = offsets
+        self.text = text
+        self.folded = folded
+
+    def __len__(self):
+        return len(self.sheet_col)
+
+    @property
+    def nbytes(self):
+        """估算占用的内存（字节）"""
+        size = sys.getsizeof(self.text) + sum(sys.getsizeof(sheet) for sheet in self.sheets)
+        if self.folded is not None and self.folded is not self.text:
+            size += sys.getsizeof(self.folded)
+        return size + sum(column.itemsize * len(column)
+                          for column in (self.sheet_col, self.cell_col, self.offsets))
+
+    def cell_text(self, ordinal, folded=False):
+        text = self.folded if folded else self.text
+        return text[self.offsets[ordinal]:self.offsets[ordinal + 1] - 1]
+
+    def cell(self, ordinal):
+        """(工作表, 行号, 列号)"""
+        cell = self.cell_col[ordinal]
+        return self.sheets[self.sheet_col[ordinal]], cell >> CELL_COLUMN_BITS, cell & _CELL_COLUMN_MASK
+
+    def fold(self):
+        if self.folded is None:
+            self.folded = fold_text(self.text)
+
+    def find(self, key, folded=False):
+        """包含 key 的单元格序号（升序）"""
+        text = self.folded if folded else self.text
+        offsets = self.offsets
+        ordinals = array('I')
+        position = text.find(key)
+        while position != -1:
+            ordinal = bisect_right(offsets, position) - 1
+            ordinals.append(ordinal)
+            # 同一单元格只记录一次，从下一个单元格继续查找
+            position = text.find(key, offsets[ordinal + 1])
+        return ordinals
+
+    def narrow(self, ordinals, key, folded=False):
+        """只在 ordinals 中查找包含 key 的单元格"""
+        return array('I', (ordinal for ordinal in ordinals if key in self.cell_text(ordinal, folded)))
+
+
+def read_file_cells(file_path, engine=DEFAULT_ENGINE, limits=NO_LIMITS, scope=None, fold=False):
+    """
+    读取单个文件的全部单元格（可在工作进程中执行）
+    :param fold: 是否同时生成折叠大小写的副本
+    :return: (FileCells, 结果不完整的原因)，超过文件大小限制时 FileCells 为 None
+    """
+    if limits.max_file_size and os.path.getsize(file_path) > limits.max_file_size:
+        return None, PARTIAL_FILE_TOO_LARGE
+
+    truncated_sheets = []
+    sheets = []
+    sheet_ids = {}
+    sheet_col = array('I')
+    cell_col = array('Q')
+    offsets = array('Q')
+    parts = []
+    position = 0
+    for sheet_name, row_idx, col_idx, value in iter_cells(file_path, engine, None, limits.max_cells_per_sheet,
+                                                          truncated_sheets.append, scope=scope):
+        sheet_id = sheet_ids.get(sheet_name)
+        if sheet_id is None:
+            sheet_id = sheet_ids[sheet_name] = len(sheets)
+            sheets.append(sheet_name)
+        cell_str = str(value)
+        sheet_col.append(sheet_id)
+        cell_col.append(row_idx << CELL_COLUMN_BITS | col_idx)
+        offsets.append(position)
+        parts.append(cell_str)
+        position += len(cell_str) + 1
+    offsets.append(position)
+
+    text = SEPARATOR.join(parts)
+    cells = FileCells(sheets, sheet_col, cell_col, offsets, text, fold_text(text) if fold else None)
+    return cells, PARTIAL_CELL_LIMIT if truncated_sheets else None
+
+
+def warm_settings(directory, limits=NO_LIMITS, scope=None, dedupe=False):
+    """影响索引内容的设置，设置不同时需要重新建立索引（读取引擎不影响内容）"""
+    return os.path.abspath(directory), limits.max_file_size, limits.max_cells_per_sheet, scope, dedupe
+
+
+class WarmIndex:
+    def __init__(self, settings, file_paths, fingerprints, slots, cells, partial, errors, duplicates):
+        """用 build_warm_index 创建"""
+        self.settings = settings
+        self.file_paths = file_paths
+        self.fingerprints = fingerprints
+        self.partial = partial        # 每个文件结果不完整的原因
+        self.errors = errors          # 每个文件的错误信息
+        self.duplicates = duplicates  # {重复文件路径: 内容相同的第一个文件路径}
+        self._slots = slots           # 每个文件在 _cells 中的序号，没有读出单元格时为 None
+        self._cells = cells           # 不重复的 FileCells
+        self._candidates = OrderedDict()  # {(是否折叠, 关键词): [每个 FileCells 的候选单元格序号]}
+
+    @property
+    def cell_count(self):
+        return sum(len(cells) for cells in self._cells)
+
+    @property
+    def nbytes(self):
+        return sum(cells.nbytes for cells in self._cells)
+
+    def is_current(self, settings, file_paths):
+        """索引是否仍与设置和文件一致（检查每个文件的大小和修改时间）"""
+        if settings != self.settings or list(file_paths) != self.file_paths:
+            return False
+        return all(file_fingerprint(file_path) == fingerprint
+                   for file_path, fingerprint in zip(self.file_paths, self.fingerprints))
+
+    @staticmethod
+    def supports(match_options):
+        return not match_options.regex
+
+    def _entry(self, key, folded):
+        """key 的候选单元格缓存项：每个 FileCells 的候选单元格序号，查询到该文件时才查找"""
+        cache_key = (folded, key)
+        entry = self._candidates.get(cache_key)
+        if entry is not None:
+            self._candidates.move_to_end(cache_key)
+            return entry
+        entry = self._candidates[cache_key] = [None] * len(self._cells)
+        if len(self._candidates) > CANDIDATE_CACHE_SIZE:
+            self._candidates.popitem(last=False)
+        return entry
+
+    def _find(self, key, folded, entry, slot):
+        """单个 FileCells 中包含 key 的单元格"""
+        ordinals = entry[slot]
+        if ordinals is not None:
+            return ordinals
+        cells = self._cells[slot]
+        # 以前查询过的关键词是 key 的一部分时（如继续输入），只需检查它的候选单元格
+        base = None
+        base_length = 0
+        for (base_folded, base_key), base_entry in self._candidates.items():
+            if (base_folded == folded and len(base_key) > base_length and base_key != key and base_key in key
+                    and base_entry[slot] is not None):
+                base = base_entry[slot]
+                base_length = len(base_key)
+        # 候选单元格太多时逐个检查反而比重新查找慢
+        if base is not None and len(base) * NARROW_RATIO < len(cells):
+            ordinals = cells.narrow(base, key, folded)
+        else:
+            ordinals = cells.find(key, folded)
+        entry[slot] = ordinals
+        return ordinals
+
+    def search(self, keywords, match_options):
+        """
+        在内存中搜索关键词，逐个文件查找，只取前面部分结果时后面的文件不查找
+        :return: 生成器，元素格式与 search_engine.iter_file_results 相同（按文件顺序）
+        :raises ValueError: 正则表达式模式
+        """
+        if not self.supports(match_options):
+            raise ValueError("Regular expressions are not supported by the in-memory index")
+        folded = match_options.ignore_case
+        keys = list(dict.fromkeys(fold_text(keyword) if folded else keyword for keyword in keywords if keyword))
+        entries = [self._entry(key, folded) for key in keys]
+        matcher = get_matcher(keywords, match_options)
+        # 区分大小写且不是全词匹配时，每个关键词的次数就是 str.count，不需要正则表达式
+        plain = not match_options.ignore_case and not match_options.whole_word
+
+        results = {}  # {FileCells 序号: (匹配列表, 关键词统计)}，重复文件共用
+        for index, file_path in enumerate(self.file_paths):
+            slot = self._slots[index]
+            if slot is None:
+                matches, keyword_counts = [], {keyword: 0 for keyword in keywords}
+            else:
+                if slot not in results:
+                    cells = self._cells[slot]
+                    if folded:
+                        cells.fold()
+                    candidates = [self._find(key, folded, entry, slot) for key, entry in zip(keys, entries)]
+                    results[slot] = _search_cells(cells, keywords, matcher, candidates, plain)
+                matches, keyword_counts = results[slot]
+            yield index, file_path, list(matches), dict(keyword_counts), self.errors[index], self.partial[index]
+
+
+def _search_cells(cells, keywords, matcher, candidates, plain):
+    """在候选单元格中匹配关键词，结果顺序与 search_engine.search_file 相同"""
+    matches = []
+    keyword_counts = {keyword: 0 for keyword in keywords}
+    ordinals = candidates[0] if len(candidates) == 1 else sorted(set().union(*candidates))
+    for ordinal in ordinals:
+        cell_str = cells.cell_text(ordinal)
+        if plain:
+            hits = [(keyword, cell_str.count(keyword)) for keyword in keywords if keyword in cell_str]
+        else:
+            hits = matcher.match(cell_str)
+        if not hits:
+            continue
+        sheet_name, row_idx, col_idx = cells.cell(ordinal)
+        for keyword, count_in_cell in hits:
+            keyword_counts[keyword] += count_in_cell
+            matches.append((sheet_name, row_idx, col_idx, keyword, cell_str))
+    return matches, keyword_counts
+
+
+def build_warm_index(directory, file_paths, engine=DEFAULT_ENGINE, workers=1, limits=NO_LIMITS, scope=None,
+                     dedupe=False, fold=False, max_bytes=0, cancel_event=None, on_progress=None):
+    """
+    读取全部文件的单元格，建立内存索引
+    :param workers: 进程数，1 表示在当前进程读取，0 表示使用全部CPU核心
+    :param limits: 处理限制，只使用文件大小、单元格数和时间限制
+    :param scope: 搜索范围，只读取范围内的单元格
+    :param dedupe: 内容相同的文件只读取一次
+    :param fold: 是否预先生成折叠大小写的副本（之后要不区分大小写查询时）
+    :param max_bytes: 内存上限（字节，估算值），0 表示不限制
+    :param on_progress: 每读完一个文件调用 on_progress(已完成数, 总数)
+    :return: WarmIndex，取消时返回 None
+    :raises MemoryError: 超过内存上限
+    """
+    file_paths = list(file_paths)
+    fingerprints = [file_fingerprint(file_path) for file_path in file_paths]
+    duplicates = {}
+    if dedupe:
+        from file_dedup import find_duplicates
+        duplicates = find_duplicates(file_paths)
+    tasks = [(index, (file_path, engine, limits, scope, fold))
+             for index, file_path in enumerate(file_paths) if file_path not in duplicates]
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    def read_all():
+        workers_used = min(resolve_workers(workers), len(tasks))
+        if workers_used <= 1 and not limits.timeout:
+            for index, args in tasks:
+                if cancelled():
+                    return
+                try:
+                    yield index, read_file_cells(*args), None
+                except Exception as e:
+                    yield index, (None, None), str(e)
+            return
+        # 超时的文件直接终止其工作进程
+        from worker_pool import STATUS_OK, STATUS_TIMEOUT, run_with_timeout
+        for index, status, result in run_with_timeout(read_file_cells, tasks, workers_used, limits.timeout,
+                                                      cancelled):
+            if status == STATUS_OK:
+                yield index, result, None
+            elif status == STATUS_TIMEOUT:
+                yield index, (None, PARTIAL_TIMEOUT), None
+            else:
+                yield index, (None, None), result
+
+    slots = [None] * len(file_paths)
+    partial = [None] * len(file_paths)
+    errors = [None] * len(file_paths)
+    cells_list = []
+    nbytes = 0
+    done = 0
+    for index, (cells, reason), error in read_all():
+        partial[index] = reason
+        errors[index] = error
+        if cells is not None:
+            slots[index] = len(cells_list)
+            cells_list.append(cells)
+            nbytes += cells.nbytes
+            if max_bytes and nbytes > max_bytes:
+                raise MemoryError(f"In-memory index exceeds {max_bytes // (1024 * 1024)} MB")
+        done += 1
+        if on_progress is not None:
+            on_progress(done, len(tasks))
+    if cancelled():
+        return None
+
+    positions = {file_path: index for index, file_path in enumerate(file_paths)}
+    for file_path, original in duplicates.items():
+        index, first = positions[file_path], positions[original]
+        slots[index], partial[index], errors[index] = slots[first], partial[first], errors[first]
+    return WarmIndex(warm_settings(directory, limits, scope, dedupe), file_paths, fingerprints, slots,
+                     cells_list, partial, errors, duplicates)
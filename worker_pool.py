@@ -0,0 +1,129 @@
+"""
+可终止的工作进程池
+每个任务有墙钟时间限制，超时的工作进程被直接终止并重新启动，
+不会因单个损坏或超大的文件阻塞整个搜索
+"""
+import multiprocessing
+import time
+from multiprocessing.connection import wait
+
+# 任务结果状态
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+STATUS_TIMEOUT = 'timeout'
+
+# 检查取消标志和超时的最长间隔（秒）
+POLL_INTERVAL = 0.2
+
+
+def _worker_main(conn):
+    """工作进程：循环接收任务 (函数, 参数) 并返回结果，收到 None 时退出"""
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        func, args = task
+        try:
+            result = (STATUS_OK, func(*args))
+        except Exception as e:
+            result = (STATUS_ERROR, str(e))
+        conn.send(result)
+
+
+class _Worker:
+    def __init__(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.key = None
+        self.deadline = None
+
+    def submit(self, key, func, args, timeout):
+        self.conn.send((func, args))
+        self.key = key
+        self.deadline = time.monotonic() + timeout if timeout else None
+
+    def release(self):
+        """任务完成，返回任务标识"""
+        key = self.key
+        self.key = None
+        self.deadline = None
+        return key
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        """空闲时正常退出，忙碌时直接终止"""
+        if self.key is not None:
+            self.kill()
+            return
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(POLL_INTERVAL)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+
+def run_with_timeout(func, tasks, workers, timeout, cancelled=None):
+    """
+    在工作进程中执行任务，按完成顺序产出结果
+    :param func: 模块级函数（需可被pickle），在工作进程中以 func(*args) 调用
+    :param tasks: [(任务标识, 参数元组)]
+    :param workers: 工作进程数
+    :param timeout: 每个任务的墙钟时间限制（秒），0 表示不限制
+    :param cancelled: 无参函数，返回 True 时停止并终止所有工作进程
+    :return: 生成器，元素为 (任务标识, 状态, 结果)；状态为 STATUS_ERROR 时结果为错误信息，超时时为 None
+    """
+    pending = list(reversed(tasks))
+    pool = [_Worker() for _ in range(max(1, min(workers, len(tasks))))]
+    try:
+        while True:
+            for worker in pool:
+                if worker.key is None and pending:
+                    key, args = pending.pop()
+                    worker.submit(key, func, args, timeout)
+            busy = [worker for worker in pool if worker.key is not None]
+            if not busy:
+                return
+
+            wait_time = POLL_INTERVAL
+            deadlines = [worker.deadline for worker in busy if worker.deadline is not None]
+            if deadlines:
+                wait_time = max(0, min(wait_time, min(deadlines) - time.monotonic()))
+            ready = wait([worker.conn for worker in busy], wait_time)
+            if cancelled is not None and cancelled():
+                return
+
+            for i, worker in enumerate(pool):
+                if worker.key is None:
+                    continue
+                if worker.conn in ready:
+                    try:
+                        status, result = worker.conn.recv()
+                    except (EOFError, OSError) as e:
+                        # 工作进程异常退出（如内存不足被系统终止），重启后继续
+                        key = worker.release()
+                        worker.kill()
+                        pool[i] = _Worker()
+                        yield key, STATUS_ERROR, f"worker process exited: {e!r}"
+                        continue
+                    yield worker.release(), status, result
+                elif worker.deadline is not None and time.monotonic() >= worker.deadline:
+                    key = worker.release()
+                    worker.kill()
+                    pool[i] = _Worker()
+                    yield key, STATUS_TIMEOUT, None
+    finally:
+        for worker in pool:
+            worker.stop()
@@ -0,0 +1,278 @@
+"""
+共享字符串预筛选读取模块
+直接解析.xlsx中的XML：先扫描一遍共享字符串表，找出包含关键词的字符串，
+工作表中只解析引用这些字符串的单元格；整个工作簿不可能命中时跳过工作表解析
+"""
+from xml.sax.saxutils import escape
+
+from openpyxl.cell.text import Text
+from openpyxl.reader.excel import ExcelReader
+from openpyxl.styles.stylesheet import apply_stylesheet
+from openpyxl.utils.cell import coordinate_to_tuple
+from openpyxl.worksheet._reader import WorkSheetParser
+from openpyxl.xml.constants import SHARED_STRINGS, SHEET_MAIN_NS
+from openpyxl.xml.functions import iterparse
+
+from keyword_matcher import EXACT_MATCH, get_matcher
+from search_scope import HEADER_ROW, normalize_header
+
+_STRING_TAG = f'{{{SHEET_MAIN_NS}}}si'
+_ROW_TAG = f'{{{SHEET_MAIN_NS}}}row'
+_CELL_TAG = f'{{{SHEET_MAIN_NS}}}c'
+_VALUE_TAG = f'{{{SHEET_MAIN_NS}}}v'
+_INLINE_STRING_TAG = f'{{{SHEET_MAIN_NS}}}is'
+_TEXT_TAG = f'{{{SHEET_MAIN_NS}}}t'
+_RUN_TAG = f'{{{SHEET_MAIN_NS}}}r'
+
+# 数字、日期、布尔值等非文本单元格转换为字符串后可能包含的字符
+_NON_TEXT_CHARS = frozenset('0123456789+-.:, eEinfadys')
+_NON_TEXT_CHARS_FOLDED = frozenset(char.lower() for char in _NON_TEXT_CHARS)
+
+# 快速检查工作表原始XML时每次读取的字节数
+RAW_SCAN_CHUNK_SIZE = 1024 * 1024
+
+
+def can_match_non_text(keyword, options=EXACT_MATCH):
+    """判断关键词是否可能出现在数字、日期或布尔值单元格中（正则表达式无法判断，按可能处理）"""
+    if options.regex:
+        return True
+    if options.ignore_case:
+        keyword = keyword.lower()
+        return keyword in 'true' or keyword in 'false' or all(char in _NON_TEXT_CHARS_FOLDED for char in keyword)
+    if keyword in 'True' or keyword in 'False':
+        return True
+    return all(char in _NON_TEXT_CHARS for char in keyword)
+
+
+def _read_shared_strings(reader, matcher, headers=()):
+    """
+    扫描共享字符串表（文本提取规则与openpyxl相同）
+    :param headers: 按表头名称选择列时的表头名称（规范形式），这些字符串也保留，以便识别表头
+    :return: matcher 为 None 时返回全部字符串列表，否则只返回命中的 {序号: 文本}
+    """
+    strings = [] if matcher is None else {}
+    content_type = reader.package.find(SHARED_STRINGS)
+    if content_type is None:
+        return strings
+
+    with reader.archive.open(content_type.PartName[1:]) as src:
+        index = 0
+        for _, node in iterparse(src):
+            if node.tag != _STRING_TAG:
+                continue
+            text = Text.from_tree(node).content.replace('x005F_', '')
+            node.clear()
+            if matcher is None:
+                strings.append(text)
+            elif matcher.count(text) or (headers and normalize_header(text) in headers):
+                strings[index] = text
+            index += 1
+    return strings
+
+
+def _inline_text(cell):
+    """提取内联字符串文本（普通文本和富文本片段，不含注音），与 openpyxl Text.content 相同"""
+    inline = cell.find(_INLINE_STRING_TAG)
+    if inline is None:
+        return None
+    parts = []
+    for child in inline:
+        if child.tag == _TEXT_TAG:
+            parts.append(child.text or '')
+        elif child.tag == _RUN_TAG:
+            parts.append(child.findtext(_TEXT_TAG) or '')
+    return ''.join(parts)
+
+
+def _may_contain(archive, path, keywords):
+    """
+    在未解析的工作表XML中查找关键词（内联字符串、公式结果等不在共享字符串表中的文本）
+    找不到任何关键词时该工作表不可能命中；遇到字符引用时无法判断，按可能命中处理
+    """
+    needles = set()
+    for keyword in keywords:
+        needles.add(keyword.encode('utf-8'))
+        needles.add(escape(keyword).encode('utf-8'))
+    needles.add(b'&#')
+    overlap = max(len(needle) for needle in needles) - 1
+
+    tail = b''
+    with archive.open(path) as src:
+        for chunk in iter(lambda: src.read(RAW_SCAN_CHUNK_SIZE), b''):
+            data = tail + chunk
+            if any(needle in data for needle in needles):
+                return True
+            tail = data[-overlap:] if overlap else b''
+    return False
+
+
+def _cell_position(row_counter, last_ref, offset):
+    """由最近一个带坐标的单元格及其后的偏移计算 (行号, 列号)"""
+    if last_ref is None:
+        return row_counter, offset
+    row_idx, col_idx = coordinate_to_tuple(last_ref)
+    return row_idx, col_idx + offset
+
+
+def _header_cells(row, row_counter, strings, cell_parser):
+    """表头行全部单元格的 (列号, 值)，共享字符串表中只有保留下来的字符串可以识别"""
+    last_ref = None
+    offset = 0
+    for cell in row:
+        if cell.tag != _CELL_TAG:
+            continue
+        ref = cell.get('r')
+        if ref:
+            last_ref = ref
+            offset = 0
+        else:
+            offset += 1
+        data_type = cell.get('t', 'n')
+        if data_type == 's':
+            index = cell.findtext(_VALUE_TAG)
+            if not index:
+                continue
+            value = strings.get(int(index)) if isinstance(strings, dict) else strings[int(index)]
+        elif data_type == 'inlineStr':
+            value = _inline_text(cell)
+        else:
+            value = cell_parser.parse_cell(cell)['value']
+        if value is not None:
+            yield _cell_position(row_counter, last_ref, offset)[1], value
+
+
+def _iter_sheet_cells(src, strings, matcher, include_non_text, cell_parser, max_cells=0, on_truncated=None,
+                      sheet_scope=None):
+    """
+    解析工作表XML，产出候选单元格 (行号, 列号, 值)
+    引用未命中共享字符串的单元格不做任何转换，内联文本先匹配再产出；不需要时数字单元格也直接跳过
+    :param max_cells: 最多解析的单元格数（包括未产出的单元格），0 表示不限制；超出时调用 on_truncated() 并停止
+    :param sheet_scope: 搜索范围 search_scope.SheetScope，范围外的行不解析单元格，读完结束行后停止
+    """
+    row_counter = 0
+    cell_count = 0
+    min_row, max_row = 1, None
+    if sheet_scope is not None and not sheet_scope.needs_header:
+        min_row, _, max_row, _ = sheet_scope.bounds()
+    for _, row in iterparse(src):
+        if row.tag != _ROW_TAG:
+            continue
+
+        row_ref = row.get('r')
+        row_counter = int(row_ref) if row_ref else row_counter + 1
+        if sheet_scope is not None:
+            if sheet_scope.needs_header:
+                # 第一次读到表头行（或已越过表头行）时确定列
+                header = _header_cells(row, row_counter, strings, cell_parser) if row_counter == HEADER_ROW else ()
+                sheet_scope.resolve_headers(header)
+                if sheet_scope.empty:
+                    return
+                min_row, _, max_row, _ = sheet_scope.bounds()
+            if max_row is not None and row_counter > max_row:
+                return
+            if row_counter < min_row:
+                row.clear()
+                continue
+        # 没有范围限制时单元格坐标只在产出时计算：记住最近一个带坐标的单元格及其后的偏移
+        last_ref = None
+        offset = 0
+
+        for cell in row:
+            if cell.tag != _CELL_TAG:
+                continue
+            cell_count += 1
+            if max_cells and cell_count > max_cells:
+                if on_truncated is not None:
+                    on_truncated()
+                return
+            ref = cell.get('r')
+            if ref:
+                last_ref = ref
+                offset = 0
+            else:
+                offset += 1
+            if sheet_scope is not None and not sheet_scope.contains(*_cell_position(row_counter, last_ref, offset)):
+                continue
+
+            data_type = cell.get('t', 'n')
+            if data_type == 's':
+                index = cell.findtext(_VALUE_TAG)
+                if not index:
+                    continue
+                if isinstance(strings, dict):
+                    value = strings.get(int(index))
+                    if value is None:
+                        continue
+                else:
+                    value = strings[int(index)]
+            elif data_type == 'inlineStr' or data_type == 'str':
+                if data_type == 'str':
+                    value = cell.findtext(_VALUE_TAG) or None
+                else:
+                    value = _inline_text(cell)
+                if value is None or (matcher is not None and not matcher.count(value)):
+                    continue
+            elif data_type in ('n', 'b') and not include_non_text:
+                continue
+            else:
+                value = cell_parser.parse_cell(cell)['value']
+                if value is None:
+                    continue
+
+            row_idx, col_idx = _cell_position(row_counter, last_ref, offset)
+            yield row_idx, col_idx, value
+
+        row.clear()
+
+
+def iter_candidate_cells(file_path, keywords=None, max_cells_per_sheet=0, on_truncated=None,
+                         match_options=EXACT_MATCH, scope=None):
+    """
+    逐个读取工作簿中可能包含关键词的单元格
+    :param keywords: 关键词列表，为 None 时产出全部非空单元格
+    :param max_cells_per_sheet: 每个工作表最多解析的单元格数（范围外的行不计），0 表示不限制
+    :param on_truncated: 工作表因超出限制未读完时的回调 on_truncated(工作表名)
+    :param match_options: 关键词匹配方式
+    :param scope: 搜索范围 search_scope.SearchScope，范围外的工作表XML不读取
+    :return: 生成器，元素为 (工作表名, 行号, 列号, 值)
+    """
+    reader = ExcelReader(file_path, read_only=True, data_only=True)
+    try:
+        reader.read_manifest()
+        reader.read_workbook()
+        apply_stylesheet(reader.archive, reader.wb)
+        wb = reader.wb
+
+        matcher = None if keywords is None else get_matcher(keywords, match_options)
+        strings = _read_shared_strings(reader, matcher, scope.headers if scope is not None else ())
+        include_non_text = keywords is None or any(can_match_non_text(keyword, match_options)
+                                                   for keyword in keywords)
+        # 原始XML按字节查找关键词，只适用于区分大小写的普通关键词
+        raw_check = keywords is not None and not match_options.ignore_case and not match_options.regex
+        # 非共享字符串单元格的值转换（日期、布尔值、内联字符串等）沿用openpyxl的规则
+        cell_parser = WorkSheetParser(None, [], data_only=True, epoch=wb.epoch,
+                                      date_formats=wb._date_formats,
+                                      timedelta_formats=wb._timedelta_formats)
+
+        for sheet, rel in reader.parser.find_sheets():
+            if rel.target not in reader.valid_files or 'chartsheet' in rel.Type:
+                continue
+            sheet_scope = None
+            if scope is not None:
+                sheet_scope = scope.for_sheet(sheet.name)
+                if sheet_scope is None:
+                    continue
+            # 没有命中的共享字符串时，只有原始XML中出现关键词的工作表才需要解析
+            if (raw_check and not strings and not include_non_text
+                    and not _may_contain(reader.archive, rel.target, keywords)):
+                continue
+            truncated = None
+            if on_truncated is not None:
+                truncated = lambda name=sheet.name: on_truncated(name)
+            with reader.archive.open(rel.target) as src:
+                for row_idx, col_idx, value in _iter_sheet_cells(
+                        src, strings, matcher, include_non_text, cell_parser,
+                        max_cells_per_sheet, truncated, sheet_scope):
+                    yield sheet.name, row_idx, col_idx, value
+    finally:
+        reader.archive.close()